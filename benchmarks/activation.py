@@ -0,0 +1,100 @@
+"""Measure the cost of activating log_mgr.
+
+Each sample spawns a fresh interpreter that records how long was spent in:
+
+* import: Importing mundane.log_mgr
+* activate: log_mgr.activate()
+* first write: Logging the first record, which opens the file
+
+An invocation that never logs anything, like --help, only pays for the first
+two.
+
+Typical usage, from the top of the repository:
+
+  python -m benchmarks.activation
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PHASES = ('import', 'activate', 'first write')
+
+_CHILD_SOURCE = '''
+import json
+import sys
+import time
+
+_begin = time.perf_counter()
+from mundane import log_mgr
+_imported = time.perf_counter()
+log_mgr.activate('activation', sys.argv[1])
+_activated = time.perf_counter()
+log_mgr.logging.getLogger().setLevel('INFO')
+log_mgr.logging.info('First record')
+_written = time.perf_counter()
+
+json.dump(
+    {
+        'import': _imported - _begin,
+        'activate': _activated - _imported,
+        'first write': _written - _activated,
+    }, sys.stdout)
+'''
+
+
+def spawn(output_dir: str, env: dict[str, str]) -> dict[str, float]:
+    """Activate once in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, '-c', _CHILD_SOURCE, output_dir],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    return json.loads(result.stdout)
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0]
+    )
+    parser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        default=20,
+        help='Invocations, median is reported (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    root = pathlib.Path(__file__).parent.parent
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, (str(root), env.get('PYTHONPATH')))
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # One warm up to populate the bytecode and OS caches.
+        spawn(tmpdir, env)
+        samples = [spawn(tmpdir, env) for _ in range(args.repeat)]
+
+    print(''.join(f'{phase:>14}' for phase in PHASES))
+    print(
+        ''.join(
+            f'{statistics.median(s[phase] for s in samples) * 1000:>12.2f}ms'
+            for phase in PHASES
+        )
+    )
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Measure parsing of very large positional argument lists.
+
+Compares a command using app.BulkAction against the same command using a
+plain nargs='*' positional, over a range of argument counts.  Both the total
+time and the time per argument are reported, so scaling should be easy to
+see.
+
+Typical usage, from the top of the repository:
+
+  python -m benchmarks.bulk_parse
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+from mundane import app
+
+SIZES = (1_000, 10_000, 40_000, 160_000)
+
+
+def command(args: argparse.Namespace) -> int:
+    """Do nothing with the paths."""
+    del args
+    return 0
+
+
+def build(bulk: bool) -> app.ArgparseApp:
+    """Create a small app with one command taking many paths."""
+    my_app = app.ArgparseApp(prog='bulk_parse')
+    parser = my_app.register_command(command)
+    parser.add_argument('--flag')
+    if bulk:
+        parser.add_argument('paths', action=app.BulkAction)
+    else:
+        parser.add_argument('paths', nargs='*')
+    return my_app
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0]
+    )
+    parser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        default=5,
+        help='Runs per measurement, best is reported (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    apps = {
+        'nargs=*': build(False),
+        'BulkAction': build(True),
+    }
+
+    print(
+        f'{"args":>8}' + ''.join(f'{name:>16}{"us/arg":>8}' for name in apps)
+    )
+    for size in SIZES:
+        argv = ['command', '--flag', 'x'] + [
+            os.path.join('some', 'path', str(x)) for x in range(size)
+        ]
+        line = f'{size:>8}'
+        for my_app in apps.values():
+            best = min(
+                timeit.repeat(
+                    lambda a=my_app, v=argv: a.run(v),
+                    number=1,
+                    repeat=args.repeat
+                )
+            )
+            line += f'{best * 1000:>14.2f}ms{best / size * 1e6:>8.3f}'
+        print(line)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
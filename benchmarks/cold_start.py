@@ -0,0 +1,267 @@
+"""Measure cold-start cost of the example mundane applications.
+
+Each scenario spawns a fresh interpreter that runs one of the example apps
+(see mundane/examples) with a given argv.  The wall time and peak RSS of the
+child process are measured from the outside, while a small driver inside the
+child records how long was spent in:
+
+* imports: Importing the example module (and thus mundane itself)
+* activate: log_mgr.activate()
+* registration: register_global_flags/shared_flags/commands()
+* parsing: The top-level parse_args() call
+* command: The rest of ArgparseApp.run() (hooks and the command itself)
+
+The interpreter's own startup cost is what is left over.
+
+Typical usage:
+
+  python benchmarks/cold_start.py
+  python benchmarks/cold_start.py --record benchmarks/cold_start_baseline.json
+  python benchmarks/cold_start.py --check benchmarks/cold_start_baseline.json
+
+When using --check, the exit code will be non-zero if the best wall time or
+median peak RSS of any scenario exceeds the recorded baseline by more than the
+allowed margin.  The best, rather than median, wall time is used because it
+is far less sensitive to noise from other processes on the host.  Baselines
+are only meaningful on the host they were recorded on.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+EXAMPLES = pathlib.Path(__file__
+                        ).parent.parent.joinpath('mundane', 'examples')
+
+SCENARIOS: dict[str, tuple[str, tuple[str, ...]]] = {
+    'demo --help': ('demo.py', ('--help',)),
+    'demo': ('demo.py', ()),
+    'nebulous --help': ('nebulous.py', ('--help',)),
+    'nebulous del': ('nebulous.py', ('del',)),
+    'nebulous info': ('nebulous.py', ('info',)),
+}
+
+PHASES = (
+    'interpreter', 'imports', 'activate', 'registration', 'parsing', 'command'
+)
+
+# Runs inside the child.  It is kept small and only imports what the
+# interpreter has already loaded, so that it does not skew the imports phase.
+_CHILD_SOURCE = '''
+import sys
+import time
+
+_start = time.perf_counter()
+_out, _path = sys.argv[1:3]
+sys.argv = [_path.rsplit('/', 1)[-1].removesuffix('.py')] + sys.argv[3:]
+_phases = dict.fromkeys(
+    ('imports', 'activate', 'registration', 'parsing', 'run'), 0.0)
+
+
+def _timed(phase, func):
+    def wrapper(*args, **kwargs):
+        begin = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _phases[phase] += time.perf_counter() - begin
+    return wrapper
+
+
+import importlib.util
+
+_begin = time.perf_counter()
+_spec = importlib.util.spec_from_file_location('example', _path)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _module
+_spec.loader.exec_module(_module)
+_phases['imports'] = time.perf_counter() - _begin
+
+import argparse
+from mundane import app
+from mundane import log_mgr
+
+log_mgr.activate = _timed('activate', log_mgr.activate)
+for _name in ('register_global_flags', 'register_shared_flags',
+              'register_commands'):
+    setattr(app.ArgparseApp, _name,
+            _timed('registration', getattr(app.ArgparseApp, _name)))
+app.ArgparseApp.run = _timed('run', app.ArgparseApp.run)
+argparse.ArgumentParser.parse_args = _timed(
+    'parsing', argparse.ArgumentParser.parse_args)
+
+try:
+    _module.main()
+except SystemExit:
+    pass
+finally:
+    _phases['command'] = _phases.pop('run') - _phases['parsing']
+    _phases['total'] = time.perf_counter() - _start
+    import json
+    with open(_out, 'w', encoding='utf-8') as _handle:
+        json.dump(_phases, _handle)
+'''
+
+
+class Sample(typing.NamedTuple):
+    """A single child invocation."""
+    wall: float
+    maxrss: int
+    phases: dict[str, float]
+
+
+def spawn(example: str, argv: tuple[str, ...], env: dict[str, str]) -> Sample:
+    """Run the example once in a fresh interpreter."""
+    with tempfile.NamedTemporaryFile(suffix='.json') as out:
+        cmd = [
+            sys.executable, '-c', _CHILD_SOURCE, out.name,
+            str(EXAMPLES.joinpath(example)), *argv
+        ]
+        begin = time.perf_counter()
+        with subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL) as proc:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - begin
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode:
+            raise RuntimeError(f'{cmd[3:]} failed with {proc.returncode}')
+        phases = json.loads(pathlib.Path(out.name).read_text('utf-8'))
+
+    phases['interpreter'] = wall - phases.pop('total')
+    # Linux reports ru_maxrss in KiB
+    return Sample(wall, rusage.ru_maxrss * 1024, phases)
+
+
+def measure(repeat: int) -> dict[str, dict[str, float]]:
+    """Run all scenarios and collect median results."""
+    root = pathlib.Path(__file__).parent.parent
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, (str(root), env.get('PYTHONPATH')))
+        )
+        # Keep log files and such out of the user's real directories.
+        for var in ('XDG_STATE_HOME', 'XDG_DATA_HOME', 'XDG_CACHE_HOME'):
+            env[var] = tmpdir
+
+        results = dict()
+        for name, (example, argv) in SCENARIOS.items():
+            # One warm up to populate the bytecode and OS caches.
+            spawn(example, argv, env)
+            samples = [spawn(example, argv, env) for _ in range(repeat)]
+            result = {
+                'wall': statistics.median(s.wall for s in samples),
+                'best': min(s.wall for s in samples),
+                'maxrss': statistics.median(s.maxrss for s in samples),
+            }
+            for phase in PHASES:
+                result[phase] = statistics.median(
+                    s.phases[phase] for s in samples
+                )
+            results[name] = result
+
+    return results
+
+
+def report(results: dict[str, dict[str, float]]):
+    """Print a table of results in milliseconds and MiB."""
+    header = f'{"scenario":<18}{"wall":>8}{"best":>8}{"rss":>8}' + ''.join(
+        f'{phase[:12]:>14}' for phase in PHASES
+    )
+    print(header)
+    for name, result in results.items():
+        line = (
+            f'{name:<18}{result["wall"] * 1000:>8.1f}'
+            f'{result["best"] * 1000:>8.1f}'
+            f'{result["maxrss"] / 2**20:>8.1f}'
+        )
+        line += ''.join(f'{result[phase] * 1000:>14.2f}' for phase in PHASES)
+        print(line)
+
+
+def check(
+    results: dict[str, dict[str, float]], baseline: dict[str, typing.Any],
+    margin: float
+) -> list[str]:
+    """Compare results against a baseline.
+
+    Returns:
+      A list of human readable regressions.
+    """
+    regressions = list()
+    for name, result in results.items():
+        expected = baseline['results'].get(name)
+        if expected is None:
+            continue
+        for metric in ('best', 'maxrss'):
+            limit = expected[metric] * (1 + margin)
+            if result[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {result[metric]:.4g} exceeds baseline'
+                    f' {expected[metric]:.4g} by more than {margin:.0%}'
+                )
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0]
+    )
+    parser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        default=10,
+        help='Invocations per scenario (default: %(default)s)'
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '--record', metavar='FILE', help='Save results as a new baseline.'
+    )
+    group.add_argument(
+        '--check', metavar='FILE', help='Compare results to a baseline.'
+    )
+    parser.add_argument(
+        '--margin',
+        type=float,
+        default=0.25,
+        help='Allowed regression when checking (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    results = measure(args.repeat)
+    report(results)
+
+    if args.record:
+        pathlib.Path(args.record).write_text(
+            json.dumps(
+                {
+                    'python': sys.version.split()[0],
+                    'repeat': args.repeat,
+                    'results': results,
+                },
+                indent=2
+            ) + '\n', 'utf-8'
+        )
+
+    if args.check:
+        baseline = json.loads(pathlib.Path(args.check).read_text('utf-8'))
+        regressions = check(results, baseline, args.margin)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Measure the per call overhead of progress.Progress.advance().
+
+An empty loop is compared against loops that call advance(), with the
+reporting thread running, so the difference is what a command's inner loop
+pays for progress reporting.
+
+Typical usage, from the top of the repository:
+
+  python -m benchmarks.progress_overhead
+"""
+
+import argparse
+import io
+import sys
+import timeit
+
+from mundane import progress
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0]
+    )
+    parser.add_argument(
+        '-n',
+        '--number',
+        type=int,
+        default=1_000_000,
+        help='Loop iterations per measurement (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-r',
+        '--repeat',
+        type=int,
+        default=5,
+        help='Measurements, best is reported (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    prog = progress.Progress('bench', interval=0.1, stream=io.StringIO())
+    loops = {
+        'empty': 'for _ in loop: pass',
+        'advance()': 'for _ in loop: advance()',
+        'advance(1, 512)': 'for _ in loop: advance(1, 512)',
+    }
+    namespace = {'loop': range(args.number), 'advance': prog.advance}
+
+    print(f'{"loop":<18}{"ns/iter":>10}{"overhead":>10}')
+    with prog:
+        empty = None
+        for name, stmt in loops.items():
+            best = min(
+                timeit.
+                repeat(stmt, number=1, repeat=args.repeat, globals=namespace)
+            ) / args.number
+            if empty is None:
+                empty = best
+            print(
+                f'{name:<18}{best * 1e9:>10.1f}{(best - empty) * 1e9:>10.1f}'
+            )
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
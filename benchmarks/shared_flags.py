@@ -0,0 +1,81 @@
+"""Measure building many commands that share the same flags.
+
+An app with COMMANDS commands, each using the same shared parser with FLAGS
+flags as a parent, is built twice: once with register_command() on the
+default subparser, where parents are attached on demand, and once on a plain
+argparse subparser, where every parent action is attached up front.  The
+time and memory to build the app and parse a single command are reported.
+
+Typical usage, from the top of the repository:
+
+  python -m benchmarks.shared_flags
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from mundane import app
+
+COMMANDS = 300
+FLAGS = 20
+
+
+def command(args: argparse.Namespace) -> int:
+    """Do nothing."""
+    del args
+    return 0
+
+
+def build_and_run(eager: bool) -> int:
+    """Build the app and run one command."""
+    my_app = app.ArgparseApp(prog='shared_flags')
+    shared = my_app.safe_new_shared_parser('shared')
+    for flag in range(FLAGS):
+        shared.add_argument(f'--flag-{flag}', help=f'Shared flag {flag}.')
+
+    subparser = my_app.parser.add_subparsers() if eager else None
+    for cmd in range(COMMANDS):
+        my_app.register_command(
+            command, name=f'cmd-{cmd}', subparser=subparser, parents=[shared]
+        )
+
+    return my_app.run(['cmd-0', '--flag-0', 'x'])
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0]
+    )
+    parser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        default=5,
+        help='Runs per measurement, best is reported (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    print(f'{COMMANDS} commands sharing {FLAGS} flags')
+    print(f'{"mode":<12}{"time":>12}{"peak memory":>14}')
+    for name, eager in (('eager', True), ('on demand', False)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            begin = time.perf_counter()
+            build_and_run(eager)
+            best = min(best, time.perf_counter() - begin)
+
+        tracemalloc.start()
+        build_and_run(eager)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'{name:<12}{best * 1000:>10.2f}ms{peak / 2**20:>11.2f}MiB')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
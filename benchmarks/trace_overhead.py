@@ -0,0 +1,71 @@
+"""Measure the per span overhead of trace.span() and trace.traced().
+
+An empty loop is compared against loops that record a span on each
+iteration, so the difference is what instrumented code pays per span.  The
+buffer is sized to hold every span, as dropped spans are cheaper.
+
+Typical usage, from the top of the repository:
+
+  python -m benchmarks.trace_overhead
+"""
+
+import argparse
+import sys
+import timeit
+
+from mundane import trace
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0]
+    )
+    parser.add_argument(
+        '-n',
+        '--number',
+        type=int,
+        default=100_000,
+        help='Loop iterations per measurement (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-r',
+        '--repeat',
+        type=int,
+        default=5,
+        help='Measurements, best is reported (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    loops = {
+        'empty': 'for _ in loop: pass',
+        'span()': 'for _ in loop:\n with span("bench"): pass',
+        'traced()': 'for _ in loop: traced()',
+    }
+    namespace = {
+        'loop': range(args.number),
+        'span': trace.span,
+        'traced': trace.traced('bench')(lambda: None),
+    }
+
+    print(f'{"loop":<18}{"ns/iter":>10}{"overhead":>10}')
+    empty = None
+    for name, stmt in loops.items():
+        best = min(
+            timeit.repeat(
+                stmt,
+                setup=f'reset({args.number})',
+                number=1,
+                repeat=args.repeat,
+                globals=dict(namespace, reset=trace.reset)
+            )
+        ) / args.number
+        if empty is None:
+            empty = best
+        print(f'{name:<18}{best * 1e9:>10.1f}{(best - empty) * 1e9:>10.1f}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
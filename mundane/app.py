@@ -17,22 +17,39 @@ def main() -> int:
 if __name__ == '__main__':
     main()
 """
+# pylint: disable=too-many-lines
 
 import argparse
+import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import contextvars
 import functools
+import graphlib
+import importlib
 import inspect
 import logging
 import os
 import resource
 import shutil
+import signal
+import sys
 import textwrap
+import threading
 import types
 import typing
 
 import humanize
 import platformdirs
 
+from mundane import embed
+from mundane import kv_cache
 from mundane import log_mgr
+from mundane import plugins
+from mundane import progress
+from mundane import result_cache
+from mundane import trace
 
 
 class Error(Exception):
@@ -47,6 +64,14 @@ class MissingParser(Exception):
     """Parser not registered."""
 
 
+class MissingProvider(Exception):
+    """An after parse hook requires something no hook provides."""
+
+
+class ExistingResource(Exception):
+    """Namespace attribute already exists."""
+
+
 class AddArgumentKwargs(typing.TypedDict, total=False):
     """Exists to make typing happy."""
     action: str
@@ -134,11 +159,349 @@ class Docstring:
         self._description = '\n\n'.join(description_parts)
 
 
+class BulkArgs(collections.abc.Sequence):
+    """A lazily converted sequence of positional arguments.
+
+    Instances are created by BulkAction.  The arguments are kept as the
+    original strings and only passed through the type conversion function as
+    they are accessed.  Unlike with argparse, a bad value will raise an
+    exception when accessed rather than during parsing.
+    """
+
+    def __init__(
+        self,
+        arg_strings: list[str],
+        convert: typing.Callable[[str], typing.Any] | None = None
+    ):
+        """Wrap the arguments.
+
+        Args:
+          arg_strings: The original argument strings.
+          convert: Optional function applied to each string when accessed.
+        """
+        self._arg_strings = arg_strings
+        self._convert = convert
+
+    @property
+    def arg_strings(self) -> list[str]:
+        """The original, unconverted, argument strings."""
+        return self._arg_strings
+
+    def __len__(self) -> int:
+        return len(self._arg_strings)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return BulkArgs(self._arg_strings[index], self._convert)
+        value = self._arg_strings[index]
+        if self._convert is not None:
+            value = self._convert(value)
+        return value
+
+    def __repr__(self) -> str:
+        return f'<BulkArgs: {len(self)} items>'
+
+    def retarget(
+        self, trial: list[str], argv: list[str]
+    ) -> 'BulkArgs | None':
+        """Extend this instance to the end of argv.
+
+        Used by ArgparseApp while parsing.  The trial list is the start of
+        argv plus a final marker.  If this instance ends with that marker,
+        return a new instance with the same conversion, but covering all of
+        the items in argv from where this instance started.
+        """
+        if not self._arg_strings or self._arg_strings[-1] is not trial[-1]:
+            return None
+        start = len(trial) - len(self._arg_strings)
+        return BulkArgs(argv[start:], self._convert)
+
+
+class BulkAction(argparse.Action):
+    """Store trailing positional arguments as a BulkArgs instance.
+
+    Intended for commands that may be invoked with a very large number of
+    positional arguments, e.g., via xargs or find -exec.  ArgparseApp.run()
+    will split off such arguments cheaply rather than passing each one
+    through the general argparse machinery.
+
+    parser.add_argument('paths', action=app.BulkAction, type=pathlib.Path)
+
+    The type, if any, is applied lazily by BulkArgs rather than by argparse.
+    The resulting positional should be the last one for the parser.
+    """
+
+    def __init__(
+        self,
+        option_strings: list[str],
+        dest: str,
+        nargs: str = '*',
+        **kwargs
+    ):
+        """Thin Action wrapper.
+
+        Args:
+          option_strings: Passed directly to argparse.Action.
+          dest: Passed directly to argparse.Action.
+          nargs: Either '*' or '+'.
+          kwargs: Passed directly to argparse.Action, except for 'type',
+            which is used by BulkArgs.
+        """
+        self._convert = kwargs.pop('type', None)
+        super().__init__(option_strings, dest, nargs=nargs, **kwargs)
+
+    # The following ignore is for the 'values' parameter.
+    def __call__(  # type: ignore[override]
+            self,
+            parser: argparse.ArgumentParser,
+            namespace: argparse.Namespace,
+            values: list[str],
+            option_string: str | None = None):
+        setattr(namespace, self.dest, BulkArgs(values, self._convert))
+
+
+class _TrialFailed(Exception):
+    """A command parser ran into an error during a trial parse."""
+
+
+# Set while ArgparseApp._parse_args() tries its shortcut.
+_trial_parse: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    'mundane_trial_parse', default=False
+)
+
+
+class _CommandParser(argparse.ArgumentParser):
+    """An ArgumentParser that attaches its parents on demand.
+
+    With a plain ArgumentParser, every action from every parent is added to
+    the new parser when it is created.  When many commands share the same
+    parents, that is a lot of work for parsers that will never be used.
+
+    Instead, parents are kept by reference and only attached the first time
+    this parser is used to parse or format help.  The resulting order of
+    actions and groups is the same as if they were attached at creation.
+
+    As with a plain ArgumentParser, adding a flag that conflicts with one
+    from a parent raises argparse.ArgumentError right away.  Conflicts that
+    can only be found when attaching, such as between the parents, raise
+    Error, so that they are not reported as a usage error.
+
+    During a trial parse, errors raise _TrialFailed instead of exiting.
+    """
+
+    def __init__(
+        self,
+        *args,
+        parents: typing.Sequence[argparse.ArgumentParser] = (),
+        **kwargs
+    ):
+        self._pending_parents: list[argparse.ArgumentParser] = list()
+        super().__init__(*args, **kwargs)
+        self._pending_parents = list(parents)
+        for action in self._actions:
+            self._check_parent_conflicts(action)
+        self._pending_marks = self._marks()
+        self._attach_lock = threading.Lock()
+
+    def _add_action(self, action):
+        self._check_parent_conflicts(action)
+        return super()._add_action(action)
+
+    def _check_parent_conflicts(self, action: argparse.Action):
+        """Check an action against the parents not attached yet."""
+        conflicts: list[tuple[str, argparse.Action]] = list()
+        for parent in self._pending_parents:
+            existing = parent._option_string_actions  # pylint: disable=protected-access
+            conflicts.extend(
+                (option_string, existing[option_string])
+                for option_string in action.option_strings
+                if existing.get(option_string, action) is not action
+            )
+        if conflicts:
+            handler = self._get_handler()  # type: ignore[attr-defined]
+            handler(action, conflicts)
+
+    def _lists(self) -> list[list]:
+        """All of the lists whose order is affected by adding parents."""
+        lists: list[list] = [
+            self._actions, self._action_groups,
+            self._mutually_exclusive_groups
+        ]
+        lists.extend(
+            group._group_actions  # pylint: disable=protected-access
+            for group in self._action_groups
+        )
+        return lists
+
+    def _marks(self) -> list[int]:
+        """The current lengths of the lists from _lists()."""
+        return [len(items) for items in self._lists()]
+
+    def _attach_parents(self):
+        """Attach any pending parents as if done during __init__."""
+        if not self._pending_parents:
+            return
+
+        # Concurrent runs may share this parser, so only one attaches, and
+        # the others wait until it is done.
+        with self._attach_lock:
+            parents = self._pending_parents
+            if not parents:
+                return
+            pending_marks = self._marks()
+
+            for parent in parents:
+                try:
+                    self._add_container_actions(parent)
+                except argparse.ArgumentError as error:
+                    raise Error(
+                        f'{self.prog}: parents do not fit together: {error}'
+                    ) from error
+                defaults = parent._defaults  # pylint: disable=protected-access
+                for key, value in defaults.items():
+                    self._defaults.setdefault(key, value)
+
+            # Move everything just added to where it would have been if added
+            # during __init__.  Groups that came from the parents have no
+            # marks and are left alone.
+            for items, mark, pending in zip(self._lists(),
+                                            self._pending_marks,
+                                            pending_marks):
+                items[mark:] = items[pending:] + items[mark:pending]
+            self._pending_parents = []
+
+    def parse_known_args(self, *args, **kwargs):
+        self._attach_parents()
+        return super().parse_known_args(*args, **kwargs)
+
+    def format_usage(self):
+        self._attach_parents()
+        return super().format_usage()
+
+    def format_help(self):
+        self._attach_parents()
+        return super().format_help()
+
+    def error(self, message: str) -> typing.NoReturn:
+        if _trial_parse.get():
+            raise _TrialFailed(message)
+        super().error(message)
+
+
+class Namespace(argparse.Namespace):
+    """An argparse.Namespace that supports lazily created resources.
+
+    ArgparseApp.run() parses flags into an instance of this class.  After
+    parse hooks may then register factories for resources, such as database
+    connections, that are only created the first time the attribute is
+    accessed.  A command that never uses the resource never pays for it.
+
+    def init_db(args):
+        db_dir = args.db_dir
+        args.register_resource(
+            'dbc', lambda: contextlib.closing(connect(db_dir)))
+
+    A factory should return a context manager, and the attribute will be
+    whatever it returns when entered.  Entered resources are exited in
+    reverse order when the instance is closed, which ArgparseApp.run() does
+    after the command returns, even if it raised an exception.
+
+    Pickling, e.g., to send args to a worker process, keeps only the plain
+    attributes, including resources already created.  The copy has no
+    resources of its own to close.
+    """
+
+    __slots__ = ('_resources', '_stack', '_lock', '_exit_code')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._resources: dict[str,
+                              typing.Callable[[],
+                                              typing.ContextManager]] = dict()
+        self._stack = contextlib.ExitStack()
+        self._lock = threading.RLock()
+        self._exit_code: int | None = None
+
+    def __getattr__(self, name: str) -> typing.Any:
+        # Only called when normal lookup fails, including for unset slots.
+        if name in self.__slots__ or name not in self._resources:
+            raise AttributeError(name)
+        with self._lock:
+            if name not in vars(self):
+                value = self._stack.enter_context(self._resources[name]())
+                setattr(self, name, value)
+        return vars(self)[name]
+
+    def __reduce__(self) -> tuple[typing.Any, ...]:
+        return (type(self), (), vars(self).copy())
+
+    def __enter__(self) -> 'Namespace':
+        return self
+
+    def __exit__(self, *exc_details) -> bool | None:
+        return self._stack.__exit__(*exc_details)
+
+    def register_resource(
+        self, name: str, factory: typing.Callable[[], typing.ContextManager]
+    ):
+        """Register a factory for a lazily created attribute.
+
+        Args:
+          name: The attribute name.
+          factory: Called with no arguments the first time the attribute is
+            accessed.  It should return a context manager.
+
+        Raises:
+          ExistingResource: If the attribute or resource already exists.
+        """
+        if name in vars(self) or name in self._resources:
+            raise ExistingResource(name)
+        self._resources[name] = factory
+
+    def enter_context(self, manager: typing.ContextManager) -> typing.Any:
+        """Enter a context manager now and exit it when this is closed.
+
+        Useful for after parse hooks that need something running for the
+        duration of the command, rather than created on demand.
+
+        Args:
+          manager: The context manager to enter.
+
+        Returns:
+          The result of entering the context manager.
+        """
+        return self._stack.enter_context(manager)
+
+    def close(self):
+        """Exit all created resources in reverse order."""
+        self._stack.close()
+
+    def exit_code(self) -> int | None:
+        """The exit code of the command, once it returned.
+
+        Resources may use this when they are closed, e.g., to only clean up
+        after the command succeeded.  None if the command has not returned,
+        including when it raised an exception.
+        """
+        return self._exit_code
+
+    def set_exit_code(self, code: int):
+        """Record the exit code of the command, as ArgparseApp.run() does."""
+        self._exit_code = code
+
+
 CommandFunc: typing.TypeAlias = typing.Callable[[argparse.Namespace], int]
 NamespaceHook: typing.TypeAlias = typing.Callable[[argparse.Namespace], None]
 SubParser: typing.TypeAlias = argparse._SubParsersAction  # pylint: disable=protected-access
 
 
+class _AfterParseHook(typing.NamedTuple):
+    """An after parse hook and its declared dependencies."""
+    func: NamespaceHook
+    provides: frozenset[str]
+    requires: frozenset[str]
+
+
 def _usage(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
     """A function called simply to display help output."""
     del args
@@ -148,7 +511,23 @@ def _usage(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
     return os.EX_USAGE
 
 
-class ArgparseApp:
+def _exit_code(error: SystemExit) -> int:
+    """Convert a SystemExit into an exit code, like the interpreter does."""
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+def _call_traced(func: typing.Callable, args: argparse.Namespace):
+    """Call a hook or command inside a trace span named after it."""
+    with trace.span(getattr(func, '__qualname__', repr(func))):
+        return func(args)
+
+
+class ArgparseApp:  # pylint: disable=too-many-public-methods,too-many-instance-attributes
     """Facilitate creating an argparse based application.
 
     This class attempts to make it easier to build applications using argparse
@@ -188,6 +567,8 @@ class ArgparseApp:
     * Add any parsers that may be shared between command by calling the
       register_shared_flags() method
     * Add any commands by calling the register_commands() method
+    * Add any commands from installed plugins by calling the
+      register_plugins() method
     * Execute the command the user requested by calling the run() method
 
     Since this is just a thin wrapper around argparse, everything can be
@@ -219,10 +600,17 @@ class ArgparseApp:
 
     GLOBAL_FLAGS = 'Global flags'
 
+    # When there are more trailing positionals than BULK_THRESHOLD, only the
+    # first BULK_LOOKAHEAD of them are parsed to see if they land in a
+    # BulkAction.
+    BULK_THRESHOLD = 256
+    BULK_LOOKAHEAD = 16
+
     def __init__(
         self,
         use_log_mgr: bool = False,
         use_docstring_for_description: typing.Any | None = None,
+        use_signals: bool = False,
         **kwargs: typing.Unpack[_ArgparseKwargs]
     ):
         """Initialize with the application.
@@ -230,11 +618,15 @@ class ArgparseApp:
         Args:
           use_log_mgr: Automatically add log_mgr's global flags and activate
             its logging configuration.
+          use_signals: While run() is executing in the main thread, SIGUSR1
+            logs the stacks of all threads and resource usage, and SIGUSR2
+            cycles the root log level.
           use_docstring_for_description: Any object with a docstring (module,
             function, etc).  Will be the initial source for the description
             kwarg passed to ArgumentParser().
           kwargs: Passed directly to ArgumentParser().
         """
+        self._use_signals = use_signals
         parser_args: _ArgparseKwargs = {
             'formatter_class': argparse.RawDescriptionHelpFormatter,
             'add_help': False,
@@ -252,7 +644,13 @@ class ArgparseApp:
         )
         self._global_flags.add_argument('-h', '--help', action='help')
         self._shared_parsers: dict[str, argparse.ArgumentParser] = dict()
-        self._after_parse_hooks: list[NamespaceHook] = list()
+        self._after_parse_hooks: list[_AfterParseHook] = list()
+        self._deadlines: dict[CommandFunc, float] = dict()
+        self._cache_policies: dict[CommandFunc,
+                                   result_cache.CachePolicy] = dict()
+        # Command names of plugins not loaded yet, and their modules.
+        self._plugins: dict[str, str] = dict()
+        self._plugins_lock = threading.Lock()
 
         if use_log_mgr:
             log_mgr.activate(self.appname, self.dirs.user_log_dir)
@@ -301,12 +699,29 @@ class ArgparseApp:
         """Accessor for a consistent PlatformsDirs."""
         return platformdirs.PlatformDirs(appname=self.appname)
 
+    @functools.cached_property
+    def cache(self) -> kv_cache.KVCache:
+        """A key/value cache under the user cache dir, shared by all runs."""
+        return kv_cache.KVCache(
+            os.path.join(self.dirs.user_cache_dir, 'cache.mmap'),
+            kv_cache.MAX_BYTES
+        )
+
+    @functools.cached_property
+    def command_cache(self) -> result_cache.ResultCache:
+        """Where results of commands registered with a cache are kept."""
+        return result_cache.ResultCache(
+            os.path.join(self.dirs.user_cache_dir, 'results'),
+            result_cache.MAX_BYTES
+        )
+
     def new_subparser(self, parser: argparse.ArgumentParser) -> SubParser:
         """Attach a new subparser to an existing parser.
 
         This allows for sub-subcommands.
         """
         return parser.add_subparsers(
+            parser_class=_CommandParser,
             title='Commands',
             dest='name',
             metavar='<command>',
@@ -322,6 +737,24 @@ class ArgparseApp:
         """
         return argparse.ArgumentParser(add_help=False)
 
+    def new_progress(
+        self,
+        name: str,
+        total: int | None = None,
+        total_bytes: int | None = None,
+        interval: float = progress.LOG_INTERVAL
+    ) -> progress.Progress:
+        """Return a new progress reporter for a long running command.
+
+        with my_app.new_progress('records', total=len(records)) as prog:
+            for record in records:
+                ...
+                prog.advance(nbytes=len(record))
+
+        See progress.Progress for details.
+        """
+        return progress.Progress(name, total, total_bytes, interval)
+
     def new_shared_parser(self, name: str) -> argparse.ArgumentParser | None:
         """Register and return a new parser iff it does not already exist.
 
@@ -402,14 +835,19 @@ class ArgparseApp:
             raise MissingParser(name)
         return parser
 
-    def register_after_parse_hook(self, func: NamespaceHook) -> None:
+    def register_after_parse_hook(
+        self,
+        func: NamespaceHook,
+        provides: typing.Iterable[str] = (),
+        requires: typing.Iterable[str] = ()
+    ) -> None:
         """Register a function to be called after parsing flags.
 
         This method is typically called from any module's hook that this class
         calls.
 
-        These hooks are called in the order they were registered after flags
-        are parsed and before the selected command is executed.
+        By default, these hooks are called in the order they were registered
+        after flags are parsed and before the selected command is executed.
 
         They can be used for a variety of things:
 
@@ -419,17 +857,42 @@ class ArgparseApp:
         * Adding properties, perhaps based on other flags, such as a database
           connection singleton
 
+        Hooks may optionally declare names of things they provide and
+        require, typically properties added to the Namespace.  Such hooks are
+        only ordered by those dependencies, and independent ones are run
+        concurrently in a thread pool.  A hook that declares neither acts as
+        a barrier: it runs after every hook registered before it, and before
+        every hook registered after it.  Barriers run on the calling thread.
+
+        my_app.register_after_parse_hook(load_config, provides=['config'])
+        my_app.register_after_parse_hook(init_db, provides=['dbc'],
+                                         requires=['config'])
+        my_app.register_after_parse_hook(warm_cache, requires=['config'])
+
+        If any hook raises an exception, no further hooks are started, and the
+        exception is raised once running hooks are finished.  An
+        argparse.ArgumentError is reported as a usage error instead, as if
+        argparse had raised it.
+
         Args:
             func: The function to register.
+            provides: Names of things this hook provides.
+            requires: Names of things provided by other hooks that this hook
+              needs to run first.
         """
-        self._after_parse_hooks.append(func)
+        self._after_parse_hooks.append(
+            _AfterParseHook(func, frozenset(provides), frozenset(requires))
+        )
 
-    def register_command(
+    def register_command(  # pylint: disable=too-many-arguments
         self,
         func: CommandFunc,
         name: str | None = None,
         usage_only: bool = False,
         subparser: SubParser | None = None,
+        *,
+        deadline: float | None = None,
+        cache: result_cache.CachePolicy | None = None,
         **kwargs
     ) -> argparse.ArgumentParser:
         """Register a specific command.
@@ -451,6 +914,10 @@ class ArgparseApp:
 
         my_app.register_command(uncool_command)
 
+        Any parents, such as shared parsers, are kept by reference and their
+        flags are only attached to the new parser when it is actually used.
+        So sharing a parser across many commands is cheap.
+
 
         Args:
             func: The function to register.
@@ -460,6 +927,10 @@ class ArgparseApp:
               display usage information and the registered function will not
               be called.
             subparser: The command will be attached to this subparser.
+            deadline: Default number of seconds the command may run.  Only
+              enforced when the watchdog module is registered.
+            cache: Replay the output of earlier runs with the same flags and
+              inputs, instead of calling the command again.
             kwargs: Passed directly to add_parser()
 
         Returns:
@@ -485,9 +956,17 @@ class ArgparseApp:
             parser.set_defaults(func=lambda x, y=parser: _usage(x, y))
         else:
             parser.set_defaults(func=func)
+        if deadline is not None:
+            self._deadlines[func] = deadline
+        if cache is not None:
+            self._cache_policies[func] = cache
 
         return parser
 
+    def command_deadline(self, func: CommandFunc) -> float | None:
+        """The deadline registered with a command, if any."""
+        return self._deadlines.get(func)
+
     def _register_module_via_hooks(
         self, hook_name: str, modules: typing.Iterable[types.ModuleType]
     ):
@@ -495,7 +974,8 @@ class ArgparseApp:
         for module in modules:
             register_func = getattr(module, hook_name, None)
             if register_func:
-                register_func(self)
+                with trace.span(hook_name, module=module.__name__):
+                    register_func(self)
 
     def register_global_flags(
         self, modules: typing.Iterable[types.ModuleType]
@@ -566,25 +1046,257 @@ class ArgparseApp:
         """
         self._register_module_via_hooks('mundane_commands', modules)
 
+    def register_plugins(self, group: str = plugins.GROUP):
+        """Register commands provided by plugins via entry points.
+
+        Each entry point in the group names a command and the module with the
+        hooks that register it.  See the plugins module for details.
+
+        Until one of its commands is used, a plugin's module is not imported,
+        and its commands are listed with placeholder help.  Once used, the
+        module is processed like register_global_flags(),
+        register_shared_flags() and register_commands() would.  So any global
+        flags it adds are only available alongside its commands.
+
+        Args:
+            group: The entry point group to use.
+        """
+        for name, module_name in plugins.discover(self.cache, group):
+            if name in self.subparser.choices:
+                logging.warning(
+                    'Ignoring plugin command %s from %s, as it already exists',
+                    name, module_name
+                )
+                continue
+            self._plugins[name] = module_name
+            self.subparser.add_parser(name, help=f'From plugin {module_name}')
+
+    def _load_plugins(self, argv: list[str]):
+        """Import the modules of any plugin commands used in argv."""
+        module_names = sorted(
+            set(self._plugins[arg] for arg in argv if arg in self._plugins)
+        )
+        for module_name in module_names:
+            for name, value in list(self._plugins.items()):
+                if value == module_name:
+                    del self._plugins[name]
+                    # pylint: disable=protected-access
+                    del self.subparser._name_parser_map[name]
+                    self.subparser._choices_actions = [
+                        action for action in self.subparser._choices_actions
+                        if action.dest != name
+                    ]
+            module = importlib.import_module(module_name)
+            self.register_global_flags([module])
+            self.register_shared_flags([module])
+            self.register_commands([module])
+
+    @trace.traced('parse_args')
+    def _parse_args(self, argv: list[str] | None) -> Namespace:
+        """Parse flags, taking a shortcut for many trailing positionals.
+
+        If argv ends with a long run of positionals, only the first few of
+        them are parsed, followed by a unique marker.  If the marker ends up
+        in a BulkArgs, then all of the remaining positionals would as well,
+        so they are handed over directly.  Otherwise, including when the
+        marker is rejected, e.g., by the type of a plain positional, fall
+        back to parsing all of argv normally.
+        """
+        if argv is None:
+            argv = sys.argv[1:]
+        if self._plugins:
+            with self._plugins_lock:
+                self._load_plugins(argv)
+
+        prefix_chars = self._parser.prefix_chars
+        start = len(argv)
+        while start:
+            arg = argv[start - 1]
+            if arg and arg[0] in prefix_chars:
+                break
+            start -= 1
+
+        if len(argv) - start > self.BULK_THRESHOLD:
+            # The marker is a new string object, so it can be found by
+            # identity.
+            trial = argv[:start + self.BULK_LOOKAHEAD]
+            trial.append(''.join(('<', 'bulk', '>')))
+            token = _trial_parse.set(True)
+            try:
+                args, extras = self._parser.parse_known_args(
+                    trial, Namespace()
+                )
+            except _TrialFailed:
+                extras = trial
+            finally:
+                _trial_parse.reset(token)
+            if not extras:
+                for dest, value in vars(args).items():
+                    if isinstance(value, BulkArgs):
+                        bulk = value.retarget(trial, argv)
+                        if bulk is not None:
+                            setattr(args, dest, bulk)
+                            return args
+
+        return self._parser.parse_args(argv, Namespace())
+
+    def _after_parse_hooks_sorter(self) -> graphlib.TopologicalSorter:
+        """Build a sorter for the after parse hooks using their indexes."""
+        hooks = self._after_parse_hooks
+        providers = collections.defaultdict(set)
+        for index, hook in enumerate(hooks):
+            for name in hook.provides:
+                providers[name].add(index)
+
+        sorter: graphlib.TopologicalSorter = graphlib.TopologicalSorter()
+        barrier = None
+        for index, hook in enumerate(hooks):
+            if hook.provides or hook.requires:
+                deps = set()
+                for name in hook.requires:
+                    if name not in providers:
+                        raise MissingProvider(name, hook.func)
+                    deps.update(providers[name])
+                if barrier is not None:
+                    deps.add(barrier)
+            else:
+                deps = set(range(index))
+                barrier = index
+            sorter.add(index, *deps)
+        sorter.prepare()
+
+        return sorter
+
+    def _run_after_parse_hooks(self, args: argparse.Namespace):
+        """Run the after parse hooks, respecting any dependencies."""
+        hooks = self._after_parse_hooks
+        if not any(hook.provides or hook.requires for hook in hooks):
+            for hook in hooks:
+                _call_traced(hook.func, args)
+            return
+
+        sorter = self._after_parse_hooks_sorter()
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            running: dict[concurrent.futures.Future, int] = dict()
+            try:
+                while sorter.is_active():
+                    for index in sorter.get_ready():
+                        if not (hooks[index].provides
+                                or hooks[index].requires):
+                            # A barrier runs alone, so it stays on the calling
+                            # thread, where it may, e.g., set signal handlers.
+                            _call_traced(hooks[index].func, args)
+                            sorter.done(index)
+                            continue
+                        # Hooks see the context of this run, such as the
+                        # streams of run_embedded().
+                        future = executor.submit(
+                            contextvars.copy_context().run, _call_traced,
+                            hooks[index].func, args
+                        )
+                        running[future] = index
+                    done, _ = concurrent.futures.wait(
+                        running,
+                        return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        future.result()
+                        sorter.done(running.pop(future))
+            finally:
+                for future in running:
+                    future.cancel()
+
+    @contextlib.contextmanager
+    def _signal_handlers(self) -> typing.Iterator[None]:
+        """Install the use_signals handlers for the duration of a run."""
+        handlers: dict[signal.Signals, typing.Callable] = dict()
+        if self._use_signals and (threading.current_thread()
+                                  is threading.main_thread()):
+            handlers[signal.SIGUSR1] = log_mgr.log_stacks_and_usage
+            handlers[signal.SIGUSR2] = log_mgr.cycle_root_log_level
+
+        previous = {
+            signum: signal.signal(signum, handler)
+            for signum, handler in handlers.items()
+        }
+        try:
+            yield
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler or signal.SIG_DFL)
+
     def run(self, argv: list[str] | None = None) -> int:
-        """Execute the selected function."""
-        args = self.parser.parse_args(argv)
-
-        for hook in self._after_parse_hooks:
-            hook(args)
-
-        ret = os.EX_USAGE
-        if hasattr(args, 'func'):
-            logging.debug('Calling %s with %s', args.func, args)
-            ret = args.func(args)
-            logging.debug(
-                'Max memory used: %s',
-                humanize.naturalsize(
-                    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        """Execute the selected function.
+
+        Flags are parsed into a Namespace instance.  Any resources registered
+        on it are closed after the selected function returns, and can see its
+        exit code.
+        """
+        with self._signal_handlers(), self._parse_args(argv) as args:
+            try:
+                self._run_after_parse_hooks(args)
+            except argparse.ArgumentError as error:
+                self.parser.error(str(error))
+
+            ret = os.EX_USAGE
+            if hasattr(args, 'func'):
+                logging.debug('Calling %s with %s', args.func, args)
+                func = args.func
+                policy = self._cache_policies.get(func)
+                if policy is not None:
+                    func = self.command_cache.wrap(func, policy)
+                ret = _call_traced(func, args)
+                logging.debug(
+                    'Max memory used: %s',
+                    humanize.naturalsize(
+                        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    )
                 )
-            )
-            logging.debug('Finished. (%d)', ret or 0)
-        else:
-            self.parser.print_help()
+                logging.debug('Finished. (%d)', ret or 0)
+            else:
+                self.parser.print_help()
+            args.set_exit_code(ret or 0)
 
         return ret
+
+    def run_embedded(
+        self,
+        argv: list[str],
+        *,
+        stdout: typing.TextIO | None = None,
+        stderr: typing.TextIO | None = None,
+        log_level: int | str | None = None
+    ) -> int:
+        """Like run(), but safe to call concurrently from many threads.
+
+        This is meant for services that embed an app, and run a command per
+        request, without starting a process for each.
+
+        Anything written to sys.stdout and sys.stderr during the call,
+        including help and usage errors, goes to the given streams.  The log
+        level, whether given here or by the --log-level flag, only applies
+        to records logged during the call.  See log_mgr.call_log_level() for
+        how this affects the root logger.  Flags that would change process
+        wide settings, like --log-dir, --nice or --trace, are usage errors.
+        Instead of exiting, e.g., after --help, the exit code is returned.
+
+        Commands and after parse hooks are still responsible for their own
+        side effects.  For example, a deadline registered with a command
+        still ends the whole process when it expires.
+
+        Args:
+          argv: As per run(), except that sys.argv is never used.
+          stdout: Where this call writes its output.  If None, unchanged.
+          stderr: Where this call writes its errors.  If None, unchanged.
+          log_level: The initial log level for this call.  Defaults to the
+            root log level.
+
+        Returns:
+          The exit code.
+        """
+        with embed.redirect(stdout,
+                            stderr), log_mgr.call_log_level(log_level):
+            try:
+                return self.run(argv)
+            except SystemExit as error:
+                return _exit_code(error)
@@ -3,11 +3,16 @@
 
 import contextlib
 import io
-import logging
+import logging.handlers
 import os
+import pickle
+import signal
 import sys
 import textwrap
+import threading
+import time
 import unittest
+from unittest import mock
 
 from mundane import app
 from mundane.test_data import flags_one
@@ -15,6 +20,10 @@ from mundane.test_data import flags_three
 from mundane.test_data import flags_two
 
 
+class Error(Exception):
+    """Base module exception."""
+
+
 def munge_expected(old_s: str) -> str:
     """Modify a multiple line string in a standard way.
 
@@ -427,7 +436,8 @@ class ArgparseAppParsingWithLogMgrTest(BaseApp):
         expected = munge_expected(
             f"""
             usage: test_dash_h [-h] [-L {log_levels}]
-                               [--log-dir LOG_DIR]
+                               [--log-dir LOG_DIR] [--stderr-level LEVEL]
+                               [--vmodule PATTERN=LEVEL,...]
 
             Global flags:
               -h, --help
@@ -435,6 +445,9 @@ class ArgparseAppParsingWithLogMgrTest(BaseApp):
                                     Minimal log level (Default: WARNING)
               --log-dir LOG_DIR     Logging directory (Default:
                                     {log_dir})
+              --stderr-level LEVEL  Also log to stderr at or above this level
+              --vmodule PATTERN=LEVEL,...
+                                    Module logger levels, not root
             """
         )
         self.assertEqual(self.stdout.getvalue(), expected)
@@ -1322,5 +1335,980 @@ class ArgparseAppRunCommandTest(BaseApp):
         self.assertEqual(result.exception.code, 0)
 
 
+class ArgparseAppSharedParentsTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        self.my_app = app.ArgparseApp()
+        self.shared = self.my_app.safe_new_shared_parser('shared')
+        self.shared.add_argument('--alpha', default='a', help='First.')
+        group = self.shared.add_argument_group('Shared group')
+        group.add_argument('--beta', help='Second.')
+        mutex = self.shared.add_mutually_exclusive_group()
+        mutex.add_argument('--gamma', action='store_true')
+        mutex.add_argument('--delta', action='store_true')
+        self.shared.set_defaults(color='red', shade='dark')
+
+    def cmd(self, args):
+        """A command."""
+        del args
+        return 0
+
+    def build(self, my_app, subparser=None, name=None):
+        """Register a command with parents and its own flags."""
+        parser = my_app.register_command(
+            self.cmd, name=name, subparser=subparser, parents=[self.shared]
+        )
+        parser.add_argument('--own', help='Its own.')
+        group = parser.add_argument_group('Own group')
+        group.add_argument('--zeta')
+        parser.add_argument('target')
+        parser.set_defaults(color='blue')
+        return parser
+
+    def test_same_as_eager(self):
+        eager_app = app.ArgparseApp()
+        eager = self.build(eager_app, eager_app.parser.add_subparsers())
+        lazy = self.build(self.my_app)
+
+        self.assertIsInstance(lazy, app._CommandParser)  # pylint: disable=protected-access
+        self.assertNotIsInstance(eager, app._CommandParser)  # pylint: disable=protected-access
+
+        self.assertEqual(lazy.format_usage(), eager.format_usage())
+        self.assertEqual(lazy.format_help(), eager.format_help())
+
+        argv = '--gamma --beta b --zeta z --own o tgt'.split()
+        self.assertEqual(lazy.parse_args(argv), eager.parse_args(argv))
+        self.assertEqual(
+            vars(lazy.parse_args(['t'])), {
+                'alpha': 'a',
+                'beta': None,
+                'gamma': False,
+                'delta': False,
+                'own': None,
+                'zeta': None,
+                'target': 't',
+                'color': 'blue',
+                'shade': 'dark',
+                'func': self.cmd,
+            }
+        )
+
+    def test_attached_on_demand(self):
+        parsers = [self.build(self.my_app, name=f'cmd{x}') for x in range(3)]
+
+        for parser in parsers:
+            self.assertNotIn('--alpha', parser._option_string_actions)  # pylint: disable=protected-access
+
+        with contextlib.redirect_stdout(
+                self.stdout), contextlib.redirect_stderr(self.stderr):
+            ret = self.my_app.run(['cmd2', '--alpha', 'x', 't'])
+
+        self.assertEqual(ret, 0)
+        self.assertIn('--alpha', parsers[2]._option_string_actions)  # pylint: disable=protected-access
+        self.assertNotIn('--alpha', parsers[0]._option_string_actions)  # pylint: disable=protected-access
+
+        # A second use does nothing new
+        self.assertEqual(parsers[2].parse_args(['t']).alpha, 'a')
+
+    def test_attached_once_when_racing(self):
+        parser = self.build(self.my_app)
+        real_lock = parser._attach_lock  # pylint: disable=protected-access
+
+        @contextlib.contextmanager
+        def other_thread_first():
+            # Another run attached the parents while this one waited.
+            parser._attach_lock = real_lock  # pylint: disable=protected-access
+            parser._attach_parents()  # pylint: disable=protected-access
+            yield
+
+        parser._attach_lock = other_thread_first()  # pylint: disable=protected-access
+
+        self.assertEqual(parser.parse_args(['--alpha', 'x', 't']).alpha, 'x')
+        self.assertEqual(
+            parser.format_help().count('--alpha'), 2, parser.format_help()
+        )
+
+    def test_conflict_found_when_added(self):
+        parser = self.build(self.my_app)
+
+        with self.assertRaisesRegex(app.argparse.ArgumentError,
+                                    'conflicting option string: --alpha'):
+            parser.add_argument('--alpha')
+
+    def test_conflict_with_help(self):
+        helpful = app.argparse.ArgumentParser()
+
+        with self.assertRaisesRegex(app.argparse.ArgumentError,
+                                    'conflicting option strings: -h, --help'):
+            self.my_app.register_command(self.cmd, parents=[helpful])
+
+    def test_conflict_between_parents(self):
+        other = self.my_app.safe_new_shared_parser('other')
+        other.add_argument('--beta')
+        self.my_app.register_command(self.cmd, parents=[self.shared, other])
+
+        with self.assertRaisesRegex(app.Error,
+                                    'cmd: parents do not fit together'):
+            self.my_app.run(['cmd'])
+
+
+class ArgparseAppAfterParseHooksTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        self.my_app = app.ArgparseApp()
+        self.calls = list()
+        self.my_app.parser.set_defaults(func=self.command)
+
+    def command(self, args):
+        """Record being called."""
+        del args
+        self.calls.append('command')
+        return 0
+
+    def hook(self, name, raises=None, barrier=None):
+        """Make a hook that records being called."""
+
+        def func(args):
+            if barrier:
+                barrier.wait()
+            self.calls.append(name)
+            setattr(args, name, True)
+            if raises:
+                raise raises
+
+        return func
+
+    def test_undeclared_in_order(self):
+        for name in 'abc':
+            self.my_app.register_after_parse_hook(self.hook(name))
+
+        self.assertEqual(self.my_app.run([]), 0)
+
+        self.assertEqual(self.calls, ['a', 'b', 'c', 'command'])
+
+    def test_dependency_order(self):
+        self.my_app.register_after_parse_hook(
+            self.hook('db'), provides=['db'], requires=['config']
+        )
+        self.my_app.register_after_parse_hook(
+            self.hook('cache'), requires=['db', 'config']
+        )
+        self.my_app.register_after_parse_hook(
+            self.hook('config'), provides=['config']
+        )
+
+        self.assertEqual(self.my_app.run([]), 0)
+
+        self.assertEqual(self.calls, ['config', 'db', 'cache', 'command'])
+
+    def test_concurrent(self):
+        # Each hook blocks until all are running at the same time.
+        barrier = threading.Barrier(3, timeout=10)
+        for name in 'abc':
+            self.my_app.register_after_parse_hook(
+                self.hook(name, barrier=barrier), provides=[name]
+            )
+
+        self.assertEqual(self.my_app.run([]), 0)
+
+        self.assertEqual(sorted(self.calls[:3]), ['a', 'b', 'c'])
+        self.assertEqual(self.calls[3], 'command')
+
+    def test_undeclared_is_barrier(self):
+        self.my_app.register_after_parse_hook(self.hook('a'), provides=['a'])
+        self.my_app.register_after_parse_hook(self.hook('b'))
+        self.my_app.register_after_parse_hook(self.hook('c'), provides=['c'])
+
+        self.assertEqual(self.my_app.run([]), 0)
+
+        self.assertEqual(self.calls, ['a', 'b', 'c', 'command'])
+
+    def test_barrier_on_calling_thread(self):
+        threads = dict()
+
+        def record_thread(name):
+
+            def func(args):
+                del args
+                threads[name] = threading.current_thread()
+
+            return func
+
+        self.my_app.register_after_parse_hook(
+            record_thread('declared'), provides=['declared']
+        )
+        self.my_app.register_after_parse_hook(record_thread('barrier'))
+
+        self.assertEqual(self.my_app.run([]), 0)
+
+        self.assertIsNot(threads['declared'], threading.current_thread())
+        self.assertIs(threads['barrier'], threading.current_thread())
+
+    def test_failure_stops_run(self):
+        self.my_app.register_after_parse_hook(
+            self.hook('a', raises=Error('oops')), provides=['a']
+        )
+        self.my_app.register_after_parse_hook(self.hook('b'), requires=['a'])
+
+        with self.assertRaisesRegex(Error, 'oops'):
+            self.my_app.run([])
+
+        self.assertEqual(self.calls, ['a'])
+
+    def test_missing_provider(self):
+        self.my_app.register_after_parse_hook(self.hook('a'), requires=['x'])
+
+        with self.assertRaises(app.MissingProvider):
+            self.my_app.run([])
+
+        self.assertEqual(self.calls, [])
+
+    def test_cycle(self):
+        self.my_app.register_after_parse_hook(
+            self.hook('a'), provides=['a'], requires=['b']
+        )
+        self.my_app.register_after_parse_hook(
+            self.hook('b'), provides=['b'], requires=['a']
+        )
+
+        with self.assertRaises(app.graphlib.CycleError):
+            self.my_app.run([])
+
+        self.assertEqual(self.calls, [])
+
+
+class NamespaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.events = list()
+        self.args = app.Namespace(flag='value')
+
+    def resource(self, name):
+        """Make a resource factory that records events."""
+
+        @contextlib.contextmanager
+        def factory():
+            self.events.append(f'open {name}')
+            try:
+                yield f'{name} resource'
+            finally:
+                self.events.append(f'close {name}')
+
+        return factory
+
+    def test_plain_namespace(self):
+        self.assertEqual(self.args.flag, 'value')
+        self.assertEqual(vars(self.args), {'flag': 'value'})
+        self.assertEqual(repr(self.args), "Namespace(flag='value')")
+        self.assertFalse(hasattr(self.args, 'missing'))
+
+    def test_lazy(self):
+        self.args.register_resource('one', self.resource('one'))
+        self.args.register_resource('two', self.resource('two'))
+
+        self.assertEqual(self.events, [])
+        self.assertEqual(vars(self.args), {'flag': 'value'})
+
+        self.assertEqual(self.args.one, 'one resource')
+        self.assertEqual(self.args.one, 'one resource')
+
+        self.assertEqual(self.events, ['open one'])
+        self.assertEqual(
+            vars(self.args), {
+                'flag': 'value',
+                'one': 'one resource'
+            }
+        )
+
+    def test_exit_code(self):
+        self.assertIsNone(self.args.exit_code())
+
+        self.args.set_exit_code(3)
+
+        self.assertEqual(self.args.exit_code(), 3)
+        self.assertEqual(vars(self.args), {'flag': 'value'})
+
+    def test_pickle(self):
+        self.args.register_resource('one', self.resource('one'))
+        self.args.register_resource('two', self.resource('two'))
+        self.assertEqual(self.args.one, 'one resource')
+
+        copy = pickle.loads(pickle.dumps(self.args))
+
+        self.assertIsInstance(copy, app.Namespace)
+        self.assertEqual(copy, self.args)
+        self.assertFalse(hasattr(copy, 'two'))
+        copy.close()
+        self.assertEqual(self.events, ['open one'])
+
+    def test_close_in_reverse(self):
+        with self.args as args:
+            for name in ('one', 'two', 'three'):
+                args.register_resource(name, self.resource(name))
+            self.assertEqual(args.three, 'three resource')
+            self.assertEqual(args.one, 'one resource')
+
+        self.assertEqual(
+            self.events,
+            ['open three', 'open one', 'close one', 'close three']
+        )
+
+    def test_close(self):
+        self.args.register_resource('one', self.resource('one'))
+        self.assertEqual(self.args.one, 'one resource')
+
+        self.args.close()
+
+        self.assertEqual(self.events, ['open one', 'close one'])
+
+    def test_existing(self):
+        self.args.register_resource('one', self.resource('one'))
+
+        with self.assertRaises(app.ExistingResource):
+            self.args.register_resource('one', self.resource('one'))
+        with self.assertRaises(app.ExistingResource):
+            self.args.register_resource('flag', self.resource('flag'))
+
+    def test_concurrent_access(self):
+        barrier = threading.Barrier(4, timeout=10)
+        results = list()
+
+        @contextlib.contextmanager
+        def slow():
+            self.events.append('open')
+            # Give the other threads time to wait on the lock
+            time.sleep(0.05)
+            yield 'slow resource'
+
+        def access():
+            barrier.wait()
+            results.append(self.args.slow)
+
+        self.args.register_resource('slow', slow)
+        threads = [threading.Thread(target=access) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.events, ['open'])
+        self.assertEqual(results, ['slow resource'] * 4)
+
+    def test_slots(self):
+        # Uninitialized slots should not confuse __getattr__
+        args = app.Namespace.__new__(app.Namespace)
+
+        self.assertFalse(hasattr(args, 'anything'))
+
+
+class ArgparseAppResourcesTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        self.events = list()
+        self.my_app = app.ArgparseApp()
+        self.my_app.register_after_parse_hook(self.hook)
+        parser = self.my_app.register_command(self.use_db)
+        parser.add_argument('--fail', action='store_true')
+        self.my_app.register_command(self.ignore_db)
+
+    @contextlib.contextmanager
+    def connect(self):
+        """A pretend database connection."""
+        self.events.append('connect')
+        try:
+            yield 'dbc'
+        finally:
+            self.events.append('disconnect')
+
+    def hook(self, args):
+        """Register the database."""
+        args.register_resource('dbc', self.connect)
+
+    def use_db(self, args):
+        """A command that uses the database."""
+        self.events.append(args.dbc)
+        if args.fail:
+            raise Error('failed')
+        return 0
+
+    def ignore_db(self, args):
+        """A command that does not use the database."""
+        del args
+        self.events.append('ignored')
+        return 0
+
+    def test_used(self):
+        self.assertEqual(self.my_app.run(['use-db']), 0)
+
+        self.assertEqual(self.events, ['connect', 'dbc', 'disconnect'])
+
+    def test_unused(self):
+        self.assertEqual(self.my_app.run(['ignore-db']), 0)
+
+        self.assertEqual(self.events, ['ignored'])
+
+    def test_closed_on_error(self):
+        with self.assertRaisesRegex(Error, 'failed'):
+            self.my_app.run(['use-db', '--fail'])
+
+        self.assertEqual(self.events, ['connect', 'dbc', 'disconnect'])
+
+
+class BulkArgsTest(unittest.TestCase):
+
+    def test_sequence(self):
+        bulk = app.BulkArgs(['1', '2', '3'])
+
+        self.assertEqual(len(bulk), 3)
+        self.assertEqual(bulk[0], '1')
+        self.assertEqual(bulk[-1], '3')
+        self.assertEqual(list(bulk), ['1', '2', '3'])
+        self.assertEqual(bulk.arg_strings, ['1', '2', '3'])
+        self.assertEqual(repr(bulk), '<BulkArgs: 3 items>')
+
+    def test_lazy_conversion(self):
+        calls = list()
+
+        def convert(value):
+            calls.append(value)
+            return int(value)
+
+        bulk = app.BulkArgs(['1', '2', 'three'], convert)
+
+        self.assertEqual(calls, [])
+        self.assertEqual(bulk[1], 2)
+        self.assertEqual(calls, ['2'])
+        with self.assertRaises(ValueError):
+            list(bulk)
+
+    def test_slice(self):
+        bulk = app.BulkArgs(['1', '2', '3'], int)
+
+        part = bulk[1:]
+
+        self.assertIsInstance(part, app.BulkArgs)
+        self.assertEqual(list(part), [2, 3])
+
+    def test_retarget(self):
+        argv = ['cmd', 'a', 'b', 'c', 'd']
+        marker = ''.join(('x', 'y'))
+        trial = argv[:3] + [marker]
+
+        self.assertIsNone(app.BulkArgs([]).retarget(trial, argv))
+        self.assertIsNone(app.BulkArgs(['a', 'b']).retarget(trial, argv))
+        self.assertIsNone(
+            app.BulkArgs(['a', 'b', 'xy']).retarget(trial, argv)
+        )
+
+        bulk = app.BulkArgs(['b', marker], str.upper).retarget(trial, argv)
+
+        self.assertEqual(list(bulk), ['B', 'C', 'D'])
+
+
+class ArgparseAppBulkTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        self.my_app = app.ArgparseApp()
+        self.my_app.global_flags.add_argument(
+            '--verbose', action='store_true'
+        )
+        self.results = list()
+
+        def bulk(args):
+            """Takes many paths."""
+            self.results.append(args)
+            return 0
+
+        parser = self.my_app.register_command(bulk)
+        parser.add_argument('--flag')
+        parser.add_argument('first')
+        parser.add_argument('paths', action=app.BulkAction, type=str.upper)
+
+        def plain(args):
+            """Takes many paths normally."""
+            self.results.append(args)
+            return 0
+
+        parser = self.my_app.register_command(plain)
+        parser.add_argument('paths', nargs='*')
+
+        def typed(args):
+            """Plain positionals with a type."""
+            self.results.append(args)
+            return 0
+
+        parser = self.my_app.register_command(typed)
+        parser.add_argument('nums', nargs='*', type=int)
+
+        def picky(args):
+            """Plain positionals with choices."""
+            self.results.append(args)
+            return 0
+
+        parser = self.my_app.register_command(picky)
+        parser.add_argument('words', nargs='+', choices=('yes', 'no'))
+
+        def nothing(args):  # pragma: no cover
+            """Takes no paths."""
+            del args
+            return 0
+
+        self.my_app.register_command(nothing)
+
+        def odd(args):
+            """Bulk is not the last positional."""
+            self.results.append(args)
+            return 0
+
+        parser = self.my_app.register_command(odd)
+        parser.add_argument('paths', action=app.BulkAction)
+        parser.add_argument('last')
+
+        self.paths = [f'p{x}' for x in range(self.my_app.BULK_THRESHOLD * 2)]
+
+    def run_app(self, argv):
+        """Run the app with output captured."""
+        with contextlib.redirect_stdout(
+                self.stdout), contextlib.redirect_stderr(self.stderr):
+            ret = self.my_app.run(argv)
+        return ret
+
+    def test_few(self):
+        self.assertEqual(self.run_app(['bulk', 'a', 'b', 'c']), 0)
+
+        args = self.results[0]
+        self.assertEqual(args.first, 'a')
+        self.assertIsInstance(args.paths, app.BulkArgs)
+        self.assertEqual(list(args.paths), ['B', 'C'])
+
+    def test_none(self):
+        self.assertEqual(self.run_app(['bulk', 'a']), 0)
+
+        self.assertEqual(list(self.results[0].paths), [])
+
+    def test_many(self):
+        argv = ['--verbose', 'bulk', '--flag', 'x', 'first'] + self.paths
+
+        self.assertEqual(self.run_app(argv), 0)
+
+        args = self.results[0]
+        self.assertTrue(args.verbose)
+        self.assertEqual(args.flag, 'x')
+        self.assertEqual(args.first, 'first')
+        self.assertEqual(args.paths.arg_strings, self.paths)
+        self.assertEqual(args.paths[-1], self.paths[-1].upper())
+
+    def test_many_including_command(self):
+        argv = ['bulk'] + self.paths
+
+        self.assertEqual(self.run_app(argv), 0)
+
+        args = self.results[0]
+        self.assertEqual(args.first, self.paths[0])
+        self.assertEqual(args.paths.arg_strings, self.paths[1:])
+
+    def test_many_with_trailing_flag(self):
+        argv = ['bulk', 'first'] + self.paths + ['--flag', 'x']
+
+        self.assertEqual(self.run_app(argv), 0)
+
+        args = self.results[0]
+        self.assertEqual(args.flag, 'x')
+        self.assertEqual(args.paths.arg_strings, self.paths)
+
+    def test_many_plain(self):
+        self.assertEqual(self.run_app(['plain'] + self.paths), 0)
+
+        self.assertEqual(self.results[0].paths, self.paths)
+
+    def test_many_typed(self):
+        nums = [str(x) for x in range(len(self.paths))]
+
+        self.assertEqual(self.run_app(['typed'] + nums), 0)
+
+        self.assertEqual(self.results[0].nums, list(range(len(nums))))
+        self.assertEqual(self.stderr.getvalue(), '')
+
+    def test_many_choices(self):
+        words = ['yes', 'no'] * self.my_app.BULK_THRESHOLD
+
+        self.assertEqual(self.run_app(['picky'] + words), 0)
+
+        self.assertEqual(self.results[0].words, words)
+        self.assertEqual(self.stderr.getvalue(), '')
+
+    def test_many_typed_error(self):
+        with self.assertRaises(SystemExit) as result:
+            self.run_app(['typed', 'x'] + self.paths)
+
+        self.assertEqual(result.exception.code, 2)
+        self.assertIn("invalid int value: 'x'", self.stderr.getvalue())
+
+    def test_many_bulk_not_last(self):
+        self.assertEqual(self.run_app(['odd'] + self.paths), 0)
+
+        args = self.results[0]
+        self.assertEqual(args.paths.arg_strings, self.paths[:-1])
+        self.assertEqual(args.last, self.paths[-1])
+
+    def test_many_unrecognized(self):
+        with self.assertRaises(SystemExit) as result:
+            self.run_app(['nothing'] + self.paths)
+
+        self.assertEqual(result.exception.code, 2)
+        self.assertIn(
+            f'unrecognized arguments: {self.paths[0]}', self.stderr.getvalue()
+        )
+
+    def test_sys_argv(self):
+        orig_argv = sys.argv
+        self.addCleanup(setattr, sys, 'argv', orig_argv)
+        sys.argv = [self.mee, 'bulk', 'first'] + self.paths
+
+        self.assertEqual(self.run_app(None), 0)
+
+        args = self.results[0]
+        self.assertEqual(args.paths.arg_strings, self.paths)
+
+
+class ArgparseAppSignalsTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        root_logger = logging.getLogger()
+        orig_level = root_logger.level
+
+        def restore_level():
+            root_logger.setLevel(orig_level)
+
+        self.addCleanup(restore_level)
+        root_logger.setLevel('WARNING')
+
+        self.levels = list()
+        self.handlers = list()
+        self.my_app = app.ArgparseApp(use_signals=True)
+        self.my_app.register_command(self.stacks)
+        self.my_app.register_command(self.peek)
+        self.my_app.register_command(self.cycle)
+
+    def stacks(self, args):
+        """Ask for the stacks."""
+        del args
+        os.kill(os.getpid(), signal.SIGUSR1)
+        return 0
+
+    def peek(self, args):
+        """Look at the current signal handlers."""
+        del args
+        self.handlers.append(signal.getsignal(signal.SIGUSR1))
+        self.handlers.append(signal.getsignal(signal.SIGUSR2))
+        return 0
+
+    def cycle(self, args):
+        """Cycle the log level a few times."""
+        del args
+        for _ in range(2):
+            os.kill(os.getpid(), signal.SIGUSR2)
+            self.levels.append(logging.getLogger().level)
+        return 0
+
+    def test_stacks(self):
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertEqual(self.my_app.run(['stacks']), 0)
+
+        self.assertIn('Stacks and usage', logs.output[0])
+        self.assertIn('in stacks', logs.output[0])
+        self.assertIn('Usage: ', logs.output[0])
+
+    def test_cycle(self):
+        # Starts at DEBUG, as assertLogs() sets the root log level.
+        with self.assertLogs(level='DEBUG') as logs:
+            self.assertEqual(self.my_app.run(['cycle']), 0)
+
+        self.assertEqual(self.levels, [logging.CRITICAL, logging.ERROR])
+        self.assertEqual(
+            logs.output[1:], [
+                'CRITICAL:root:Root log level is now CRITICAL',
+                'ERROR:root:Root log level is now ERROR',
+            ]
+        )
+        self.assertEqual(logging.getLogger().level, logging.WARNING)
+
+    def test_restored(self):
+        before = signal.getsignal(signal.SIGUSR1)
+
+        self.assertEqual(self.my_app.run(['peek']), 0)
+
+        self.assertIs(self.handlers[0], app.log_mgr.log_stacks_and_usage)
+        self.assertIs(self.handlers[1], app.log_mgr.cycle_root_log_level)
+        self.assertEqual(signal.getsignal(signal.SIGUSR1), before)
+
+    def test_not_main_thread(self):
+        before = signal.getsignal(signal.SIGUSR1)
+        thread = threading.Thread(target=self.my_app.run, args=(['peek'],))
+
+        thread.start()
+        thread.join()
+
+        self.assertEqual(self.handlers[0], before)
+
+    def test_not_requested(self):
+        before = signal.getsignal(signal.SIGUSR1)
+        my_app = app.ArgparseApp()
+        my_app.register_command(self.peek)
+
+        self.assertEqual(my_app.run(['peek']), 0)
+
+        self.assertEqual(self.handlers[0], before)
+
+
+class NamespaceEnterContextTest(unittest.TestCase):
+
+    def test_entered_now_and_exited_on_close(self):
+        events = list()
+
+        @contextlib.contextmanager
+        def manager():
+            events.append('enter')
+            yield 'value'
+            events.append('exit')
+
+        args = app.Namespace()
+
+        self.assertEqual(args.enter_context(manager()), 'value')
+        self.assertEqual(events, ['enter'])
+
+        args.close()
+
+        self.assertEqual(events, ['enter', 'exit'])
+
+
+class ArgparseAppCommandDeadlineTest(unittest.TestCase):
+
+    def test_command_deadline(self):
+
+        def fast(args):
+            """Fast command."""
+            del args
+            return 0
+
+        def slow(args):
+            """Slow command."""
+            del args
+            return 0
+
+        my_app = app.ArgparseApp()
+        my_app.register_command(fast)
+        my_app.register_command(slow, deadline=3600)
+
+        self.assertIsNone(my_app.command_deadline(fast))
+        self.assertEqual(my_app.command_deadline(slow), 3600)
+        self.assertEqual(my_app.run(['fast']), 0)
+        self.assertEqual(my_app.run(['slow']), 0)
+
+
+class ArgparseAppNewProgressTest(unittest.TestCase):
+
+    def test_new_progress(self):
+        my_app = app.ArgparseApp()
+
+        prog = my_app.new_progress('things', total=10, interval=5.0)
+
+        self.assertIsInstance(prog, app.progress.Progress)
+        self.assertEqual(prog.name, 'things')
+        self.assertEqual(prog.total, 10)
+        self.assertIsNone(prog.total_bytes)
+        self.assertEqual(prog.interval, 5.0)
+
+
+class ArgparseAppPluginsTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        module_name = 'mundane.test_data.plugin'
+        self.addCleanup(sys.modules.pop, module_name, None)
+        sys.modules.pop(module_name, None)
+        self.discover = self.enterContext(
+            mock.patch.object(
+                app.plugins,
+                'discover',
+                return_value=[
+                    ('generate-report', 'elsewhere'),
+                    ('greet', module_name),
+                    ('part', module_name),
+                    ('unused', 'elsewhere'),
+                ]
+            )
+        )
+
+        self.my_app = app.ArgparseApp()
+        self.my_app.register_shared_flags([flags_two])
+        self.my_app.register_commands([flags_one])
+        with self.assertLogs(level=logging.WARNING) as logs:
+            self.my_app.register_plugins()
+        self.assertIn(
+            'Ignoring plugin command generate-report', logs.output[0]
+        )
+
+    def test_not_imported_until_used(self):
+        with contextlib.redirect_stdout(self.stdout):
+            self.my_app.run(['generate-report'])
+
+        self.assertNotIn('mundane.test_data.plugin', sys.modules)
+        self.discover.assert_called_once_with(
+            self.my_app.cache, app.plugins.GROUP
+        )
+
+    def test_help(self):
+        with contextlib.redirect_stdout(self.stdout):
+            self.my_app.run([])
+
+        self.assertIn(
+            'From plugin mundane.test_data.plugin', self.stdout.getvalue()
+        )
+        self.assertNotIn('mundane.test_data.plugin', sys.modules)
+
+    def test_used(self):
+        with contextlib.redirect_stdout(self.stdout):
+            self.assertEqual(self.my_app.run(['--loud', 'greet', 'you']), 0)
+            self.assertEqual(self.my_app.run(['greet', 'again']), 0)
+            self.my_app.run([])
+
+        output = self.stdout.getvalue()
+        self.assertIn('HELLO, YOU\nHello, again\n', output)
+        self.assertIn('Say goodbye.', output)
+        self.assertNotIn('From plugin mundane', output)
+        self.assertIn('From plugin elsewhere', output)
+
+
+class ArgparseAppRunEmbeddedTest(BaseApp):
+
+    def setUp(self):
+        super().setUp()
+
+        root_logger = logging.getLogger()
+        self.addCleanup(setattr, root_logger, 'level', root_logger.level)
+
+        self.barrier = threading.Barrier(1)
+        self.my_app = app.ArgparseApp(use_log_mgr=True)
+        self.my_app.register_after_parse_hook(self.hook)
+        self.records = logging.handlers.BufferingHandler(100)
+        root_logger.addHandler(self.records)
+        parser = self.my_app.register_command(self.greet)
+        parser.add_argument('name')
+        parser = self.my_app.register_command(self.bail)
+        parser.add_argument('message', nargs='?')
+
+    def greetings(self) -> list[str]:
+        """Messages logged by greet()."""
+        return [
+            record.getMessage()
+            for record in self.records.buffer
+            if record.getMessage().startswith('Greeting')
+        ]
+
+    def hook(self, args):
+        """Print from another thread."""
+        print(f'Hook for {args.name}')
+
+    def greet(self, args):
+        """Greet someone, and log about it."""
+        self.barrier.wait()
+        logging.info('Greeting %s', args.name)
+        logging.debug('Greeting %s verbosely', args.name)
+        print(f'Hello, {args.name}')
+        return 0
+
+    def bail(self, args):
+        """Exit, maybe with a message."""
+        sys.exit(args.message)
+
+    def test_concurrent(self):
+        names = ('alice', 'bob', 'carol', 'dave')
+        levels = ('INFO', 'WARNING', 'DEBUG', 'WARNING')
+        self.barrier = threading.Barrier(len(names))
+        outputs = {name: io.StringIO() for name in names}
+        codes = dict()
+
+        def target(name, level):
+            codes[name] = self.my_app.run_embedded(
+                ['-L', level, 'greet', name], stdout=outputs[name]
+            )
+
+        threads = [
+            threading.Thread(target=target, args=args)
+            for args in zip(names, levels)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(codes, dict.fromkeys(names, 0))
+        for name, output in outputs.items():
+            self.assertEqual(
+                output.getvalue(), f'Hook for {name}\nHello, {name}\n'
+            )
+        self.assertEqual(
+            sorted(self.greetings()), [
+                'Greeting alice',
+                'Greeting carol',
+                'Greeting carol verbosely',
+            ]
+        )
+
+    def test_log_level(self):
+        stdout = io.StringIO()
+
+        self.assertEqual(
+            self.my_app.run_embedded(
+                ['greet', 'eve'], stdout=stdout, log_level=logging.DEBUG
+            ), 0
+        )
+
+        self.assertEqual(
+            self.greetings(), ['Greeting eve', 'Greeting eve verbosely']
+        )
+
+    def test_help(self):
+        with contextlib.redirect_stdout(self.stdout):
+            ret = self.my_app.run_embedded(['--help'], stdout=self.stderr)
+
+        self.assertEqual(ret, 0)
+        self.assertIn('--log-level', self.stderr.getvalue())
+        self.assertEqual(self.stdout.getvalue(), '')
+
+    def test_usage_error(self):
+        ret = self.my_app.run_embedded(
+            ['--log-dir', 'elsewhere', 'greet'], stderr=self.stderr
+        )
+
+        self.assertEqual(ret, 2)
+        self.assertIn(
+            'not allowed in an embedded run', self.stderr.getvalue()
+        )
+
+    def test_exit_message(self):
+        self.assertEqual(
+            self.my_app.run_embedded(['bail'], stdout=self.stdout), 0
+        )
+        ret = self.my_app.run_embedded(
+            ['bail', 'Bailing out'], stdout=self.stdout, stderr=self.stderr
+        )
+
+        self.assertEqual(ret, 1)
+        self.assertEqual(self.stderr.getvalue(), 'Bailing out\n')
+
+
 if __name__ == '__main__':  # pragma: no cover
     unittest.main()
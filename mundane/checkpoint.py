@@ -0,0 +1,180 @@
+"""Let long running commands save their progress and resume after a failure.
+
+To add the global --resume flag to an ArgparseApp, register using:
+   ArgparseApp().register_global_flags(checkpoint)
+
+Commands then have a lazily created 'checkpoint' attribute on their args:
+
+def crunch(args):
+    state = args.checkpoint.state or {'done': 0}
+    for index in range(state['done'], len(work)):
+        ...
+        state['done'] = index + 1
+        args.checkpoint.save(state)
+
+Checkpoints are kept under the user state dir, keyed by the command and a
+hash of its flags.  Saving is rate limited, so it may be called as often as
+is convenient.  If the command fails, by raising an exception or returning
+a non-zero exit code, the last state passed to save() is written out.  If
+it returns 0, the checkpoint is removed.  Without --resume, commands always
+start fresh.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pathlib
+import pickle
+import tempfile
+import time
+import typing
+
+from mundane import result_cache
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import argparse
+
+    from mundane import app
+
+INTERVAL = 60.0
+
+_UNSET = object()
+
+
+class Checkpoint:
+    """A rate limited, atomically written, saved state."""
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        resume: bool = False,
+        interval: float = INTERVAL,
+        succeeded: typing.Callable[[], bool] | None = None
+    ):
+        """Initialize the instance.
+
+        Args:
+          path: Where the state is saved.
+          resume: Load the state saved by an earlier run, if any.
+          interval: Minimum seconds between writes by save().
+          succeeded: Called on exit without an exception, to tell whether
+            the work succeeded, e.g., by the exit code of the command.  If
+            None, it did.
+        """
+        self.path = pathlib.Path(path)
+        self.interval = interval
+        self.succeeded = succeeded
+        self.state: typing.Any = None
+        self._pending: typing.Any = _UNSET
+        self._last_write = -float('inf')
+
+        if resume:
+            try:
+                with self.path.open('rb') as handle:
+                    self.state = pickle.load(handle)
+                logging.info('Resuming from checkpoint %s', self.path)
+            except FileNotFoundError:
+                logging.warning(
+                    'No checkpoint to resume from at %s', self.path
+                )
+
+    def __enter__(self) -> Checkpoint:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and (self.succeeded is None or self.succeeded()):
+            self.path.unlink(missing_ok=True)
+        else:
+            self.flush()
+
+    def save(self, state: typing.Any, force: bool = False) -> bool:
+        """Save the state, unless one was written less than interval ago.
+
+        A state that was not written is kept, and written by flush(), a later
+        call to save(), or if the command fails.
+
+        Args:
+          state: Anything that can be pickled.
+          force: Write even if interval has not passed.
+
+        Returns:
+          Whether the state was written.
+        """
+        self._pending = state
+        if force or time.monotonic() - self._last_write >= self.interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Write any state not yet written."""
+        if self._pending is _UNSET:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.path.parent,
+                                         prefix=f'.{self.path.name}.',
+                                         delete=False) as handle:
+            try:
+                pickle.dump(
+                    self._pending, handle, protocol=pickle.HIGHEST_PROTOCOL
+                )
+                handle.flush()
+                os.fsync(handle.fileno())
+            except BaseException:
+                os.unlink(handle.name)
+                raise
+        os.replace(handle.name, self.path)
+        self._pending = _UNSET
+        self._last_write = time.monotonic()
+
+
+def checkpoint_path(
+    directory: str | pathlib.Path, func: typing.Callable,
+    flags: dict[str, typing.Any]
+) -> pathlib.Path:
+    """Where the checkpoint for calling func with flags is kept.
+
+    Raises:
+      TypeError: When a flag value has no canonical form, as per
+        result_cache.canonical().
+    """
+    digest = result_cache.flags_digest(func, flags)
+    return pathlib.Path(directory, f'{func.__name__}-{digest}.ckpt')
+
+
+def mundane_global_flags(argp_app: app.ArgparseApp):
+    """Register global flags."""
+
+    argp_app.global_flags.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue from the checkpoint of an earlier failed run'
+    )
+
+    def register_checkpoint(args: argparse.Namespace):
+        """Give the command a lazily created Checkpoint."""
+        resume = args.resume
+        del args.resume
+        if not hasattr(args, 'func'):
+            return
+        # Other hooks may still remove their flags, and the command may add
+        # attributes, so only flags present now and at creation are used.
+        flags = vars(args).copy()
+
+        def factory() -> Checkpoint:
+            current = vars(args)
+            path = checkpoint_path(
+                os.path.join(argp_app.dirs.user_state_dir,
+                             'checkpoints'), args.func,
+                {dest: flags[dest]
+                 for dest in flags
+                 if dest in current}
+            )
+            return Checkpoint(
+                path, resume=resume, succeeded=lambda: args.exit_code() == 0
+            )
+
+        args.register_resource('checkpoint', factory)
+
+    argp_app.register_after_parse_hook(register_checkpoint)
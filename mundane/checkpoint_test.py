@@ -0,0 +1,234 @@
+"""Tests for checkpoint.py"""
+
+import contextlib
+import io
+import os
+import pathlib
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from mundane import app
+from mundane import checkpoint
+from mundane.test_data import global_flags
+
+
+class BaseCheckpoint(unittest.TestCase):
+    """Provide a scratch directory."""
+
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = self.tmpdir / 'sub' / 'state.ckpt'
+
+    def saved(self):
+        """The state currently on disk."""
+        with self.path.open('rb') as handle:
+            return pickle.load(handle)
+
+
+class Unpicklable:  # pylint: disable=too-few-public-methods
+    """Fails partway through being pickled."""
+
+    def __reduce__(self):
+        raise ValueError
+
+
+class CheckpointTest(BaseCheckpoint):
+
+    def test_rate_limited(self):
+        ckpt = checkpoint.Checkpoint(self.path, interval=3600)
+
+        self.assertTrue(ckpt.save(1))
+        self.assertFalse(ckpt.save(2))
+
+        self.assertEqual(self.saved(), 1)
+        self.assertTrue(ckpt.save(3, force=True))
+        self.assertEqual(self.saved(), 3)
+
+    def test_interval_passed(self):
+        ckpt = checkpoint.Checkpoint(self.path, interval=0)
+
+        ckpt.save(1)
+        self.assertTrue(ckpt.save(2))
+
+        self.assertEqual(self.saved(), 2)
+
+    def test_flush(self):
+        ckpt = checkpoint.Checkpoint(self.path, interval=3600)
+        ckpt.save(1)
+        ckpt.save(2)
+
+        ckpt.flush()
+        ckpt.flush()
+
+        self.assertEqual(self.saved(), 2)
+
+    def test_atomic(self):
+        ckpt = checkpoint.Checkpoint(self.path)
+        ckpt.save('good')
+
+        with self.assertRaises(ValueError):
+            ckpt.save(Unpicklable(), force=True)
+
+        self.assertEqual(self.saved(), 'good')
+        self.assertEqual(os.listdir(self.path.parent), ['state.ckpt'])
+
+    def test_success_removes(self):
+        with checkpoint.Checkpoint(self.path) as ckpt:
+            ckpt.save(1)
+
+        self.assertFalse(self.path.exists())
+
+    def test_failure_writes_pending(self):
+        with self.assertRaises(ValueError):
+            with checkpoint.Checkpoint(self.path, interval=3600) as ckpt:
+                ckpt.save(1)
+                ckpt.save(2)
+                raise ValueError
+
+        self.assertEqual(self.saved(), 2)
+
+    def test_not_succeeded_writes_pending(self):
+        with checkpoint.Checkpoint(self.path, interval=3600,
+                                   succeeded=lambda: False) as ckpt:
+            ckpt.save(1)
+            ckpt.save(2)
+
+        self.assertEqual(self.saved(), 2)
+
+    def test_succeeded_removes(self):
+        with checkpoint.Checkpoint(self.path, succeeded=lambda: True) as ckpt:
+            ckpt.save(1)
+
+        self.assertFalse(self.path.exists())
+
+    def test_resume(self):
+        checkpoint.Checkpoint(self.path).save({'done': 5})
+
+        with self.assertLogs(level='INFO') as logs:
+            ckpt = checkpoint.Checkpoint(self.path, resume=True)
+
+        self.assertEqual(ckpt.state, {'done': 5})
+        self.assertIn('Resuming from checkpoint', logs.output[0])
+        self.assertIsNone(checkpoint.Checkpoint(self.path).state)
+
+    def test_resume_missing(self):
+        with self.assertLogs(level='WARNING') as logs:
+            ckpt = checkpoint.Checkpoint(self.path, resume=True)
+
+        self.assertIsNone(ckpt.state)
+        self.assertIn('No checkpoint', logs.output[0])
+
+
+class CheckpointPathTest(unittest.TestCase):
+
+    def test_path(self):
+        path = checkpoint.checkpoint_path('/d', len, {'a': 1, 'func': len})
+
+        self.assertEqual(path.parent, pathlib.Path('/d'))
+        self.assertTrue(path.name.startswith('len-'))
+        self.assertEqual(
+            path, checkpoint.checkpoint_path('/d', len, {'a': 1})
+        )
+        self.assertNotEqual(
+            path, checkpoint.checkpoint_path('/d', len, {'a': 2})
+        )
+        self.assertNotEqual(
+            path, checkpoint.checkpoint_path('/d', print, {'a': 1})
+        )
+        self.assertNotEqual(
+            checkpoint.checkpoint_path('/d', len, {'a': app.BulkArgs(['x'])}),
+            checkpoint.checkpoint_path('/d', len, {'a': app.BulkArgs(['y'])})
+        )
+
+
+class FlagsTest(global_flags.GlobalFlagsTest):
+
+    MODULE = checkpoint
+
+    def setUp(self):
+        super().setUp()
+
+        self.fail_at = None
+        self.ret = 0
+        parser = self.my_app.register_command(self.crunch)
+        parser.add_argument('--count', type=int, default=5)
+
+    def crunch(self, args):
+        """A command that may fail partway."""
+        self.seen.append(vars(args).copy())
+        state = args.checkpoint.state or 0
+        self.seen[-1]['state'] = state
+        for index in range(state, args.count):
+            if index == self.fail_at:
+                raise RuntimeError(index)
+            args.checkpoint.save(index + 1)
+        return self.ret
+
+    def checkpoints(self) -> list[str]:
+        """Names of saved checkpoints."""
+        return [path.name for path in self.tmpdir.glob('checkpoints/*')]
+
+    def test_no_checkpoint_used(self):
+        self.assertEqual(self.my_app.run(['crunch']), 0)
+
+        self.assertNotIn('resume', self.seen[0])
+        self.assertEqual(self.checkpoints(), [])
+
+    def test_resume(self):
+        self.fail_at = 3
+        with self.assertRaises(RuntimeError):
+            self.my_app.run(['crunch'])
+        self.assertEqual(len(self.checkpoints()), 1)
+
+        self.fail_at = None
+        with self.assertLogs(level='INFO'):
+            self.assertEqual(self.my_app.run(['--resume', 'crunch']), 0)
+
+        self.assertEqual(self.seen[-1]['state'], 3)
+        self.assertEqual(self.checkpoints(), [])
+
+    def test_exit_code_keeps(self):
+        self.ret = 1
+        self.assertEqual(self.my_app.run(['crunch']), 1)
+        self.assertEqual(len(self.checkpoints()), 1)
+
+        self.ret = 0
+        with self.assertLogs(level='INFO'):
+            self.assertEqual(self.my_app.run(['--resume', 'crunch']), 0)
+
+        self.assertEqual(self.seen[-1]['state'], 5)
+        self.assertEqual(self.checkpoints(), [])
+
+    def test_without_resume(self):
+        self.fail_at = 3
+        with self.assertRaises(RuntimeError):
+            self.my_app.run(['crunch'])
+        self.fail_at = None
+
+        self.assertEqual(self.my_app.run(['crunch']), 0)
+
+    def test_keyed_by_flags(self):
+        self.fail_at = 3
+        with self.assertRaises(RuntimeError):
+            self.my_app.run(['crunch'])
+        self.fail_at = None
+
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(
+                self.my_app.run(['--resume', 'crunch', '--count', '6']), 0
+            )
+
+    def test_no_command(self):
+        stdout = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            self.my_app.run([])
+
+        self.assertIn('--resume', stdout.getvalue())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
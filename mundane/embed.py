@@ -0,0 +1,117 @@
+"""Give each context its own sys.stdout and sys.stderr.
+
+ArgparseApp.run_embedded() uses this, so that commands, help and usage
+errors of concurrent calls each write to the streams given for that call:
+
+  with embed.redirect(stdout=io.StringIO()):
+      print('Only seen by this thread')
+
+Unlike contextlib.redirect_stdout(), which swaps the streams for the whole
+process, sys.stdout and sys.stderr are replaced by proxies while any
+redirect() is active.  The proxies write to the streams of the current
+context, or to the streams they replaced otherwise.  Context variables are
+per thread and per asyncio task, so concurrent calls do not see each
+other's streams.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import sys
+import threading
+import typing
+
+_stdout: contextvars.ContextVar[typing.TextIO
+                                ] = contextvars.ContextVar('mundane_stdout')
+_stderr: contextvars.ContextVar[typing.TextIO
+                                ] = contextvars.ContextVar('mundane_stderr')
+
+
+class _StreamProxy:
+    """Forward to the stream of the current context, or the original one."""
+
+    def __init__(
+        self, var: contextvars.ContextVar[typing.TextIO],
+        original: typing.TextIO
+    ):
+        self.var = var
+        self.original = original
+
+    def write(self, text: str) -> int:
+        """As per io.TextIOBase.write()."""
+        return self.var.get(self.original).write(text)
+
+    def flush(self):
+        """As per io.TextIOBase.flush()."""
+        self.var.get(self.original).flush()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.var.get(self.original), name)
+
+
+class _Proxies:
+    """Keeps the proxies installed while any redirect() is active."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+
+    def acquire(self):
+        """Install the proxies, if not already."""
+        with self._lock:
+            if not self._users:
+                sys.stdout = typing.cast(
+                    typing.TextIO, _StreamProxy(_stdout, sys.stdout)
+                )
+                sys.stderr = typing.cast(
+                    typing.TextIO, _StreamProxy(_stderr, sys.stderr)
+                )
+            self._users += 1
+
+    def release(self):
+        """Restore the original streams, if this was the last user."""
+        with self._lock:
+            self._users -= 1
+            if not self._users:
+                # Leave alone any streams replaced by someone else since.
+                if isinstance(sys.stdout, _StreamProxy):
+                    sys.stdout = sys.stdout.original
+                if isinstance(sys.stderr, _StreamProxy):
+                    sys.stderr = sys.stderr.original
+
+
+_proxies = _Proxies()
+
+
+@contextlib.contextmanager
+def redirect(
+    stdout: typing.TextIO | None = None,
+    stderr: typing.TextIO | None = None
+) -> typing.Iterator[None]:
+    """Send sys.stdout and sys.stderr of the current context elsewhere.
+
+    Args:
+      stdout: Where sys.stdout writes go.  If None, they are unchanged.
+      stderr: Where sys.stderr writes go.  If None, they are unchanged.
+    """
+    _proxies.acquire()
+    tokens = list()
+    try:
+        if stdout is not None:
+            tokens.append((_stdout, _stdout.set(stdout)))
+        if stderr is not None:
+            tokens.append((_stderr, _stderr.set(stderr)))
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+        _proxies.release()
+
+
+def current_stdout() -> typing.TextIO:
+    """The stream sys.stdout writes to in the current context."""
+    stream = sys.stdout
+    if isinstance(stream, _StreamProxy):
+        return stream.var.get(stream.original)
+    return stream
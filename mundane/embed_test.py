@@ -0,0 +1,95 @@
+"""Tests for embed.py"""
+
+import contextlib
+import io
+import sys
+import threading
+import unittest
+
+from mundane import embed
+
+
+class RedirectTest(unittest.TestCase):
+
+    def test_redirect(self):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        original = sys.stdout, sys.stderr
+
+        with embed.redirect(stdout, stderr):
+            print('out')
+            print('err', file=sys.stderr)
+            self.assertEqual(sys.stdout.getvalue(), 'out\n')
+
+        self.assertEqual((sys.stdout, sys.stderr), original)
+        self.assertEqual(stdout.getvalue(), 'out\n')
+        self.assertEqual(stderr.getvalue(), 'err\n')
+
+    def test_nested(self):
+        outer = io.StringIO()
+        inner = io.StringIO()
+        stderr = io.StringIO()
+
+        with embed.redirect(stdout=outer):
+            with embed.redirect(stderr=stderr):
+                print('inherited')
+            with embed.redirect(stdout=inner):
+                print('inner')
+            print('outer')
+
+        self.assertEqual(outer.getvalue(), 'inherited\nouter\n')
+        self.assertEqual(inner.getvalue(), 'inner\n')
+
+    def test_threads(self):
+        outputs = [io.StringIO() for _ in range(8)]
+        barrier = threading.Barrier(len(outputs) + 1)
+
+        def target(index):
+            with embed.redirect(stdout=outputs[index]):
+                barrier.wait()
+                for _ in range(100):
+                    print(index)
+                sys.stdout.flush()
+
+        threads = [
+            threading.Thread(target=target, args=(index,))
+            for index in range(len(outputs))
+        ]
+        for thread in threads:
+            thread.start()
+        stdout = io.StringIO()
+        with embed.redirect(stdout=stdout):
+            barrier.wait()
+            print('main')
+            for thread in threads:
+                thread.join()
+
+        for index, output in enumerate(outputs):
+            self.assertEqual(output.getvalue(), f'{index}\n' * 100)
+        self.assertEqual(stdout.getvalue(), 'main\n')
+
+    def test_current_stdout(self):
+        stdout = io.StringIO()
+
+        self.assertIs(embed.current_stdout(), sys.stdout)
+        with embed.redirect(stdout=stdout):
+            self.assertIs(embed.current_stdout(), stdout)
+            with embed.redirect(stderr=io.StringIO()):
+                self.assertIs(embed.current_stdout(), stdout)
+
+    def test_replaced_meanwhile(self):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+                stderr):
+            with embed.redirect(stdout=io.StringIO()):
+                sys.stdout = stdout
+                sys.stderr = stderr
+
+            self.assertIs(sys.stdout, stdout)
+            self.assertIs(sys.stderr, stderr)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
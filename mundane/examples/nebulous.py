@@ -26,6 +26,7 @@ from __future__ import annotations
 
 # The log manager that mundane provides defaults to writing to a unique file
 # on each invocation.
+import contextlib
 import logging
 import sys
 import typing
@@ -138,18 +139,29 @@ def hook_three(args: argparse.Namespace):
 def init_db(args: argparse.Namespace):
     """This hook will modify args.
 
-    A database connection will be added as "dbc" and the "db_dir" flag will be
-    consumed.
+    A database connection will be registered as "dbc" and the "db_dir" flag
+    will be consumed.
     """
     logging.info('args: %s', args)
 
     # The name of the command that will be executed.  Empty if the user just
     # asked for help.  For this example, do not create the database.
     if args.name:
-        args.dbc = f'A pretend database connection in {args.db_dir}.'
+        # The connection is only made if a command actually uses args.dbc,
+        # and it is closed by ArgparseApp.run() after the command finishes.
+        db_dir = args.db_dir
+        args.register_resource('dbc', lambda: connect(db_dir))
         del args.db_dir
 
 
+@contextlib.contextmanager
+def connect(db_dir: str) -> typing.Iterator[str]:
+    """Pretend to connect to a database."""
+    logging.info('Connecting to database in %s', db_dir)
+    yield f'A pretend database connection in {db_dir}.'
+    logging.info('Closing database in %s', db_dir)
+
+
 def info(args: argparse.Namespace) -> int:
     """List some important information.
 
@@ -0,0 +1,328 @@
+"""A persistent key/value cache in a single memory mapped file.
+
+ArgparseApp exposes one under the user cache dir:
+  value = my_app.cache.get('lookup:' + name)
+  if value is None:
+      value = expensive_lookup(name)
+      my_app.cache.set('lookup:' + name, value, ttl=3600)
+
+Keys are strings and values are anything that can be pickled.
+
+The file is safe to share between processes.  Readers take a shared lock
+and writers an exclusive one, using flock() on a separate ".lock" file.
+Within a process, a thread lock serializes access, as flock() locks belong
+to the open file, not the thread.  For the same reason, a forked child
+reopens both files, rather than sharing them with its parent.
+
+The file has a fixed size.  It starts with a header, followed by an open
+addressing hash index, followed by a data area that entries are appended
+to.  When either the index or the data area fills up, the file is compacted
+in place, dropping expired entries, then the least recently used ones,
+until both are at most half full.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import mmap
+import os
+import pathlib
+import struct
+import threading
+import time
+import typing
+import weakref
+
+MAX_BYTES = 16 * 2**20
+
+HEADER = struct.Struct('<8sQQQQ')
+MAGIC = b'MUNDKV01'
+# Key hash, data offset, key length, value length, expiry, last used.  A
+# hash of zero marks an empty slot.
+SLOT = struct.Struct('<QQIIdd')
+# Expected average entry size, used to size the index.
+_ENTRY_BYTES = 512
+_MIN_SLOTS = 64
+
+
+def _hash(key: bytes) -> int:
+    """Stable, never zero, hash of a key."""
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    value = int.from_bytes(
+        hashlib.blake2b(key, digest_size=8).digest(), 'little'
+    )
+    return value or 1
+
+
+def _reset_after_fork():
+    """Have each cache in a forked child reopen its files on next use.
+
+    The child shares the open lock file with the parent, so their flock()
+    locks would not exclude each other.  The thread lock may also have been
+    held by a thread that does not exist in the child.
+    """
+    for cache in list(_instances):
+        cache._forked()  # pylint: disable=protected-access
+
+
+_instances: weakref.WeakSet[KVCache] = weakref.WeakSet()
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class KVCache:
+    """Key/value cache shared between processes through a mapped file."""
+
+    def __init__(self, path: str | pathlib.Path, max_bytes: int = MAX_BYTES):
+        """Initialize the instance.
+
+        Neither file is opened until first used.
+
+        Args:
+          path: The data file.  The lock file is next to it.
+          max_bytes: Size of the data file, if it needs to be created.  An
+            existing file keeps its size.
+        """
+        self.path = pathlib.Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._lock_fd: int | None = None
+        self._map: mmap.mmap | None = None
+        self._slots = 0
+        self._data_start = 0
+        _instances.add(self)
+
+    def __enter__(self) -> KVCache:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmap the file and release the lock file."""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def _forked(self):
+        """Drop the lock and the files inherited from the parent."""
+        self._lock = threading.Lock()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        """Return the value for key, or default if missing or expired."""
+        import pickle  # pylint: disable=import-outside-toplevel
+
+        encoded = key.encode()
+        with self._locked(fcntl.LOCK_SH) as cache_map:
+            index, slot = self._find(cache_map, encoded)
+            if slot is None or self._expired(slot):
+                return default
+            # Racing readers may both update this, which is harmless.
+            SLOT.pack_into(
+                cache_map, self._slot_offset(index), *slot[:5], time.time()
+            )
+            return pickle.loads(self._value(cache_map, slot))
+
+    def set(self, key: str, value: typing.Any, ttl: float | None = None):
+        """Save a value.
+
+        Args:
+          key: Identifies the value.
+          value: Anything that can be pickled.
+          ttl: Seconds until the value expires.  Never, if not set.
+
+        Raises:
+          ValueError: The entry is too large for the data area.
+        """
+        import pickle  # pylint: disable=import-outside-toplevel
+
+        encoded = key.encode()
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        size = len(encoded) + len(payload)
+        expires = time.time() + ttl if ttl is not None else 0.0
+
+        with self._locked(fcntl.LOCK_EX) as cache_map:
+            capacity = len(cache_map) - self._data_start
+            if size > capacity // 2:
+                raise ValueError(
+                    f'Entry of {size} bytes is too large for {self.path}'
+                )
+            _, _, _, data_end, used = HEADER.unpack_from(cache_map)
+            index, slot = self._find(cache_map, encoded)
+            if slot is None and used + 1 > self._slots // 2 or (
+                    data_end + size > len(cache_map)):
+                self._compact(cache_map, size)
+                _, _, _, data_end, used = HEADER.unpack_from(cache_map)
+                index, slot = self._find(cache_map, encoded)
+
+            self._write_data(cache_map, data_end, encoded + payload)
+            SLOT.pack_into(
+                cache_map, self._slot_offset(index), _hash(encoded), data_end,
+                len(encoded), len(payload), expires, time.time()
+            )
+            if slot is None:
+                used += 1
+            self._write_header(cache_map, data_end + size, used)
+
+    def delete(self, key: str):
+        """Remove a key, if present."""
+        encoded = key.encode()
+        with self._locked(fcntl.LOCK_EX) as cache_map:
+            index, slot = self._find(cache_map, encoded)
+            if slot is not None:
+                # Expired slots keep their place in probe chains and are
+                # reclaimed by compaction.
+                SLOT.pack_into(
+                    cache_map, self._slot_offset(index), *slot[:4], -1.0,
+                    slot[5]
+                )
+
+    def clear(self):
+        """Remove all entries."""
+        with self._locked(fcntl.LOCK_EX) as cache_map:
+            self._reset(cache_map)
+
+    @contextlib.contextmanager
+    def _locked(self, operation: int) -> typing.Iterator[mmap.mmap]:
+        """Hold the thread lock and flock() for the duration of a context."""
+        with self._lock:
+            if self._map is None:
+                self._map = self._open()
+            cache_map: mmap.mmap = self._map
+            lock_fd = typing.cast(int, self._lock_fd)
+            fcntl.flock(lock_fd, operation)
+            try:
+                yield cache_map
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _open(self) -> mmap.mmap:
+        """Open the lock file and map the data file, creating as needed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = os.open(
+            f'{self.path}.lock', os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600
+        )
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            fd = os.open(
+                self.path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600
+            )
+            try:
+                created = os.fstat(fd).st_size < HEADER.size
+                if created:
+                    os.ftruncate(fd, self.max_bytes)
+                cache_map = mmap.mmap(fd, 0)
+            finally:
+                os.close(fd)
+            self._layout(len(cache_map))
+            if created or HEADER.unpack_from(cache_map)[0] != MAGIC:
+                self._reset(cache_map)
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        return cache_map
+
+    def _layout(self, size: int):
+        """Compute where the index and data area are for a file size."""
+        slots = _MIN_SLOTS
+        while slots * 2 <= size // _ENTRY_BYTES:
+            slots *= 2
+        self._slots = slots
+        self._data_start = HEADER.size + slots * SLOT.size
+
+    def _slot_offset(self, index: int) -> int:
+        """Where a slot is in the file."""
+        return HEADER.size + index * SLOT.size
+
+    def _write_header(self, cache_map: mmap.mmap, data_end: int, used: int):
+        """Update the header."""
+        HEADER.pack_into(
+            cache_map, 0, MAGIC, len(cache_map), self._slots, data_end, used
+        )
+
+    def _reset(self, cache_map: mmap.mmap):
+        """Empty the index and data area."""
+        start = HEADER.size
+        cache_map[start:self._data_start] = bytes(self._data_start - start)
+        self._write_header(cache_map, self._data_start, 0)
+
+    def _find(self, cache_map: mmap.mmap,
+              key: bytes) -> tuple[int, tuple | None]:
+        """Probe the index for a key.
+
+        Returns:
+          The index of the slot holding the key and its contents, or of the
+          empty slot where it would go and None.
+        """
+        key_hash = _hash(key)
+        mask = self._slots - 1
+        index = key_hash & mask
+        while True:
+            slot = SLOT.unpack_from(cache_map, self._slot_offset(index))
+            if not slot[0]:
+                return index, None
+            if slot[0] == key_hash and slot[2] == len(key):
+                offset = slot[1]
+                if cache_map[offset:offset + len(key)] == key:
+                    return index, slot
+            index = (index + 1) & mask
+
+    @staticmethod
+    def _value(cache_map: mmap.mmap, slot: tuple) -> bytes:
+        """The pickled value of a slot."""
+        start = slot[1] + slot[2]
+        return cache_map[start:start + slot[3]]
+
+    @staticmethod
+    def _write_data(cache_map: mmap.mmap, offset: int, data: bytes):
+        """Copy data into the data area."""
+        cache_map[offset:offset + len(data)] = data
+
+    @staticmethod
+    def _expired(slot: tuple) -> bool:
+        """Whether a slot is expired or deleted."""
+        expires = slot[4]
+        return expires != 0.0 and expires < time.time()
+
+    def _compact(self, cache_map: mmap.mmap, incoming: int):
+        """Keep the most recently used live entries that fit in half."""
+        entries = list()
+        for index in range(self._slots):
+            slot = SLOT.unpack_from(cache_map, self._slot_offset(index))
+            if slot[0] and not self._expired(slot):
+                entries.append(slot)
+        entries.sort(key=lambda slot: slot[5], reverse=True)
+
+        budget = (len(cache_map) - self._data_start) // 2 - incoming
+        kept = list()
+        for slot in entries[:self._slots // 2 - 1]:
+            size = slot[2] + slot[3]
+            if size > budget:
+                break
+            budget -= size
+            kept.append((slot, cache_map[slot[1]:slot[1] + size]))
+
+        self._reset(cache_map)
+        mask = self._slots - 1
+        data_end = self._data_start
+        for slot, data in kept:
+            index = slot[0] & mask
+            while SLOT.unpack_from(cache_map, self._slot_offset(index))[0]:
+                index = (index + 1) & mask
+            self._write_data(cache_map, data_end, data)
+            SLOT.pack_into(
+                cache_map, self._slot_offset(index), slot[0], data_end,
+                *slot[2:]
+            )
+            data_end += len(data)
+        self._write_header(cache_map, data_end, len(kept))
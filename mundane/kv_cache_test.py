@@ -0,0 +1,301 @@
+"""Tests for kv_cache.py"""
+
+import contextlib
+import fcntl
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import typing
+import unittest
+from unittest import mock
+
+from mundane import app
+from mundane import kv_cache
+
+
+class BaseKVCache(unittest.TestCase):
+    """Provide a cache in a scratch directory."""
+
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = self.tmpdir / 'sub' / 'cache'
+        self.cache = self.new_cache()
+
+    def new_cache(self, max_bytes: int = 64 * 1024) -> kv_cache.KVCache:
+        """Another instance using the same file."""
+        cache = kv_cache.KVCache(self.path, max_bytes)
+        self.addCleanup(cache.close)
+        return cache
+
+
+class KVCacheTest(BaseKVCache):
+
+    def test_lazy(self):
+        self.assertFalse(self.path.exists())
+
+        self.assertIsNone(self.cache.get('missing'))
+
+        self.assertEqual(self.path.stat().st_size, 64 * 1024)
+        self.assertTrue(pathlib.Path(f'{self.path}.lock').exists())
+
+    def test_round_trip(self):
+        self.cache.set('key', {'a': [1, 2]})
+        self.cache.set('other', 'value')
+
+        self.assertEqual(self.cache.get('key'), {'a': [1, 2]})
+        self.assertEqual(self.cache.get('other'), 'value')
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_overwrite(self):
+        self.cache.set('key', 1)
+        self.cache.set('key', 2)
+
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_ttl(self):
+        with mock.patch.object(kv_cache.time, 'time', return_value=1000.0):
+            self.cache.set('short', 'value', ttl=10)
+            self.cache.set('forever', 'value')
+            self.assertEqual(self.cache.get('short'), 'value')
+
+        with mock.patch.object(kv_cache.time, 'time', return_value=1011.0):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_delete(self):
+        self.cache.set('key', 1)
+
+        self.cache.delete('key')
+        self.cache.delete('missing')
+
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 2)
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_clear(self):
+        self.cache.set('key', 1)
+
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_too_large(self):
+        with self.assertRaisesRegex(ValueError, 'too large'):
+            self.cache.set('key', b'x' * 64 * 1024)
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', 'value')
+
+        # The existing file keeps its size.
+        other = self.new_cache(max_bytes=1)
+
+        self.assertEqual(other.get('key'), 'value')
+
+    def test_bad_magic(self):
+        self.path.parent.mkdir()
+        self.path.write_bytes(b'garbage' * 10000)
+
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_hash_collisions(self):
+        with mock.patch.object(kv_cache, '_hash', return_value=5):
+            for i in range(10):
+                self.cache.set(f'key{i}', i)
+
+            self.assertEqual(
+                [self.cache.get(f'key{i}') for i in range(10)],
+                list(range(10))
+            )
+
+    def test_close(self):
+        self.cache.close()
+        self.cache.set('key', 'value')
+
+        with self.cache as cache:
+            self.assertEqual(cache.get('key'), 'value')
+
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class EvictionTest(BaseKVCache):
+
+    def test_many_entries(self):
+        for i in range(2000):
+            self.cache.set(f'key{i}', i)
+
+        self.assertEqual(self.cache.get('key1999'), 1999)
+        self.assertIsNone(self.cache.get('key0'))
+
+    def test_lru(self):
+        clock = iter(range(1, 1000000))
+        with mock.patch.object(kv_cache.time, 'time', lambda: next(clock)):
+            self.cache.set('keep', 'value')
+            for i in range(500):
+                self.cache.set(f'key{i}', b'x' * 100)
+                self.cache.get('keep')
+
+        self.assertEqual(self.cache.get('keep'), 'value')
+        self.assertIsNone(self.cache.get('key0'))
+
+    def test_large_entries(self):
+        for i in range(20):
+            self.cache.set(f'key{i}', b'x' * 20000)
+
+        self.assertIsNotNone(self.cache.get('key19'))
+        self.assertIsNone(self.cache.get('key0'))
+
+    def test_expired_dropped_first(self):
+        with mock.patch.object(kv_cache.time, 'time', return_value=1000.0):
+            self.cache.set('old', 'value', ttl=1)
+            self.cache.set('newer', 'value')
+
+        for i in range(500):
+            self.cache.set(f'key{i}', b'x' * 100)
+
+        self.assertIsNone(self.cache.get('old'))
+        self.assertEqual(self.cache.get('key499'), b'x' * 100)
+
+
+class ConcurrencyTest(BaseKVCache):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = self.new_cache(max_bytes=4 * 2**20)
+
+    def test_threads(self):
+        found = list()
+
+        def work(name):
+            for i in range(200):
+                self.cache.set(f'{name}{i}', i)
+                found.append(self.cache.get(f'{name}{i}') == i)
+
+        threads = [
+            threading.Thread(target=work, args=(name,))
+            for name in ('a', 'b', 'c', 'd')
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(found, [True] * 800)
+        self.assertEqual(self.cache.get('d199'), 199)
+
+    def test_processes(self):
+        self.cache.set('parent', 'value')
+        code = textwrap.dedent(
+            f"""
+            from mundane import kv_cache
+            cache = kv_cache.KVCache({str(self.path)!r})
+            assert cache.get('parent') == 'value'
+            for i in range(300):
+                cache.set(f'child{{i}}', i)
+            """
+        )
+
+        with contextlib.ExitStack() as stack:
+            children = [
+                stack.enter_context(
+                    subprocess.Popen([sys.executable, '-c', code])
+                ) for _ in range(3)
+            ]
+            for i in range(300):
+                self.cache.set(f'parent{i}', i)
+            for child in children:
+                self.assertEqual(child.wait(), 0)
+
+        self.assertEqual(self.cache.get('child299'), 299)
+        self.assertEqual(self.cache.get('parent299'), 299)
+
+    def fork(self, child: typing.Callable[[], int]) -> int:
+        """Run child in a forked process, returning its pid."""
+        pid = os.fork()
+        if not pid:  # pragma: no cover
+            code = 1
+            try:
+                code = child()
+            finally:
+                os._exit(code)
+        return pid
+
+    def wait(self, pid: int) -> int:
+        """Wait for a forked process, returning its exit code."""
+        return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+    def test_fork_excludes(self):
+        self.cache.set('parent', 'value')
+        locked_read, locked_write = os.pipe()
+        done_read, done_write = os.pipe()
+
+        def child():  # pragma: no cover
+            # pylint: disable=protected-access
+            with self.cache._locked(fcntl.LOCK_EX):
+                os.write(locked_write, b'x')
+                os.read(done_read, 1)
+            return 0
+
+        pid = self.fork(child)
+        os.read(locked_read, 1)
+        try:
+            with contextlib.ExitStack() as stack:
+                # pylint: disable=protected-access
+                locked = self.cache._locked(fcntl.LOCK_EX | fcntl.LOCK_NB)
+                with self.assertRaises(BlockingIOError):
+                    stack.enter_context(locked)
+        finally:
+            os.write(done_write, b'x')
+            for fd in (locked_read, locked_write, done_read, done_write):
+                os.close(fd)
+            self.assertEqual(self.wait(pid), 0)
+
+    def test_fork_shares_entries(self):
+        self.cache.set('parent', 'value')
+
+        def child():  # pragma: no cover
+            self.cache.set('child', self.cache.get('parent'))
+            return 0
+
+        self.assertEqual(self.wait(self.fork(child)), 0)
+
+        self.assertEqual(self.cache.get('child'), 'value')
+
+    def test_reset_after_fork(self):
+        self.cache.set('key', 'value')
+        lock = self.cache._lock  # pylint: disable=protected-access
+
+        kv_cache._reset_after_fork()  # pylint: disable=protected-access
+
+        self.assertIsNot(self.cache._lock, lock)  # pylint: disable=protected-access
+        self.assertIsNone(self.cache._map)  # pylint: disable=protected-access
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class AppTest(unittest.TestCase):
+
+    def test_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        my_app = app.ArgparseApp()
+        my_app.dirs = mock.Mock(user_cache_dir=tmpdir)
+
+        my_app.cache.set('key', 'value')
+        self.addCleanup(my_app.cache.close)
+
+        self.assertIs(my_app.cache, my_app.cache)
+        self.assertEqual(
+            my_app.cache.path, pathlib.Path(tmpdir, 'cache.mmap')
+        )
+        self.assertEqual(my_app.cache.get('key'), 'value')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
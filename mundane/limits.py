@@ -0,0 +1,242 @@
+"""Limit the resources a command may use.
+
+To add the global flags to an ArgparseApp, register using:
+   ArgparseApp().register_global_flags(limits)
+
+The limits are applied to the process after flags are parsed, before the
+command runs, so any child processes inherit them as well.  Those in effect
+are then logged.  I/O scheduling and CPU affinity are only available on
+some systems, such as Linux; elsewhere, those flags are usage errors.
+
+  --max-memory 2G          Address space limit, via RLIMIT_AS
+  --max-cpu-seconds 3600   CPU time limit, via RLIMIT_CPU (SIGXCPU)
+  --nice 10                Scheduling priority
+  --ionice idle            I/O scheduling class and optional level
+  --cpus 0-3,6             CPU affinity
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import resource
+import typing
+
+import humanize
+
+from mundane import log_mgr
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from mundane import app
+
+_SIZE_SUFFIXES = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+IONICE_CLASSES = ('idle', 'best-effort', 'realtime')
+_IONICE_CLASS_NAMES = (
+    'IOPRIO_CLASS_IDLE', 'IOPRIO_CLASS_BE', 'IOPRIO_CLASS_RT'
+)
+
+
+class Error(Exception):
+    """A limit could not be applied."""
+
+
+def parse_size(value: str) -> int:
+    """Convert a size like '512M' or '2GiB' into bytes.
+
+    Suffixes are binary, so 'K' is 1024.
+    """
+    text = value.strip().upper().removesuffix('B').removesuffix('I')
+    suffix = text[-1:] if text[-1:] in _SIZE_SUFFIXES else ''
+    try:
+        number = float(text.removesuffix(suffix))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid size: {value!r}') from None
+    if number < 0:
+        raise argparse.ArgumentTypeError(f'invalid size: {value!r}')
+    return int(number * _SIZE_SUFFIXES[suffix])
+
+
+def parse_cpus(value: str) -> set[int]:
+    """Convert a CPU list like '0-3,6' into a set of CPU numbers."""
+    cpus: set[int] = set()
+    try:
+        for item in value.split(','):
+            first, _, last = item.partition('-')
+            cpus.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'invalid CPU list: {value!r}'
+        ) from None
+    if not cpus:
+        raise argparse.ArgumentTypeError(f'invalid CPU list: {value!r}')
+    return cpus
+
+
+def parse_ionice(value: str) -> tuple[str, int | None]:
+    """Convert an I/O priority like 'best-effort:7' into class and level."""
+    ioclass, _, level = value.partition(':')
+    if ioclass not in IONICE_CLASSES:
+        raise argparse.ArgumentTypeError(
+            f'invalid I/O class: {ioclass!r} (choose from'
+            f' {", ".join(IONICE_CLASSES)})'
+        )
+    if not level:
+        return ioclass, None
+    if ioclass != 'idle' and level.isdigit() and int(level) <= 7:
+        return ioclass, int(level)
+    raise argparse.ArgumentTypeError(f'invalid I/O level: {value!r}')
+
+
+def _set_soft_limit(which: int, value: int):
+    """Set the soft limit, capped at the hard limit, which is left as is."""
+    _, hard = resource.getrlimit(which)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(which, (value, hard))
+
+
+def _describe_limit(which: int, fmt: typing.Callable[[int], str]) -> str:
+    """The soft limit in a readable form."""
+    soft, _ = resource.getrlimit(which)
+    if soft == resource.RLIM_INFINITY:
+        return 'unlimited'
+    return fmt(soft)
+
+
+def apply(
+    max_memory: int | None = None,
+    max_cpu_seconds: int | None = None,
+    nice: int | None = None,
+    ionice: tuple[str, int | None] | None = None,
+    cpus: set[int] | None = None
+):
+    """Apply any of the limits that were given, then log those in effect.
+
+    Args:
+      max_memory: Bytes of address space.
+      max_cpu_seconds: Seconds of CPU time.
+      nice: Scheduling priority, from -20 to 19.
+      ionice: I/O scheduling class, and optional level.
+      cpus: CPUs the process may run on.
+
+    Raises:
+      Error: When a limit is not allowed, e.g., a negative nice value
+        without the privileges for it, or not supported on this system.
+    """
+    if max_memory is not None:
+        _set_soft_limit(resource.RLIMIT_AS, max_memory)
+    if max_cpu_seconds is not None:
+        _set_soft_limit(resource.RLIMIT_CPU, max_cpu_seconds)
+    if cpus is not None:
+        if not hasattr(os, 'sched_setaffinity'):
+            raise Error('CPU affinity is not supported on this system')
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as error:
+            raise Error(
+                f'cannot run on CPUs {",".join(map(str, sorted(cpus)))}:'
+                f' {error}'
+            ) from error
+
+    import psutil  # pylint: disable=import-outside-toplevel
+
+    ioclasses = {
+        getattr(psutil, name): ioclass
+        for ioclass, name in zip(IONICE_CLASSES, _IONICE_CLASS_NAMES)
+        if hasattr(psutil, name)
+    }
+    process = psutil.Process()
+    if nice is not None:
+        try:
+            process.nice(nice)
+        except (psutil.Error, OSError) as error:
+            raise Error(f'cannot set nice {nice}: {error!r}') from error
+    if ionice is not None:
+        ioclass, level = ionice
+        if not hasattr(process, 'ionice'):
+            raise Error('I/O scheduling is not supported on this system')
+        try:
+            process.ionice(
+                next(
+                    key for key, value in ioclasses.items()
+                    if value == ioclass
+                ), level
+            )
+        except (psutil.Error, OSError, ValueError) as error:
+            raise Error(
+                f'cannot set I/O class {ioclass}: {error!r}'
+            ) from error
+
+    effects = [
+        'max memory=' + _describe_limit(
+            resource.RLIMIT_AS,
+            lambda x: humanize.naturalsize(x, binary=True)
+        ),
+        'max cpu seconds=' + _describe_limit(resource.RLIMIT_CPU, str),
+        f'nice={process.nice()}',
+    ]
+    if hasattr(process, 'ionice'):
+        current_ionice = process.ionice()
+        effects.append(
+            f'ionice={ioclasses.get(current_ionice.ioclass, "none")}:'
+            f'{current_ionice.value}'
+        )
+    if hasattr(os, 'sched_getaffinity'):
+        effects.append(
+            'cpus='
+            + ','.join(str(cpu) for cpu in sorted(os.sched_getaffinity(0)))
+        )
+    logging.info('Limits in effect: %s', ', '.join(effects))
+
+
+def mundane_global_flags(argp_app: app.ArgparseApp):
+    """Register global flags."""
+
+    group = argp_app.global_flags
+    actions = dict()
+    actions['max_memory'] = group.add_argument(
+        '--max-memory',
+        type=parse_size,
+        metavar='SIZE',
+        help='Limit the address space, e.g., 512M or 2G'
+    )
+    actions['max_cpu_seconds'] = group.add_argument(
+        '--max-cpu-seconds',
+        type=int,
+        metavar='SECONDS',
+        help='Limit the CPU time used'
+    )
+    actions['nice'] = group.add_argument(
+        '--nice',
+        type=int,
+        metavar='N',
+        help='Scheduling priority, -20 to 19'
+    )
+    actions['ionice'] = group.add_argument(
+        '--ionice',
+        type=parse_ionice,
+        metavar='CLASS[:LEVEL]',
+        help='I/O scheduling: idle, best-effort or realtime, level 0 to 7'
+    )
+    actions['cpus'] = group.add_argument(
+        '--cpus',
+        type=parse_cpus,
+        metavar='LIST',
+        help='Only run on these CPUs, e.g., 0-3,6'
+    )
+
+    def apply_limits(args: argparse.Namespace):
+        """Apply any limits given as flags."""
+        given = {dest: getattr(args, dest) for dest in actions}
+        for dest, value in given.items():
+            delattr(args, dest)
+            if value is not None:
+                log_mgr.reject_in_call(actions[dest])
+        if any(value is not None for value in given.values()):
+            try:
+                apply(**given)
+            except Error as error:
+                argp_app.parser.error(str(error))
+
+    argp_app.register_after_parse_hook(apply_limits)
@@ -0,0 +1,274 @@
+"""Tests for limits.py"""
+
+import argparse
+import contextlib
+import io
+import os
+import resource
+import subprocess
+import sys
+import textwrap
+import unittest
+from unittest import mock
+
+import psutil
+
+from mundane import limits
+from mundane.test_data import global_flags
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_size(self):
+        self.assertEqual(limits.parse_size('512'), 512)
+        self.assertEqual(limits.parse_size('4k'), 4096)
+        self.assertEqual(limits.parse_size('1.5M'), 3 * 2**19)
+        self.assertEqual(limits.parse_size('2GiB'), 2 * 2**30)
+        self.assertEqual(limits.parse_size('1TB'), 2**40)
+
+    def test_bad_size(self):
+        for value in ('', 'G', 'lots', '-1G'):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(argparse.ArgumentTypeError,
+                                            'invalid size'):
+                    limits.parse_size(value)
+
+    def test_cpus(self):
+        self.assertEqual(limits.parse_cpus('0'), {0})
+        self.assertEqual(limits.parse_cpus('0-3,6'), {0, 1, 2, 3, 6})
+
+    def test_bad_cpus(self):
+        for value in ('', 'a', '1-b', '3-1'):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(argparse.ArgumentTypeError,
+                                            'invalid CPU list'):
+                    limits.parse_cpus(value)
+
+    def test_ionice(self):
+        self.assertEqual(limits.parse_ionice('idle'), ('idle', None))
+        self.assertEqual(
+            limits.parse_ionice('best-effort:7'), ('best-effort', 7)
+        )
+        self.assertEqual(limits.parse_ionice('realtime:0'), ('realtime', 0))
+
+    def test_bad_ionice(self):
+        with self.assertRaisesRegex(argparse.ArgumentTypeError,
+                                    'invalid I/O class.*choose from'):
+            limits.parse_ionice('fast')
+        for value in ('idle:1', 'best-effort:8', 'realtime:x'):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(argparse.ArgumentTypeError,
+                                            'invalid I/O level'):
+                    limits.parse_ionice(value)
+
+
+class ApplyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.setrlimit = self.enterContext(
+            mock.patch.object(limits.resource, 'setrlimit')
+        )
+        self.setaffinity = self.enterContext(
+            mock.patch.object(limits.os, 'sched_setaffinity')
+        )
+        self.process = self.enterContext(
+            mock.patch('psutil.Process')
+        ).return_value
+
+    def test_nothing(self):
+        with self.assertLogs() as logs:
+            limits.apply()
+
+        self.setrlimit.assert_not_called()
+        self.setaffinity.assert_not_called()
+        self.process.nice.assert_called_once_with()
+        self.assertIn('Limits in effect', logs.output[0])
+
+    def test_everything(self):
+        with self.assertLogs():
+            limits.apply(
+                max_memory=2**30,
+                max_cpu_seconds=60,
+                nice=10,
+                ionice=('best-effort', 7),
+                cpus={0}
+            )
+
+        self.setrlimit.assert_has_calls(
+            [
+                mock.call(
+                    resource.RLIMIT_AS,
+                    (2**30, resource.getrlimit(resource.RLIMIT_AS)[1])
+                ),
+                mock.call(
+                    resource.RLIMIT_CPU,
+                    (60, resource.getrlimit(resource.RLIMIT_CPU)[1])
+                ),
+            ]
+        )
+        self.setaffinity.assert_called_once_with(0, {0})
+        self.process.nice.assert_any_call(10)
+        self.process.ionice.assert_any_call(mock.ANY, 7)
+
+    def test_cpus_not_allowed(self):
+        self.setaffinity.side_effect = OSError(22, 'Invalid argument')
+
+        with self.assertRaisesRegex(limits.Error,
+                                    'cannot run on CPUs 3,5: .*Invalid'):
+            limits.apply(cpus={5, 3})
+
+    def test_not_permitted(self):
+        self.process.nice.side_effect = psutil.AccessDenied(os.getpid())
+        self.process.ionice.side_effect = psutil.AccessDenied(os.getpid())
+
+        with self.assertRaisesRegex(limits.Error,
+                                    'cannot set nice -5: .*AccessDenied'):
+            limits.apply(nice=-5)
+        with self.assertRaisesRegex(limits.Error,
+                                    'cannot set I/O class realtime: '):
+            limits.apply(ionice=('realtime', 0))
+
+    def test_not_supported(self):
+        self.process = mock.Mock(spec=['nice'])
+        self.process.nice.return_value = 0
+        psutil.Process.return_value = self.process
+
+        with mock.patch.object(limits, 'os', mock.Mock(spec=[])):
+            with self.assertRaisesRegex(limits.Error,
+                                        'CPU affinity is not supported'):
+                limits.apply(cpus={0})
+            with self.assertRaisesRegex(limits.Error,
+                                        'I/O scheduling is not supported'):
+                limits.apply(ionice=('idle', None))
+            with self.assertLogs() as logs:
+                limits.apply(nice=5)
+
+        self.process.nice.assert_any_call(5)
+        self.assertRegex(logs.output[0], r'nice=0$')
+
+    def test_capped_by_hard_limit(self):
+        with mock.patch.object(limits.resource, 'getrlimit',
+                               return_value=(100, 200)):
+            with self.assertLogs() as logs:
+                limits.apply(max_cpu_seconds=300)
+
+        self.setrlimit.assert_called_once_with(
+            resource.RLIMIT_CPU, (200, 200)
+        )
+        self.assertIn('max memory=100 Bytes', logs.output[0])
+        self.assertIn('max cpu seconds=100', logs.output[0])
+
+
+class FlagsTest(global_flags.GlobalFlagsTest):
+
+    MODULE = limits
+
+    def setUp(self):
+        super().setUp()
+
+        self.apply = self.enterContext(mock.patch.object(limits, 'apply'))
+
+    def test_no_flags(self):
+        self.assertEqual(self.my_app.run(['noop']), 0)
+
+        self.apply.assert_not_called()
+        self.assertNotIn('nice', self.seen[0])
+
+    def test_flags(self):
+        self.assertEqual(
+            self.my_app.run(['--nice', '5', '--cpus', '1-2', 'noop']), 0
+        )
+
+        self.apply.assert_called_once_with(
+            max_memory=None,
+            max_cpu_seconds=None,
+            nice=5,
+            ionice=None,
+            cpus={1, 2}
+        )
+        self.assertNotIn('cpus', self.seen[0])
+
+    def test_error(self):
+        self.apply.side_effect = limits.Error('cannot set nice -5')
+        stderr = io.StringIO()
+
+        with self.assertRaises(SystemExit) as result:
+            with contextlib.redirect_stderr(stderr):
+                self.my_app.run(['--nice', '-5', 'noop'])
+
+        self.assertEqual(result.exception.code, 2)
+        self.assertIn('error: cannot set nice -5', stderr.getvalue())
+        self.assertEqual(self.seen, [])
+
+    def test_embedded(self):
+        stderr = io.StringIO()
+
+        self.assertEqual(self.my_app.run_embedded(['noop']), 0)
+        self.assertEqual(
+            self.my_app.run_embedded(
+                ['--max-memory', '1G', 'noop'], stderr=stderr
+            ), 2
+        )
+
+        self.apply.assert_not_called()
+        self.assertEqual(len(self.seen), 1)
+        self.assertIn(
+            'argument --max-memory: not allowed in an embedded run',
+            stderr.getvalue()
+        )
+
+    def test_help(self):
+        stdout = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            self.my_app.run([])
+
+        self.assertIn('--ionice CLASS[:LEVEL]', stdout.getvalue())
+
+    def test_applied(self):
+        cpu = min(os.sched_getaffinity(0))
+        code = textwrap.dedent(
+            f"""
+            import logging
+            import os
+            import resource
+            import sys
+
+            from mundane import app
+            from mundane import limits
+
+            logging.basicConfig(level=logging.INFO)
+
+            def show(args):
+                print(resource.getrlimit(resource.RLIMIT_AS)[0],
+                      resource.getrlimit(resource.RLIMIT_CPU)[0],
+                      os.getpriority(os.PRIO_PROCESS, 0),
+                      sorted(os.sched_getaffinity(0)))
+                return 0
+
+            my_app = app.ArgparseApp()
+            my_app.register_global_flags([limits])
+            my_app.register_command(show)
+            sys.exit(my_app.run([
+                '--max-memory', '64G', '--max-cpu-seconds', '1000',
+                '--nice', '19', '--ionice', 'idle', '--cpus', '{cpu}',
+                'show']))
+            """
+        )
+
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True,
+            check=True,
+            text=True
+        )
+
+        self.assertEqual(
+            result.stdout.split(),
+            [str(64 * 2**30), '1000', '19', f'[{cpu}]']
+        )
+        self.assertIn(f'ionice=idle:0, cpus={cpu}', result.stderr)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
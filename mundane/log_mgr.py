@@ -5,19 +5,73 @@ To turn on the global log file, execute the following early in your program:
 
 To use the global flag with ArgparseApp, register using:
    ArgparseApp().register_global_flags(log_mgr)
+
+To also copy records at or above a level to stderr, e.g., while debugging
+interactively, use the --stderr-level flag or:
+  log_mgr.also_log_to_stderr(logging.INFO)
+
+To also write glog style progname.WARNING and progname.ERROR files, with only
+the records at or above those levels, use:
+  log_mgr.activate_severity_files()
+
+To keep logging in tight loops from flooding the log file, use one of:
+  log_mgr.log_every_n(logging.INFO, 'Processed %s', 1000, item)
+  log_mgr.log_first_n(logging.WARNING, 'Odd item %s', 10, item)
+  log_mgr.log_every_n_seconds(logging.INFO, 'At %s', 5.0, item)
+  log_mgr.log_sampled(logging.DEBUG, 'Saw %s', 0.01, item)
+
+To also keep every record, including DEBUG, in a fixed size ring file next to
+the log file, activate the flight recorder after the log file:
+  log_mgr.activate_flight_recorder()
+
+The ring file can be turned back into text using the command registered by:
+   ArgparseApp().register_commands(log_mgr)
+
+That also registers a command to merge log files, e.g., collected from many
+hosts, into one stream ordered by time, see merge_log_files().
+
+To give each thread, e.g., each request in a service, its own log level:
+  with log_mgr.call_log_level(logging.DEBUG):
+      ...
+
+To put other output, e.g., a trace, next to the log file, use:
+  log_mgr.sibling_path('.trace.json')
+
+To have worker processes log into the same file, use:
+  with log_mgr.WorkerLogging() as worker_logging:
+      with ProcessPoolExecutor(initializer=log_mgr.worker_initializer,
+                               initargs=worker_logging.initargs) as pool:
+          ...
 """
+# pylint: disable=too-many-lines
 from __future__ import annotations
 
 import argparse
-import datetime
+import contextlib
+import contextvars
+import fnmatch
+import functools
+import heapq
 import logging
+import mmap
+import os
 import pathlib
-import platform
+import pwd
+import random
+import re
+import resource
+import struct
+import sys
+import threading
+import time
+import traceback
 import typing
-
-import psutil
+import zlib
 
 if typing.TYPE_CHECKING:  # pragma: no cover
+    import multiprocessing.context
+    import types
+
     from mundane import app
 
 LOG_FORMAT = (
@@ -25,8 +79,20 @@ LOG_FORMAT = (
     '(%(funcName)s)] {%(name)s} %(message)s'
 )
 
+WORKER_FORMAT = '[pid %(process)d] %(message)s'
+
+FLIGHT_RECORDER_SIZE = 4 * 2**20
+
+# Matches the start of each record written using LOG_FORMAT, capturing the
+# timestamp, which sorts as text.
+_RECORD_START = re.compile(r'\S(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}): ')
+# Matches the long_filename of a LogHandler, with any suffixes.
+_LOG_FILENAME = re.compile(
+    r'\.log\.(?P<host>.+)\.(?P<user>[^.]+)\.\d{8}-\d{6}\.(?P<pid>\d+)'
+)
+
 
-class LogHandler(logging.FileHandler):
+class LogHandler(logging.FileHandler):  # pylint: disable=too-many-instance-attributes
     """Logging handler that writes to a directory.
 
     Features:
@@ -34,6 +100,8 @@ class LogHandler(logging.FileHandler):
     * It uses a filename that should be unique across clusters.
     * It provides a convenience symlink when possible.
     * The output directory can be set before the first log is written.
+    * It can also copy records to stderr, formatting each record only once.
+    * It can also copy records to per severity files, glog style.
 
     File names use the pattern below.  They should be as unique as hostnames
     across a cluster.  With the pattern, they should be easy to identify for
@@ -46,21 +114,43 @@ class LogHandler(logging.FileHandler):
     shared by users with a sticky-bit set (e.g., /tmp).
 
     progname.log -> progname.log.$HOST.$USER.$DATETIME.$PID
+
+    Per severity files, if any, are next to the log file, with matching
+    symlinks:
+
+    progname.WARNING -> progname.log.$HOST.$USER.$DATETIME.$PID.WARNING
     """
 
     def __init__(self, progname: str, output_dir: str):
-        process = psutil.Process()
-
-        now = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        # Only the cheap parts of the identity are captured up front.  The
+        # rest is computed the first time the full filename is needed,
+        # usually when the first record is written.
+        self._pid = os.getpid()
+        self._started = time.time()
 
         self.short_filename = f'{progname}.log'
-        self.long_filename = (
-            f'{self.short_filename}.{platform.node()}'
-            f'.{process.username()}.{now}.{process.pid}'
-        )
         self.output_dir = output_dir
+        # Minimal level of records also copied to stderr, if any.
+        self.stderr_level: int | None = None
+        # Levels that get their own file of records at or above them.
+        self.severity_levels: tuple[int, ...] = ()
+        self._severity_streams: dict[int, typing.IO[str]] = dict()
 
-        super().__init__(self._base_path, delay=True)
+        super().__init__(output_dir, delay=True)
+
+    @functools.cached_property
+    def long_filename(self) -> str:
+        """The unique name of the log file."""
+        now = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started))
+        uid = os.getuid()
+        try:
+            user = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            user = str(uid)
+        return (
+            f'{self.short_filename}.{os.uname().nodename}'
+            f'.{user}.{now}.{self._pid}'
+        )
 
     @property
     def output_dir(self):
@@ -74,25 +164,201 @@ class LogHandler(logging.FileHandler):
             self._output_dir, self.short_filename
         ).absolute()
 
-        self._base_path = pathlib.Path(self._output_dir,
-                                       self.long_filename).absolute()
-        self.baseFilename = str(self._base_path)
+    @property
+    def baseFilename(self) -> str:  # pylint: disable=invalid-name
+        """Full path of the log file, as used by logging.FileHandler."""
+        return str(self._base_path)
+
+    @baseFilename.setter
+    def baseFilename(self, value: str):  # pylint: disable=invalid-name
+        # FileHandler sets this in its constructor, but it is always derived
+        # from output_dir and long_filename instead.
+        del value
+
+    @property
+    def _base_path(self) -> pathlib.Path:
+        """Full path of the log file."""
+        return pathlib.Path(self._output_dir, self.long_filename).absolute()
+
+    def emit(self, record: logging.LogRecord):
+        severity_levels = [
+            level for level in self.severity_levels if record.levelno >= level
+        ]
+        to_stderr = (
+            self.stderr_level is not None
+            and record.levelno >= self.stderr_level
+        )
+        if not (severity_levels or to_stderr):
+            super().emit(record)
+            return
+        # The same formatted text goes everywhere, rather than letting
+        # separate handlers format the record again.
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.flush()
+            for level in severity_levels:
+                stream = self._severity_streams.get(level)
+                if stream is None:
+                    stream = self._open_severity(level)
+                    self._severity_streams[level] = stream
+                stream.write(msg)
+                stream.flush()
+            if to_stderr:
+                sys.stderr.write(msg)
+                sys.stderr.flush()
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
+
+    def close(self):
+        with self.lock:  # type: ignore[union-attr]
+            for stream in self._severity_streams.values():
+                stream.close()
+            self._severity_streams.clear()
+        super().close()
+
+    def severity_path(self, level: int) -> pathlib.Path:
+        """Full path of the file for records at or above a level."""
+        return pathlib.Path(
+            f'{self.baseFilename}.{logging.getLevelName(level)}'
+        )
 
     def _open(self):
         self._base_path.parent.mkdir(parents=True, exist_ok=True)
 
         handle = super()._open()
+        _symlink(self.symlink_path, self.baseFilename)
 
-        # best effort on symlink
-        try:
-            self.symlink_path.unlink(missing_ok=True)
-            self.symlink_path.symlink_to(self.baseFilename)
-        except OSError:
-            pass
+        return handle
 
+    def _open_severity(self, level: int) -> typing.IO[str]:
+        """Open the file for records at or above a level."""
+        path = self.severity_path(level)
+        handle = path.open(  # pylint: disable=consider-using-with
+            self.mode, encoding=self.encoding, errors=self.errors
+        )
+        _symlink(
+            self.symlink_path.with_suffix(f'.{logging.getLevelName(level)}'),
+            str(path)
+        )
         return handle
 
 
+def _symlink(path: pathlib.Path, target: str):
+    """Point a convenience symlink at a log file, on a best effort basis."""
+    try:
+        path.unlink(missing_ok=True)
+        path.symlink_to(target)
+    except OSError:
+        pass
+
+
+class FlightRecorder(logging.Handler):
+    """Logging handler that keeps recent records in a memory mapped ring.
+
+    The ring is a fixed size file next to the file of the LogHandler it is
+    paired with, using the same name plus a ".flight" suffix.  Like
+    LogHandler, the file is not created until the first record is written.
+
+    Writing a record only touches the mapped memory, so there is no system
+    call per record, and the kernel owns the dirty pages, so the contents
+    survive the process being killed, even by SIGKILL.
+
+    Each entry is a header (magic, sequence number, length and CRC32)
+    followed by the formatted record.  When the ring wraps, entries that
+    were partially overwritten fail their CRC and are skipped by
+    decode_flight_recorder(), which is also how it resynchronizes after a
+    write that was interrupted.
+    """
+
+    FILE_HEADER = struct.Struct('<8sQ')
+    FILE_MAGIC = b'MUNDFLR1'
+    ENTRY_HEADER = struct.Struct('<4sQII')
+    # Never valid in UTF-8 text, so it cannot show up inside a record.
+    ENTRY_MAGIC = b'\xf1\x19\x47\x7e'
+
+    def __init__(
+        self,
+        log_handler: LogHandler,
+        size: int = FLIGHT_RECORDER_SIZE,
+        level: int | str = logging.DEBUG
+    ):
+        """Initialize the instance.
+
+        Args:
+          log_handler: Provides the directory and name for the ring file.
+          size: Size of the ring file in bytes.
+          level: Minimal level of records kept in the ring.
+        """
+        super().__init__(level)
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.size = size
+        self._log_handler = log_handler
+        self._path: pathlib.Path | None = None
+        self._map: mmap.mmap | None = None
+        self._offset = self.FILE_HEADER.size
+        self._max_payload = size - self.FILE_HEADER.size - self.ENTRY_HEADER.size
+        self._seq = 0
+
+    @property
+    def path(self) -> pathlib.Path:
+        """Where the ring file is, or will be, written."""
+        if self._path is not None:
+            return self._path
+        return pathlib.Path(f'{self._log_handler.baseFilename}.flight')
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            payload = self.format(record).encode('utf-8', 'backslashreplace')
+            if len(payload) > self._max_payload:
+                # Cut on a character boundary, so the entry still decodes.
+                payload = payload[:self._max_payload].decode(
+                    'utf-8', 'ignore'
+                ).encode('utf-8')
+            if self._map is None:
+                self._map = self._open()
+
+            end = self._offset + self.ENTRY_HEADER.size + len(payload)
+            if end > self.size:
+                self._offset = self.FILE_HEADER.size
+                end = self._offset + self.ENTRY_HEADER.size + len(payload)
+
+            crc = zlib.crc32(payload, self._seq & 0xffffffff)
+            self.ENTRY_HEADER.pack_into(
+                self._map, self._offset, self.ENTRY_MAGIC, self._seq,
+                len(payload), crc
+            )
+            self._map[end - len(payload):end] = payload
+            self._offset = end
+            self._seq += 1
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:  # type: ignore[union-attr]
+            if self._map is not None:
+                self._map.flush()
+
+    def close(self):
+        with self.lock:  # type: ignore[union-attr]
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+        super().close()
+
+    def _open(self) -> mmap.mmap:
+        """Create the ring file and map it."""
+        self._path = self.path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.open('w+b') as handle:
+            handle.truncate(self.size)
+            ring = mmap.mmap(handle.fileno(), self.size)
+        self.FILE_HEADER.pack_into(ring, 0, self.FILE_MAGIC, self.size)
+        return ring
+
+
 class LogLevel(argparse.Action):
     """Callback action to tweak log settings during flag parsing."""
 
@@ -109,10 +375,7 @@ class LogLevel(argparse.Action):
         """
         self.log_level = log_level
         if self.log_level is None:
-            root_logger = logging.getLogger()
-            self.log_level = logging.getLevelName(
-                root_logger.getEffectiveLevel()
-            )
+            self.log_level = logging.getLevelName(_root_log_level())
 
         if 'help' in kwargs:
             kwargs['help'] += ' (Default: %(_log_level)s)'
@@ -163,6 +426,7 @@ class LogDir(argparse.Action):
             namespace: argparse.Namespace,
             values: str,
             option_string: str | None = None):
+        reject_in_call(self)
         self.log_dir = values
 
     @property
@@ -177,10 +441,775 @@ class LogDir(argparse.Action):
             self._handler.output_dir = self._log_dir
 
 
-def set_root_log_level(level: str | None):
-    """Convenience function for setting the root logger level by name."""
+class StderrLevel(argparse.Action):
+    """Callback action to also copy records to stderr.
+
+    This expects to work with the global LogHandler instance from this module.
+    """
+
+    # The following ignore is for the 'values' parameter.
+    def __call__(  # type: ignore[override]
+            self,
+            parser: argparse.ArgumentParser,
+            namespace: argparse.Namespace,
+            values: str,
+            option_string: str | None = None):
+        reject_in_call(self)
+        also_log_to_stderr(values)
+
+
+class VModule(argparse.Action):
+    """Callback action to set log levels for individual modules.
+
+    See set_module_log_levels() for the format.
+    """
+
+    # The following ignore is for the 'values' parameter.
+    def __call__(  # type: ignore[override]
+            self,
+            parser: argparse.ArgumentParser,
+            namespace: argparse.Namespace,
+            values: str,
+            option_string: str | None = None):
+        reject_in_call(self)
+        try:
+            set_module_log_levels(values)
+        except ValueError as error:
+            raise argparse.ArgumentError(self, str(error)) from error
+
+
+class _CallSite:
+    """Per call site state for the rate limited logging functions."""
+
+    __slots__ = ('calls', 'suppressed', 'last')
+
+    def __init__(self):
+        self.calls = 0
+        self.suppressed = 0
+        self.last = -float('inf')
+
+    def suppress(self):
+        """Count a message that was not logged."""
+        with _call_sites_lock:
+            self.suppressed += 1
+
+    def log(
+        self, logger: logging.Logger | None, level: int, msg: typing.Any,
+        args: tuple[typing.Any, ...]
+    ):
+        """Log a message on behalf of the call site.
+
+        The number of messages suppressed since the last one is appended.
+        """
+        with _call_sites_lock:
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            msg = f'{msg} [{suppressed} suppressed]'
+        if logger is None:
+            logger = logging.getLogger()
+        # Attribute the record to the original call site.
+        logger.log(level, msg, *args, stacklevel=3)
+
+
+_call_sites: dict[tuple[typing.Any, int], _CallSite] = dict()
+_call_sites_lock = threading.Lock()
+
+
+class WorkerLogging:
+    """Funnel log records from worker processes into this process.
+
+    Worker processes, whether forked or spawned, should call
+    worker_initializer() with this instance's initargs.  Their records are
+    then sent back through a queue and handed to the matching logger in this
+    process, so they end up in the single log file set up by activate().
+
+    The listener thread runs while this instance is used as a context
+    manager.  Any records still in the queue are processed on exit, so the
+    workers should be finished first.
+    """
+
+    def __init__(
+        self, context: multiprocessing.context.BaseContext | None = None
+    ):
+        """Initialize the instance.
+
+        Args:
+          context: The multiprocessing context the workers will use.  If
+            None, the default one is used.
+        """
+        # Imported on first use, to keep them off the startup path.
+        from logging import handlers  # pylint: disable=import-outside-toplevel
+        import multiprocessing  # pylint: disable=import-outside-toplevel
+
+        if context is None:
+            context = multiprocessing.get_context()
+        self.queue = context.Queue()
+        self._listener = handlers.QueueListener(
+            self.queue, _LocalDispatcher()
+        )
+
+    @property
+    def initargs(self) -> tuple[typing.Any, ...]:
+        """Arguments to pass to worker_initializer()."""
+        return (self.queue, logging.getLogger().getEffectiveLevel())
+
+    def __enter__(self) -> WorkerLogging:
+        self._listener.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._listener.stop()
+
+
+class _LocalDispatcher(logging.Handler):
+    """Dispatch records the same as if they were logged locally."""
+
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+
+def set_root_log_level(level: int | str | None):
+    """Convenience function for setting the root logger level by name.
+
+    When a FlightRecorder is active, the root logger itself is kept at the
+    level of the recorder, and this level is applied by a filter on the other
+    handlers of the root logger instead.  Records from loggers with a level
+    of their own, as set by set_module_log_levels(), pass that filter, as
+    they would have passed the root logger.
+
+    Inside call_log_level(), only the level of the current context is set.
+    """
     if level is not None:
-        logging.getLogger().setLevel(level)
+        root_logger = logging.getLogger()
+        recorders = _flight_recorders()
+        if _call_level.get(None) is not None:
+            _call_level.set(_level_number(level))
+        elif _call_level_filter.installed:
+            _call_level_filter.level = _level_number(level)
+        elif recorders:
+            _root_level_filter.level = _level_number(level)
+            for handler in root_logger.handlers:
+                if handler not in recorders:
+                    handler.addFilter(_root_level_filter)
+            root_logger.setLevel(min(handler.level for handler in recorders))
+        else:
+            root_logger.setLevel(level)
+
+
+@contextlib.contextmanager
+def call_log_level(level: int | str | None = None) -> typing.Iterator[None]:
+    """Give the current context its own root log level.
+
+    Context variables are per thread and per asyncio task, so concurrent
+    ArgparseApp.run_embedded() calls each get their own level.  Within the
+    context, set_root_log_level(), and so the --log-level flag, only change
+    the level of the context, and flags that would change process wide
+    logging settings are rejected.
+
+    While any context is active, the root logger and its handlers, except
+    for any FlightRecorders, are opened up to all levels, and a filter that
+    applies the level of the current context is added to those handlers.
+    Outside of any context, the filter applies the level last set by
+    set_root_log_level().  Handlers added while a context is active, e.g.,
+    by logging.basicConfig(), get the filter when they first see a record,
+    but keep their own level.  When the last context exits, the filter is
+    removed and the levels are put back, including any change made by
+    set_root_log_level() meanwhile.
+
+    Args:
+      level: Initial level for the context.  Defaults to the root log level.
+    """
+    _call_level_filter.install()
+    token = _call_level.set(
+        _root_log_level() if level is None else _level_number(level)
+    )
+    try:
+        yield
+    finally:
+        _call_level.reset(token)
+        _call_level_filter.uninstall()
+
+
+class _CallLevelFilter(logging.Filter):
+    """Apply the log level of the current call_log_level() context."""
+
+    def __init__(self):
+        super().__init__()
+        self.level = logging.NOTSET
+        self.installed = False
+        self._lock = threading.Lock()
+        self._users = 0
+        self._saved_levels = list()
+        self._handlers = list()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        self.adopt_new_handlers(record)
+        return (
+            record.levelno >= _call_level.get(self.level)
+            or _has_own_level(record.name)
+        )
+
+    def adopt_new_handlers(self, record: logging.LogRecord) -> bool:
+        """Add this filter to handlers added to the root logger later.
+
+        This is also a filter on the root logger itself, so it sees the
+        record that made logging.basicConfig() add a handler.  It never
+        drops the record.
+        """
+        del record
+        root_logger = logging.getLogger()
+        if root_logger.handlers == self._handlers:
+            return True
+        with self._lock:
+            if self.installed:
+                recorders = _flight_recorders()
+                for handler in root_logger.handlers:
+                    if handler not in recorders and self not in handler.filters:
+                        self._saved_levels.append((handler, handler.level))
+                        handler.addFilter(self)
+                self._handlers = root_logger.handlers.copy()
+        return True
+
+    def install(self):
+        """Move level checks from the root logger into this filter."""
+        with self._lock:
+            self._users += 1
+            if self.installed:
+                return
+            self.level = _root_log_level()
+            root_logger = logging.getLogger()
+            recorders = _flight_recorders()
+            self._saved_levels = [(root_logger, root_logger.level)]
+            for handler in root_logger.handlers:
+                if handler not in recorders:
+                    self._saved_levels.append((handler, handler.level))
+                    handler.setLevel(logging.NOTSET)
+                    handler.removeFilter(_root_level_filter)
+                    handler.addFilter(self)
+            root_logger.setLevel(logging.NOTSET)
+            root_logger.addFilter(self.adopt_new_handlers)
+            self._handlers = root_logger.handlers.copy()
+            self.installed = True
+
+    def uninstall(self):
+        """Undo install() once its last user is done."""
+        with self._lock:
+            self._users -= 1
+            if self._users:
+                return
+            logging.getLogger().removeFilter(self.adopt_new_handlers)
+            for filterer, level in self._saved_levels:
+                filterer.removeFilter(self)
+                filterer.setLevel(level)
+            self._saved_levels = list()
+            self._handlers = list()
+            self.installed = False
+            set_root_log_level(self.level)
+
+
+class _RootLevelFilter(logging.Filter):  # pylint: disable=too-few-public-methods
+    """Apply the root log level on handlers, for set_root_log_level()."""
+
+    def __init__(self):
+        super().__init__()
+        self.level = logging.NOTSET
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.level or _has_own_level(record.name)
+
+
+_call_level: contextvars.ContextVar[int] = contextvars.ContextVar(
+    'mundane_call_level'
+)
+_call_level_filter = _CallLevelFilter()
+_root_level_filter = _RootLevelFilter()
+
+
+def reject_in_call(action: argparse.Action):
+    """Refuse a flag that changes process wide settings in call_log_level().
+
+    For example, after parse hooks of flags that change the process, such as
+    resource limits, call this when the flag is given.
+
+    Args:
+      action: The action of the flag, as returned by add_argument().
+
+    Raises:
+      argparse.ArgumentError: Inside call_log_level().
+    """
+    if _call_level.get(None) is not None:
+        raise argparse.ArgumentError(
+            action,
+            'not allowed in an embedded run, as it affects the process'
+        )
+
+
+def cycle_root_log_level(
+    signum: int | None = None, frame: types.FrameType | None = None
+):
+    """Lower the root log level by one step, wrapping around.
+
+    For example, WARNING becomes INFO, then DEBUG, then CRITICAL.  This is
+    suitable as a signal handler.
+
+    Args:
+      signum: Ignored.
+      frame: Ignored.
+    """
+    del signum, frame
+    # TODO: switch to getLevelNamesMapping() once minver = 3.11
+    levels = sorted(level for level in logging._levelToName if level)  # pylint: disable=protected-access
+    lower = [level for level in levels if level < _root_log_level()]
+    level = lower[-1] if lower else levels[-1]
+    set_root_log_level(level)
+    logging.log(
+        level, 'Root log level is now %s', logging.getLevelName(level)
+    )
+
+
+def log_stacks_and_usage(
+    signum: int | None = None, frame: types.FrameType | None = None
+):
+    """Log the stacks of all threads and the resource usage of the process.
+
+    The message is logged at the current root log level, so it is always
+    written.  This is suitable as a signal handler.
+
+    Args:
+      signum: Ignored.
+      frame: If provided, used as the stack of the current thread, so the
+        signal handler itself is not included.
+    """
+    del signum
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    frames = sys._current_frames()  # pylint: disable=protected-access
+    if frame is not None:
+        frames[threading.get_ident()] = frame
+
+    lines = list()
+    for ident, thread_frame in frames.items():
+        lines.append(f'Thread {names.get(ident, "<unknown>")} ({ident}):')
+        lines.extend(
+            line.rstrip('\n')
+            for line in traceback.format_stack(thread_frame)
+        )
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    lines.append(
+        'Usage: ' + ' '.join(
+            f'{field.removeprefix("ru_")}={getattr(usage, field)}'
+            for field in dir(usage)
+            if field.startswith('ru_')
+        )
+    )
+
+    logging.log(
+        max(_root_log_level(), logging.DEBUG), 'Stacks and usage:\n%s',
+        '\n'.join(lines)
+    )
+
+
+def _root_log_level() -> int:
+    """The level last set by set_root_log_level()."""
+    level = _call_level.get(None)
+    if level is not None:
+        return level
+    if _call_level_filter.installed:
+        return _call_level_filter.level
+    root_logger = logging.getLogger()
+    recorders = _flight_recorders()
+    others = [
+        handler for handler in root_logger.handlers
+        if handler not in recorders
+    ]
+    if recorders and others:
+        return _root_level_filter.level
+    return root_logger.getEffectiveLevel()
+
+
+def _has_own_level(name: str) -> bool:
+    """Whether a logger, or a parent other than the root, sets a level."""
+    logger = logging.root.manager.loggerDict.get(name)
+    while isinstance(logger, logging.Logger) and logger is not logging.root:
+        if logger.level:
+            return True
+        logger = logger.parent
+    return False
+
+
+def _flight_recorders() -> list[logging.Handler]:
+    """Any FlightRecorders attached to the root logger."""
+    return [
+        handler for handler in logging.getLogger().handlers
+        if isinstance(handler, FlightRecorder)
+    ]
+
+
+def decode_flight_recorder(path: str | pathlib.Path) -> list[str]:
+    """Turn a FlightRecorder ring file back into formatted records.
+
+    Args:
+      path: The ring file.
+
+    Returns:
+      The records that are still intact, oldest first.
+
+    Raises:
+      ValueError: When the file is not a ring file.
+    """
+    data = pathlib.Path(path).read_bytes()
+    header = FlightRecorder.FILE_HEADER
+    entry = FlightRecorder.ENTRY_HEADER
+    if data[:len(FlightRecorder.FILE_MAGIC)] != FlightRecorder.FILE_MAGIC:
+        raise ValueError(f'Not a flight recorder file: {path}')
+
+    records = list()
+    pos = data.find(FlightRecorder.ENTRY_MAGIC, header.size)
+    while 0 <= pos <= len(data) - entry.size:
+        _, seq, length, crc = entry.unpack_from(data, pos)
+        start = pos + entry.size
+        payload = data[start:start + length]
+        if len(payload) == length and zlib.crc32(payload,
+                                                 seq & 0xffffffff) == crc:
+            records.append((seq, payload.decode('utf-8', 'replace')))
+            pos = start + length
+        else:
+            pos += 1
+        pos = data.find(FlightRecorder.ENTRY_MAGIC, pos)
+
+    return [text for _, text in sorted(records)]
+
+
+def merge_log_files(
+    paths: typing.Iterable[str | pathlib.Path]
+) -> typing.Iterator[str]:
+    """Merge log files into one stream of records ordered by time.
+
+    Each file is read one record at a time, and a heap picks the earliest
+    record among them, so memory use is constant per file.  Files compressed
+    with gzip, bzip2 or xz are read based on their suffix.
+
+    Each line is prefixed with the host and pid taken from the name of the
+    file, as written by LogHandler, or with the name of the file otherwise.
+    Lines that do not start a record, like tracebacks, stay with the record
+    before them.
+
+    Args:
+      paths: The log files, each already ordered by time.
+
+    Yields:
+      Records, which may be several lines each.
+    """
+    return (
+        text for _, text in heapq.merge(
+            *(_log_records(pathlib.Path(path)) for path in paths),
+            key=lambda item: item[0]
+        )
+    )
+
+
+def _log_records(path: pathlib.Path) -> typing.Iterator[tuple[str, str]]:
+    """The timestamp and tagged text of each record in a log file."""
+    match = _LOG_FILENAME.search(path.name)
+    if match:
+        tag = f'{match["host"]}:{match["pid"]} '
+    else:
+        tag = f'{path.name} '
+
+    import bz2  # pylint: disable=import-outside-toplevel
+    import gzip  # pylint: disable=import-outside-toplevel
+    import lzma  # pylint: disable=import-outside-toplevel
+
+    openers: dict[str, typing.Callable[..., typing.IO[str]]] = {
+        '.gz': gzip.open,
+        '.bz2': bz2.open,
+        '.xz': lzma.open,
+    }
+    opener = openers.get(path.suffix, open)
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as handle:
+        timestamp = ''
+        lines: list[str] = list()
+        for line in handle:
+            start = _RECORD_START.match(line)
+            if start and lines:
+                yield timestamp, ''.join(lines)
+                lines = list()
+            if start:
+                timestamp = start[1]
+            if not line.endswith('\n'):
+                line += '\n'
+            lines.append(tag + line)
+        if lines:
+            yield timestamp, ''.join(lines)
+
+
+def set_module_log_levels(spec: str):
+    """Set log levels for selected loggers.
+
+    Each pattern is matched, fnmatch style, against the names of existing
+    loggers and against the source file names, without the extension, of
+    loaded modules.  A matching module selects the logger of the same name,
+    as created by the usual logging.getLogger(__name__).  A pattern without
+    wildcards also selects the logger of that name directly, so its children
+    created later will inherit the level.  Patterns with wildcards are also
+    matched once against each logger created later, such as by modules that
+    are imported lazily.
+
+    As the matching is done up front, logging calls only pay for the normal,
+    cached, level check.  That also means only records logged through those
+    named loggers are affected.  Calls on the root logger, like
+    logging.debug(), are not matched by source file, and keep following the
+    root log level.
+
+    Args:
+      spec: Comma separated list of pattern=level, for example,
+        "mundane.app=DEBUG,*_test=INFO".  Levels may be names or numbers.
+
+    Raises:
+      ValueError: When the spec is malformed.
+    """
+    for item in spec.split(','):
+        pattern, _, level_name = item.strip().partition('=')
+        level = logging.getLevelName(level_name)
+        if not isinstance(level, int):
+            if not level_name.isdigit():
+                raise ValueError(f'Invalid pattern=level: "{item}"')
+            level = int(level_name)
+        if not pattern:
+            raise ValueError(f'Invalid pattern=level: "{item}"')
+
+        names = set(
+            name for name in logging.root.manager.loggerDict
+            if fnmatch.fnmatchcase(name, pattern)
+        )
+        names.update(
+            name for name, module in list(sys.modules.items())
+            if fnmatch.fnmatchcase(_module_stem(module), pattern)
+        )
+        if any(char in pattern for char in '*?['):
+            _add_wildcard_level(pattern, level)
+        else:
+            names.add(pattern)
+        for name in names:
+            logging.getLogger(name).setLevel(level)
+
+
+# Wildcard patterns from set_module_log_levels(), and their levels.
+_wildcard_levels: list[tuple[str, int]] = list()
+
+
+def _add_wildcard_level(pattern: str, level: int):
+    """Also apply a wildcard pattern to loggers created from now on."""
+    global _wildcard_levels  # pylint: disable=global-statement
+    _wildcard_levels = _wildcard_levels + [(pattern, level)]
+
+    manager = logging.root.manager
+    base = manager.loggerClass or logging.getLoggerClass()
+    if not issubclass(base, _WildcardLevelMixin):
+        manager.setLoggerClass(
+            type(base.__name__, (_WildcardLevelMixin, base), dict())
+        )
+
+
+def _wildcard_level(name: str) -> int:
+    """The level of the last wildcard pattern matching a logger name."""
+    stem = _module_stem(sys.modules.get(name))
+    candidates = [name, stem] if stem else [name]
+    level = logging.NOTSET
+    for pattern, pattern_level in _wildcard_levels:
+        if any(fnmatch.fnmatchcase(text, pattern) for text in candidates):
+            level = pattern_level
+    return level
+
+
+class _WildcardLevelMixin:  # pylint: disable=too-few-public-methods
+    """Give new loggers the level of any matching wildcard pattern."""
+
+    def __init__(self, name: str, level: int = logging.NOTSET):
+        level = level or _wildcard_level(name)
+        super().__init__(name, level)  # type: ignore[call-arg]
+
+
+def _module_stem(module: typing.Any) -> str:
+    """The base name of a module's source file, as used by vmodule."""
+    filename = getattr(module, '__file__', None)
+    if not filename:
+        return ''
+    return _path_stem(filename)
+
+
+@functools.cache
+def _path_stem(filename: str) -> str:
+    """Cached, as there are many modules and they rarely change."""
+    path = pathlib.PurePath(filename)
+    if path.stem == '__init__':
+        return path.parent.name
+    return path.stem
+
+
+def log_every_n(
+    level: int,
+    msg: typing.Any,
+    n: int,
+    *args: typing.Any,
+    logger: logging.Logger | None = None
+):
+    """Log only on the 1st, n+1th, 2n+1th, ... call from this call site.
+
+    Args:
+      level: As per logging.Logger.log().
+      msg: As per logging.Logger.log().
+      n: How often to log.
+      args: As per logging.Logger.log().
+      logger: Where to log.  Defaults to the root logger.
+    """
+    site = _call_site()
+    with _call_sites_lock:
+        emit = site.calls % n == 0
+        site.calls += 1
+    if emit:
+        site.log(logger, level, msg, args)
+    else:
+        site.suppress()
+
+
+def log_first_n(
+    level: int,
+    msg: typing.Any,
+    n: int,
+    *args: typing.Any,
+    logger: logging.Logger | None = None
+):
+    """Log only on the first n calls from this call site.
+
+    Later calls are silently dropped, so no count is kept.
+
+    Args:
+      level: As per logging.Logger.log().
+      msg: As per logging.Logger.log().
+      n: How many times to log.
+      args: As per logging.Logger.log().
+      logger: Where to log.  Defaults to the root logger.
+    """
+    site = _call_site()
+    with _call_sites_lock:
+        emit = site.calls < n
+        site.calls += 1
+    if emit:
+        site.log(logger, level, msg, args)
+
+
+def log_every_n_seconds(
+    level: int,
+    msg: typing.Any,
+    n_seconds: float,
+    *args: typing.Any,
+    logger: logging.Logger | None = None
+):
+    """Log at most once every n_seconds from this call site.
+
+    Args:
+      level: As per logging.Logger.log().
+      msg: As per logging.Logger.log().
+      n_seconds: Minimum time between messages.
+      args: As per logging.Logger.log().
+      logger: Where to log.  Defaults to the root logger.
+    """
+    site = _call_site()
+    now = time.monotonic()
+    with _call_sites_lock:
+        emit = now - site.last >= n_seconds
+        if emit:
+            site.last = now
+    if emit:
+        site.log(logger, level, msg, args)
+    else:
+        site.suppress()
+
+
+def log_sampled(
+    level: int,
+    msg: typing.Any,
+    rate: float,
+    *args: typing.Any,
+    logger: logging.Logger | None = None
+):
+    """Log a random sample of the calls from this call site.
+
+    Args:
+      level: As per logging.Logger.log().
+      msg: As per logging.Logger.log().
+      rate: The fraction of calls to log, from 0.0 to 1.0.
+      args: As per logging.Logger.log().
+      logger: Where to log.  Defaults to the root logger.
+    """
+    site = _call_site()
+    if random.random() < rate:
+        site.log(logger, level, msg, args)
+    else:
+        site.suppress()
+
+
+def _call_site() -> _CallSite:
+    """State for whoever called the caller of this function."""
+    frame = sys._getframe(2)  # pylint: disable=protected-access
+    key = (frame.f_code, frame.f_lineno)
+    site = _call_sites.get(key)
+    if site is None:
+        with _call_sites_lock:
+            site = _call_sites.setdefault(key, _CallSite())
+    return site
+
+
+def worker_initializer(queue: typing.Any, level: int | str):
+    """Send all logging in this worker process to the parent.
+
+    Any handlers inherited from the parent are removed, but not closed, as
+    the parent still owns them.  The worker process id is added to each
+    message, as the records are otherwise indistinguishable from those of
+    the parent.
+
+    Args:
+      queue: From WorkerLogging.queue in the parent.
+      level: Initial level for the root logger in this process.
+    """
+    from logging import handlers  # pylint: disable=import-outside-toplevel
+
+    handler = handlers.QueueHandler(queue)
+    handler.setFormatter(logging.Formatter(WORKER_FORMAT))
+    root_logger = logging.getLogger()
+    for hdlr in root_logger.handlers.copy():
+        root_logger.removeHandler(hdlr)
+    root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+
+def flight_recorder(args: argparse.Namespace) -> int:
+    """Decode flight recorder files into log text."""
+    ret = 0
+    for path in args.paths:
+        try:
+            records = decode_flight_recorder(path)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            ret = 1
+        else:
+            for record in records:
+                print(record)
+
+    return ret
+
+
+def merge_logs(args: argparse.Namespace) -> int:
+    """Merge log files, plain or compressed, ordered by time."""
+    try:
+        for record in merge_log_files(args.paths):
+            sys.stdout.write(record)
+    except OSError as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    return 0
 
 
 def mundane_global_flags(argp_app: app.ArgparseApp):
@@ -208,6 +1237,32 @@ def mundane_global_flags(argp_app: app.ArgparseApp):
         default=argparse.SUPPRESS
     )
 
+    argp_app.global_flags.add_argument(
+        '--stderr-level',
+        action=StderrLevel,
+        metavar='LEVEL',
+        help='Also log to stderr at or above this level',
+        default=argparse.SUPPRESS,
+        choices=choices
+    )
+
+    argp_app.global_flags.add_argument(
+        '--vmodule',
+        action=VModule,
+        metavar='PATTERN=LEVEL,...',
+        help='Module logger levels, not root',
+        default=argparse.SUPPRESS
+    )
+
+
+def mundane_commands(argp_app: app.ArgparseApp):
+    """Register commands."""
+    parser = argp_app.register_command(flight_recorder)
+    parser.add_argument('paths', nargs='+', help='Flight recorder files')
+
+    parser = argp_app.register_command(merge_logs)
+    parser.add_argument('paths', nargs='+', help='Log files')
+
 
 def activate(appname: str, output_dir: str):
     """Activate this log handler with this configuration.
@@ -219,3 +1274,92 @@ def activate(appname: str, output_dir: str):
     """
     handler = LogHandler(appname, output_dir)
     logging.basicConfig(format=LOG_FORMAT, handlers=[handler], force=True)
+
+
+def also_log_to_stderr(level: int | str = logging.NOTSET):
+    """Copy records written by the activated log handler to stderr.
+
+    Only records that pass the root log level are written at all, so this
+    level can only narrow down what is copied.  Each record is formatted
+    once, and the text written to both.
+
+    Args:
+      level: Minimal level of records copied to stderr.
+    """
+    _log_handler().stderr_level = _level_number(level)
+
+
+def activate_severity_files(
+    levels: typing.Iterable[int | str] = (logging.WARNING, logging.ERROR)
+):
+    """Copy records written by the activated log handler to severity files.
+
+    For each level, a file next to the log file gets the records at or
+    above it, so failures can be found without reading the whole log.  Each
+    record is formatted once, and the text written to all of the files.
+
+    Args:
+      levels: Levels that get their own file.
+    """
+    _log_handler().severity_levels = tuple(
+        sorted(_level_number(level) for level in levels)
+    )
+
+
+def sibling_path(suffix: str) -> pathlib.Path | None:
+    """A file next to the log file, named after it plus a suffix.
+
+    For example, sibling_path('.trace.json').  With an empty suffix, this is
+    the log file itself.
+
+    Returns:
+      The path, or None if log_mgr is not active.
+    """
+    log_handler = _find_log_handler()
+    if log_handler is None:
+        return None
+    return pathlib.Path(log_handler.baseFilename + suffix)
+
+
+def _find_log_handler() -> LogHandler | None:
+    """The log handler set up by activate(), if any."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, LogHandler):
+            return handler
+    return None
+
+
+def _log_handler() -> LogHandler:
+    """The log handler set up by activate()."""
+    log_handler = _find_log_handler()
+    # type cast
+    assert log_handler is not None
+    return log_handler
+
+
+def _level_number(level: int | str) -> int:
+    """Convert a level name into a number."""
+    if isinstance(level, str):
+        return typing.cast(int, logging.getLevelName(level))
+    return level
+
+
+def activate_flight_recorder(
+    size: int = FLIGHT_RECORDER_SIZE
+) -> FlightRecorder:
+    """Add a FlightRecorder next to the activated log handler.
+
+    The current root log level keeps applying to the log file, while the
+    recorder gets every record.
+
+    Args:
+      size: Size of the ring file in bytes.
+
+    Returns:
+      The new handler.
+    """
+    level = _root_log_level()
+    recorder = FlightRecorder(_log_handler(), size)
+    logging.getLogger().addHandler(recorder)
+    set_root_log_level(level)
+    return recorder
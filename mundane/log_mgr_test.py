@@ -1,13 +1,26 @@
 """Tests for log_mgr.py"""
+# pylint: disable=too-many-lines
 
+import bz2
+import concurrent.futures
 import contextlib
+import gzip
 import io
+import logging.handlers
+import lzma
+import multiprocessing
 import os
 import pathlib
+import queue
+import signal
+import subprocess
 import sys
 import tempfile
 import textwrap
+import threading
+import types
 import unittest
+from unittest import mock
 
 from mundane import app
 from mundane import log_mgr
@@ -25,6 +38,13 @@ def setUpModule():
     tempfile.tempdir = tempfile.mkdtemp()
 
 
+def log_from_worker(message: str) -> int:
+    """Log from inside a worker process."""
+    log_mgr.logging.getLogger('worker').info(message)
+    log_mgr.logging.getLogger('worker').debug('Too chatty')
+    return os.getpid()
+
+
 def munge_expected(old_s: str) -> str:
     """Modify a multiple line string in a standard way.
 
@@ -70,7 +90,7 @@ class BaseLogging(unittest.TestCase):
         orig_handlers = logger.handlers.copy()
 
         def restore_orig_handlers():
-            for hdlr in logger.handlers:
+            for hdlr in logger.handlers.copy():
                 if hdlr not in orig_handlers:
                     logger.removeHandler(hdlr)
                     hdlr.close()
@@ -143,6 +163,12 @@ class LogHandlerPropertyTest(BaseLogging):
 
         self.check_properties(out)
 
+    def test_unknown_user(self):
+        with mock.patch.object(log_mgr.pwd, 'getpwuid', side_effect=KeyError):
+            long_filename = self.handler.long_filename
+
+        self.assertIn(f'.{os.getuid()}.', long_filename)
+
 
 class LogHandlerTest(BaseLogging):
 
@@ -518,6 +544,8 @@ class FlagsTest(BaseLogging):
             usage: test_default_dash_h [-h]
                                        [-L {levels}]
                                        [--log-dir LOG_DIR]
+                                       [--stderr-level LEVEL]
+                                       [--vmodule PATTERN=LEVEL,...]
 
             Global flags:
               -h, --help
@@ -526,6 +554,10 @@ class FlagsTest(BaseLogging):
                                     WARNING)
               --log-dir LOG_DIR     Logging directory (Default:
                                     well/known/path)
+              --stderr-level LEVEL  Also log to stderr at or above
+                                    this level
+              --vmodule PATTERN=LEVEL,...
+                                    Module logger levels, not root
             """
         )
         self.assertEqual(stdout.getvalue(), expected)
@@ -552,6 +584,8 @@ class FlagsTest(BaseLogging):
             usage: test_custom_logging_level_dash_h [-h]
                                                     [-L {levels}]
                                                     [--log-dir LOG_DIR]
+                                                    [--stderr-level LEVEL]
+                                                    [--vmodule PATTERN=LEVEL,...]
 
             Global flags:
               -h, --help
@@ -560,6 +594,10 @@ class FlagsTest(BaseLogging):
                                     WARNING)
               --log-dir LOG_DIR     Logging directory (Default:
                                     well/known/path)
+              --stderr-level LEVEL  Also log to stderr at or above
+                                    this level
+              --vmodule PATTERN=LEVEL,...
+                                    Module logger levels, not root
             """
         )
         self.assertEqual(stdout.getvalue(), expected)
@@ -623,6 +661,13 @@ class ActivateTest(BaseLogging):
         self.handler = root_logger.handlers[0]
         self.handler.output_dir = tempfile.mkdtemp()
 
+    def test_filename_deferred_until_first_write(self):
+        self.assertNotIn('long_filename', vars(self.handler))
+
+        log_mgr.logging.info('Logged from %s', self.id())
+
+        self.assertIn('long_filename', vars(self.handler))
+
     def test_output_deferred_until_first_write(self):
         dst = self.handler.symlink_path
 
@@ -657,3 +702,1118 @@ class ActivateTest(BaseLogging):
         log_mgr.logging.info('Logged from %s', self.id())
 
         self.assertTrue(dst.is_dir())
+
+
+class SiblingPathTest(BaseLogging):
+
+    def test_not_active(self):
+        log_mgr.logging.getLogger().handlers = [log_mgr.logging.NullHandler()]
+
+        self.assertIsNone(log_mgr.sibling_path('.stacks'))
+
+    def test_active(self):
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        root_logger = log_mgr.logging.getLogger()
+        handler = root_logger.handlers[0]
+        root_logger.handlers.insert(0, log_mgr.logging.NullHandler())
+
+        self.assertEqual(
+            log_mgr.sibling_path('.stacks'),
+            pathlib.Path(handler.baseFilename + '.stacks')
+        )
+        self.assertEqual(
+            log_mgr.sibling_path(''), pathlib.Path(handler.baseFilename)
+        )
+
+
+class AlsoLogToStderrTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        log_mgr.set_root_log_level('INFO')
+        self.handler = log_mgr.logging.getLogger().handlers[0]
+        self.stderr = io.StringIO()
+        self.enterContext(contextlib.redirect_stderr(self.stderr))
+
+    def logged(self) -> str:
+        """Contents of the log file."""
+        self.handler.flush()
+        return pathlib.Path(self.handler.baseFilename).read_text('utf-8')
+
+    def test_off_by_default(self):
+        log_mgr.logging.error('Only in the file')
+
+        self.assertIn('Only in the file', self.logged())
+        self.assertEqual(self.stderr.getvalue(), '')
+
+    def test_level(self):
+        log_mgr.also_log_to_stderr('WARNING')
+
+        with mock.patch.object(self.handler, 'format',
+                               wraps=self.handler.format) as fmt:
+            log_mgr.logging.info('Quiet')
+            log_mgr.logging.warning('Loud')
+            log_mgr.logging.debug('Dropped')
+
+        self.assertEqual(fmt.call_count, 2)
+        self.assertEqual(
+            self.logged().splitlines()[1],
+            self.stderr.getvalue().rstrip('\n')
+        )
+        self.assertIn('Quiet', self.logged())
+        self.assertIn('Loud', self.stderr.getvalue())
+        self.assertNotIn('Quiet', self.stderr.getvalue())
+        self.assertNotIn('Dropped', self.logged())
+
+    def test_everything(self):
+        log_mgr.also_log_to_stderr()
+
+        log_mgr.logging.info('Both')
+
+        self.assertEqual(self.logged(), self.stderr.getvalue())
+
+    def test_emit_error(self):
+        log_mgr.also_log_to_stderr(log_mgr.logging.INFO)
+
+        with mock.patch.object(self.handler, 'format',
+                               side_effect=ValueError):
+            log_mgr.logging.info('Cannot be formatted')
+
+        self.assertIn('ValueError', self.stderr.getvalue())
+
+    def test_flag(self):
+        my_app = app.ArgparseApp()
+        my_app.register_global_flags([log_mgr])
+
+        args = my_app.parser.parse_args('--stderr-level ERROR'.split())
+
+        self.assertEqual(self.handler.stderr_level, log_mgr.logging.ERROR)
+        self.assertEqual(vars(args), {})
+
+
+class SeverityFilesTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        log_mgr.activate(self.mee, tempfile.mkdtemp())
+        log_mgr.set_root_log_level('INFO')
+        self.handler = log_mgr.logging.getLogger().handlers[0]
+
+    def read(self, level: int | None = None) -> str:
+        """Contents of the log file, or of a severity file."""
+        self.handler.flush()
+        if level is None:
+            path = pathlib.Path(self.handler.baseFilename)
+        else:
+            path = self.handler.severity_path(level)
+        return path.read_text('utf-8')
+
+    def test_off_by_default(self):
+        log_mgr.logging.error('Only in the log')
+
+        self.assertIn('Only in the log', self.read())
+        self.assertFalse(
+            self.handler.severity_path(log_mgr.logging.ERROR).exists()
+        )
+
+    def test_routed_by_level(self):
+        log_mgr.activate_severity_files()
+
+        with mock.patch.object(self.handler, 'format',
+                               wraps=self.handler.format) as fmt:
+            log_mgr.logging.info('Info')
+            log_mgr.logging.warning('Warning')
+            log_mgr.logging.error('Error')
+
+        self.assertEqual(fmt.call_count, 3)
+        self.assertEqual(len(self.read().splitlines()), 3)
+        warnings = self.read(log_mgr.logging.WARNING)
+        self.assertNotIn('Info', warnings)
+        self.assertIn('Warning', warnings)
+        self.assertIn('Error', warnings)
+        self.assertEqual(
+            self.read(log_mgr.logging.ERROR),
+            self.read().splitlines(keepends=True)[2]
+        )
+
+    def test_deferred_until_first_write(self):
+        log_mgr.activate_severity_files(['ERROR'])
+
+        log_mgr.logging.warning('Not bad enough')
+
+        self.assertEqual(
+            self.handler.severity_levels, (log_mgr.logging.ERROR,)
+        )
+        self.assertFalse(
+            self.handler.severity_path(log_mgr.logging.ERROR).exists()
+        )
+
+    def test_symlinks(self):
+        log_mgr.activate_severity_files()
+
+        log_mgr.logging.error('Linked')
+
+        for name in ('WARNING', 'ERROR'):
+            symlink = pathlib.Path(
+                self.handler.output_dir, f'{self.mee}.{name}'
+            )
+            self.assertTrue(symlink.is_symlink())
+            self.assertEqual(
+                symlink.resolve(),
+                self.handler.severity_path(
+                    log_mgr.logging.getLevelName(name)
+                ).resolve()
+            )
+
+    def test_with_stderr(self):
+        log_mgr.activate_severity_files([log_mgr.logging.WARNING])
+        log_mgr.also_log_to_stderr(log_mgr.logging.ERROR)
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stderr(stderr):
+            log_mgr.logging.warning('Warning')
+            log_mgr.logging.error('Error')
+
+        self.assertEqual(self.read(), self.read(log_mgr.logging.WARNING))
+        self.assertNotIn('Warning', stderr.getvalue())
+        self.assertIn('Error', stderr.getvalue())
+
+    def test_close(self):
+        log_mgr.activate_severity_files()
+        log_mgr.logging.error('Before close')
+
+        self.handler.close()
+        log_mgr.logging.error('After close')
+
+        self.assertIn('After close', self.read(log_mgr.logging.ERROR))
+
+
+class WorkerInitializerTest(BaseLogging):
+
+    def test_replaces_handlers(self):
+        records = queue.SimpleQueue()
+
+        log_mgr.worker_initializer(records, 'INFO')
+
+        root_logger = log_mgr.logging.getLogger()
+        self.assertEqual(len(root_logger.handlers), 1)
+        self.assertIsInstance(
+            root_logger.handlers[0], logging.handlers.QueueHandler
+        )
+        self.assertEqual(root_logger.level, log_mgr.logging.INFO)
+
+        self.assertEqual(log_from_worker('Sent along'), os.getpid())
+
+        record = records.get_nowait()
+        self.assertEqual(record.name, 'worker')
+        self.assertEqual(
+            record.getMessage(), f'[pid {os.getpid()}] Sent along'
+        )
+        self.assertTrue(records.empty())
+
+
+class WorkerLoggingTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        log_mgr.logging.getLogger().setLevel('INFO')
+        self.handler = log_mgr.logging.getLogger().handlers[0]
+
+    def test_default_context(self):
+        worker_logging = log_mgr.WorkerLogging()
+
+        self.assertEqual(worker_logging.initargs[1], log_mgr.logging.INFO)
+
+    def test_records_from_workers(self):
+        context = multiprocessing.get_context('spawn')
+
+        with log_mgr.WorkerLogging(context) as worker_logging:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=2, mp_context=context,
+                    initializer=log_mgr.worker_initializer,
+                    initargs=worker_logging.initargs) as pool:
+                pids = set(pool.map(log_from_worker, ['one', 'two', 'three']))
+        self.handler.flush()
+
+        text = pathlib.Path(self.handler.baseFilename).read_text('utf-8')
+        for pid in pids:
+            self.assertIn(f'{{worker}} [pid {pid}] ', text)
+        for message in ('one', 'two', 'three'):
+            self.assertRegex(text, fr'\[pid \d+\] {message}\n')
+        self.assertNotIn('Too chatty', text)
+        self.assertNotIn(f'[pid {os.getpid()}]', text)
+
+
+class RateLimitedLoggingTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        self.logger = log_mgr.logging.getLogger(self.id())
+
+    def messages(self, logs) -> list[str]:
+        """Extract the messages from assertLogs()."""
+        return [record.getMessage() for record in logs.records]
+
+    def test_every_n(self):
+        with self.assertLogs(self.logger) as logs:
+            for i in range(7):
+                log_mgr.log_every_n(
+                    log_mgr.logging.INFO, 'item %d', 3, i, logger=self.logger
+                )
+
+        self.assertEqual(
+            self.messages(logs),
+            ['item 0', 'item 3 [2 suppressed]', 'item 6 [2 suppressed]']
+        )
+        self.assertEqual(logs.records[0].funcName, 'test_every_n')
+        self.assertTrue(logs.records[0].pathname.endswith('log_mgr_test.py'))
+
+    def test_every_n_root_logger(self):
+        with self.assertLogs() as logs:
+            for i in range(2):
+                log_mgr.log_every_n(log_mgr.logging.INFO, 'item %d', 1, i)
+
+        self.assertEqual(self.messages(logs), ['item 0', 'item 1'])
+
+    def test_call_sites_are_separate(self):
+        with self.assertLogs(self.logger) as logs:
+            for i in range(4):
+                log_mgr.log_every_n(
+                    log_mgr.logging.INFO, 'one %d', 2, i, logger=self.logger
+                )
+                log_mgr.log_every_n(
+                    log_mgr.logging.INFO, 'two %d', 4, i, logger=self.logger
+                )
+
+        self.assertEqual(
+            self.messages(logs), ['one 0', 'two 0', 'one 2 [1 suppressed]']
+        )
+
+    def test_first_n(self):
+        with self.assertLogs(self.logger) as logs:
+            for i in range(5):
+                log_mgr.log_first_n(
+                    log_mgr.logging.INFO, 'item %d', 2, i, logger=self.logger
+                )
+
+        self.assertEqual(self.messages(logs), ['item 0', 'item 1'])
+        self.assertEqual(logs.records[1].funcName, 'test_first_n')
+
+    def test_every_n_seconds(self):
+        with self.assertLogs(self.logger) as logs:
+            for i in range(3):
+                log_mgr.log_every_n_seconds(
+                    log_mgr.logging.INFO,
+                    'item %d',
+                    60.0,
+                    i,
+                    logger=self.logger
+                )
+            for i in range(3, 5):
+                log_mgr.log_every_n_seconds(
+                    log_mgr.logging.INFO, 'item %d', 0, i, logger=self.logger
+                )
+
+        self.assertEqual(self.messages(logs), ['item 0', 'item 3', 'item 4'])
+        self.assertEqual(logs.records[0].funcName, 'test_every_n_seconds')
+
+    def test_sampled(self):
+        with self.assertLogs(self.logger) as logs:
+            for i in range(3):
+                log_mgr.log_sampled(
+                    log_mgr.logging.INFO,
+                    'never %d',
+                    0.0,
+                    i,
+                    logger=self.logger
+                )
+                log_mgr.log_sampled(
+                    log_mgr.logging.INFO,
+                    'always %d',
+                    1.0,
+                    i,
+                    logger=self.logger
+                )
+
+        self.assertEqual(
+            self.messages(logs), ['always 0', 'always 1', 'always 2']
+        )
+        self.assertEqual(logs.records[0].funcName, 'test_sampled')
+
+    def test_suppressed_count_carried_to_next_message(self):
+        with self.assertLogs(self.logger) as logs:
+            for rate in (1.0, 0.0, 0.0, 1.0):
+                log_mgr.log_sampled(
+                    log_mgr.logging.INFO,
+                    'rate %s',
+                    rate,
+                    rate,
+                    logger=self.logger
+                )
+
+        self.assertEqual(
+            self.messages(logs), ['rate 1.0', 'rate 1.0 [2 suppressed]']
+        )
+
+
+class ModuleLogLevelsTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        manager = log_mgr.logging.root.manager
+        orig_levels = {
+            name: logger.level
+            for name, logger in manager.loggerDict.items()
+            if isinstance(logger, log_mgr.logging.Logger)
+        }
+
+        def restore_levels():
+            for name, logger in manager.loggerDict.items():
+                if isinstance(logger, log_mgr.logging.Logger):
+                    logger.setLevel(orig_levels.get(name, 0))
+
+        self.addCleanup(restore_levels)
+        self.addCleanup(
+            setattr,
+            log_mgr,
+            '_wildcard_levels',
+            log_mgr._wildcard_levels  # pylint: disable=protected-access
+        )
+        self.addCleanup(setattr, manager, 'loggerClass', manager.loggerClass)
+
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        self.prefix = self.id().replace('_', '.')
+
+    def test_exact_logger_name(self):
+        name = f'{self.prefix}.exact'
+
+        log_mgr.set_module_log_levels(f'{name}=DEBUG')
+
+        self.assertEqual(
+            log_mgr.logging.getLogger(name).level, log_mgr.logging.DEBUG
+        )
+        self.assertEqual(
+            log_mgr.logging.getLogger(f'{name}.later').getEffectiveLevel(),
+            log_mgr.logging.DEBUG
+        )
+
+    def test_root_logger_unaffected(self):
+        log_mgr.set_root_log_level('WARNING')
+
+        log_mgr.set_module_log_levels('log_mgr_test=DEBUG')
+
+        self.assertFalse(
+            log_mgr.logging.getLogger().isEnabledFor(log_mgr.logging.DEBUG)
+        )
+
+    def test_wildcards(self):
+        one = log_mgr.logging.getLogger(f'{self.prefix}.one')
+        two = log_mgr.logging.getLogger(f'{self.prefix}.two')
+
+        log_mgr.set_module_log_levels(f'{self.prefix}.*=INFO')
+        log_mgr.set_module_log_levels(f'{self.prefix}.t*=ERROR')
+        three = log_mgr.logging.getLogger(f'{self.prefix}.three')
+        other = log_mgr.logging.getLogger(f'{self.id()}.other')
+
+        self.assertEqual(one.level, log_mgr.logging.INFO)
+        self.assertEqual(two.level, log_mgr.logging.ERROR)
+        self.assertEqual(three.level, log_mgr.logging.ERROR)
+        self.assertEqual(other.level, log_mgr.logging.NOTSET)
+        self.assertNotIn(
+            f'{self.prefix}.*', log_mgr.logging.root.manager.loggerDict
+        )
+
+    def test_wildcards_later_module(self):
+        name = f'{self.prefix}.lazy'
+        module = types.ModuleType(name)
+        module.__file__ = '/somewhere/lazily_imported.py'
+        self.enterContext(mock.patch.dict(sys.modules, {name: module}))
+
+        log_mgr.set_module_log_levels('lazily_*=DEBUG')
+
+        self.assertEqual(
+            log_mgr.logging.getLogger(name).level, log_mgr.logging.DEBUG
+        )
+
+    def test_wildcards_custom_logger_class(self):
+        manager = log_mgr.logging.root.manager
+
+        class Custom(log_mgr.logging.Logger):
+            """Set by the application."""
+
+        manager.setLoggerClass(Custom)
+        log_mgr.set_module_log_levels(f'{self.prefix}.*=INFO')
+        log_mgr.set_module_log_levels(f'{self.prefix}.*=WARNING')
+        later = log_mgr.logging.getLogger(f'{self.prefix}.later')
+
+        self.assertIsInstance(later, Custom)
+        self.assertEqual(later.level, log_mgr.logging.WARNING)
+        self.assertIs(manager.loggerClass.__mro__[2], Custom)
+
+    def test_source_file_name(self):
+        log_mgr.set_module_log_levels('log_mgr_t?st=INFO')
+
+        self.assertEqual(
+            log_mgr.logging.getLogger('mundane.log_mgr_test').level,
+            log_mgr.logging.INFO
+        )
+
+    def test_package_source_file_name(self):
+        log_mgr.set_module_log_levels('unittes[t]=ERROR')
+
+        self.assertEqual(
+            log_mgr.logging.getLogger('unittest').level, log_mgr.logging.ERROR
+        )
+
+    def test_multiple_and_numeric(self):
+        log_mgr.set_module_log_levels(
+            f'{self.prefix}.a=15, {self.prefix}.b=CRITICAL'
+        )
+
+        self.assertEqual(
+            log_mgr.logging.getLogger(f'{self.prefix}.a').level, 15
+        )
+        self.assertEqual(
+            log_mgr.logging.getLogger(f'{self.prefix}.b').level,
+            log_mgr.logging.CRITICAL
+        )
+
+    def test_invalid(self):
+        for spec in ('no_level', '=DEBUG', 'x=BOGUS', 'x=DEBUG,'):
+            with self.subTest(spec=spec):
+                with self.assertRaisesRegex(ValueError, 'Invalid'):
+                    log_mgr.set_module_log_levels(spec)
+
+    def test_flag(self):
+        my_app = app.ArgparseApp()
+        my_app.register_global_flags([log_mgr])
+        name = f'{self.prefix}.flag'
+
+        args = my_app.parser.parse_args(['--vmodule', f'{name}=DEBUG'])
+
+        self.assertEqual(
+            log_mgr.logging.getLogger(name).level, log_mgr.logging.DEBUG
+        )
+        self.assertEqual(vars(args), {})
+
+    def test_flag_invalid(self):
+        my_app = app.ArgparseApp()
+        my_app.register_global_flags([log_mgr])
+        stderr = io.StringIO()
+
+        with self.assertRaises(
+                SystemExit) as result, contextlib.redirect_stderr(stderr):
+            my_app.parser.parse_args(['--vmodule', 'x=BOGUS'])
+
+        self.assertEqual(result.exception.code, 2)
+        self.assertIn(
+            'argument --vmodule: Invalid pattern=level: "x=BOGUS"',
+            stderr.getvalue()
+        )
+
+
+class FlightRecorderTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        log_mgr.set_root_log_level('INFO')
+        self.handler = log_mgr.logging.getLogger().handlers[0]
+
+    def test_deferred_until_first_write(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+
+        self.assertEqual(
+            str(recorder.path), f'{self.handler.baseFilename}.flight'
+        )
+        recorder.flush()
+        self.assertFalse(recorder.path.exists())
+
+        log_mgr.logging.debug('Logged from %s', self.id())
+
+        self.assertTrue(recorder.path.exists())
+        self.assertEqual(recorder.path.stat().st_size, 4096)
+
+    def test_levels(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+
+        log_mgr.logging.debug('Debug message')
+        log_mgr.logging.info('Info message')
+        recorder.flush()
+        self.handler.flush()
+
+        records = log_mgr.decode_flight_recorder(recorder.path)
+        text = pathlib.Path(self.handler.baseFilename).read_text('utf-8')
+
+        self.assertEqual(len(records), 2)
+        self.assertRegex(records[0], r'^D.*test_levels.*Debug message$')
+        self.assertRegex(records[1], r'^I.*test_levels.*Info message$')
+        self.assertNotIn('Debug message', text)
+        self.assertIn('Info message', text)
+
+    def test_root_log_level(self):
+        log_mgr.activate_flight_recorder(4096)
+        root_logger = log_mgr.logging.getLogger()
+
+        self.assertEqual(root_logger.level, log_mgr.logging.DEBUG)
+        self.assertEqual(
+            log_mgr.LogLevel(['-L'], 'log_level').log_level, 'INFO'
+        )
+
+        log_mgr.set_root_log_level('ERROR')
+        log_mgr.logging.warning('Warned')
+        log_mgr.logging.error('Failed')
+        self.handler.flush()
+
+        self.assertEqual(root_logger.level, log_mgr.logging.DEBUG)
+        self.assertEqual(
+            log_mgr.LogLevel(['-L'], 'log_level').log_level, 'ERROR'
+        )
+        text = pathlib.Path(self.handler.baseFilename).read_text('utf-8')
+        self.assertNotIn('Warned', text)
+        self.assertIn('Failed', text)
+
+    def test_module_log_levels(self):
+        log_mgr.set_root_log_level('WARNING')
+        noisy = log_mgr.logging.getLogger(f'{self.id()}.noisy')
+        child = log_mgr.logging.getLogger(f'{self.id()}.noisy.child')
+        self.addCleanup(noisy.setLevel, log_mgr.logging.NOTSET)
+        log_mgr.activate_flight_recorder(4096)
+
+        log_mgr.set_module_log_levels(f'{self.id()}.noisy=DEBUG')
+        noisy.debug('Noisy debug')
+        child.debug('Child debug')
+        log_mgr.logging.getLogger(self.id()).info('Quiet info')
+        log_mgr.logging.info('Root info')
+        self.handler.flush()
+
+        text = pathlib.Path(self.handler.baseFilename).read_text('utf-8')
+        self.assertIn('Noisy debug', text)
+        self.assertIn('Child debug', text)
+        self.assertNotIn('Quiet info', text)
+        self.assertNotIn('Root info', text)
+
+    def test_wraps(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+
+        for i in range(1000):
+            log_mgr.logging.info('Message %04d', i)
+
+        records = log_mgr.decode_flight_recorder(recorder.path)
+        numbers = [int(record[-4:]) for record in records]
+
+        self.assertGreater(len(numbers), 10)
+        self.assertEqual(numbers, list(range(1000 - len(numbers), 1000)))
+
+    def test_huge_record_truncated(self):
+        recorder = log_mgr.activate_flight_recorder(1024)
+
+        log_mgr.logging.info('x' * 2048)
+        log_mgr.logging.info('small')
+
+        records = log_mgr.decode_flight_recorder(recorder.path)
+
+        self.assertEqual(len(records), 1)
+        self.assertTrue(records[0].endswith('small'))
+
+    def test_huge_record_truncated_on_character(self):
+        recorder = log_mgr.activate_flight_recorder(1024)
+
+        # One of these is cut in the middle of a two byte character.
+        for prefix in ('', 'x'):
+            log_mgr.logging.info('%s%s', prefix, '\u00e9' * 1024)
+
+            records = log_mgr.decode_flight_recorder(recorder.path)
+
+            self.assertEqual(len(records), 1)
+            self.assertTrue(records[0].endswith('\u00e9'))
+            self.assertNotIn('\ufffd', records[0])
+
+    def test_corruption_skipped(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+
+        for word in ('one', 'two', 'three'):
+            log_mgr.logging.info('Word is %s', word)
+        recorder.close()
+
+        data = bytearray(recorder.path.read_bytes())
+        pos = data.index(b'Word is two')
+        data[pos] ^= 0xff
+        recorder.path.write_bytes(data)
+
+        records = log_mgr.decode_flight_recorder(recorder.path)
+
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[0].endswith('Word is one'))
+        self.assertTrue(records[1].endswith('Word is three'))
+
+    def test_truncated_file(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+
+        log_mgr.logging.info('Word is one')
+        log_mgr.logging.info('Word is two')
+        recorder.close()
+
+        data = recorder.path.read_bytes()
+        recorder.path.write_bytes(data[:data.index(b'Word is two') + 3])
+
+        records = log_mgr.decode_flight_recorder(recorder.path)
+
+        self.assertEqual(len(records), 1)
+        self.assertTrue(records[0].endswith('Word is one'))
+
+    def test_emit_error(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+        stderr = io.StringIO()
+        recorder.close()
+        recorder.path.mkdir(parents=True)
+
+        with contextlib.redirect_stderr(stderr):
+            log_mgr.logging.info('Cannot be written')
+
+        self.assertIn('Cannot be written', stderr.getvalue())
+
+    def test_not_a_recorder(self):
+        path = pathlib.Path(tempfile.mkdtemp(), 'bogus')
+        path.write_bytes(b'Hello, world!')
+
+        with self.assertRaisesRegex(ValueError, 'Not a flight recorder'):
+            log_mgr.decode_flight_recorder(path)
+
+    def test_survives_sigkill(self):
+        output_dir = tempfile.mkdtemp()
+        code = textwrap.dedent(
+            f"""
+            import os
+            import signal
+            from mundane import log_mgr
+            log_mgr.activate('sigkill', {output_dir!r})
+            log_mgr.set_root_log_level('WARNING')
+            log_mgr.activate_flight_recorder(4096)
+            log_mgr.logging.debug('Last words')
+            os.kill(os.getpid(), signal.SIGKILL)
+            """
+        )
+
+        result = subprocess.run([sys.executable, '-c', code], check=False)
+        (path,) = pathlib.Path(output_dir).glob('*.flight')
+
+        self.assertEqual(result.returncode, -signal.SIGKILL)
+        self.assertTrue(
+            log_mgr.decode_flight_recorder(path)[0].endswith('Last words')
+        )
+
+    def test_command(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+        log_mgr.logging.info('Recorded')
+        bogus = pathlib.Path(tempfile.mkdtemp(), 'bogus')
+        bogus.write_bytes(b'bogus')
+        my_app = app.ArgparseApp()
+        my_app.register_commands([log_mgr])
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            ret = my_app.run(['flight-recorder', str(recorder.path)])
+
+        self.assertEqual(ret, 0)
+        self.assertIn('Recorded\n', stdout.getvalue())
+
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+                stderr):
+            ret = my_app.run(['flight-recorder', str(bogus)])
+
+        self.assertEqual(ret, 1)
+        self.assertIn('Not a flight recorder file', stderr.getvalue())
+
+
+class MergeLogsTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+
+    def write(self, name: str, *lines: str, opener=open) -> pathlib.Path:
+        """Write a log file."""
+        path = self.tmpdir / name
+        with opener(path, 'wt', encoding='utf-8') as handle:
+            handle.write(''.join(lines))
+        return path
+
+    def test_ordered_by_time(self):
+        first = self.write(
+            'app.log.host1.example.com.alice.20240102-030405.11',
+            'I2024-01-02 03:04:05,100: a.py:1(f)] {root} one\n',
+            'E2024-01-02 03:04:05,300: a.py:2(f)] {root} three\n',
+            'Traceback (most recent call last):\n',
+            '  boom\n',
+        )
+        second = self.write(
+            'app.log.host2.bob.20240102-030400.22',
+            'W2024-01-02 03:04:05,200: b.py:1(g)] {root} two\n',
+            'I2024-01-02 03:04:05,400: b.py:2(g)] {root} four\n',
+        )
+
+        merged = list(log_mgr.merge_log_files([first, second]))
+
+        self.assertEqual(
+            merged, [
+                'host1.example.com:11 I2024-01-02 03:04:05,100: a.py:1(f)]'
+                ' {root} one\n',
+                'host2:22 W2024-01-02 03:04:05,200: b.py:1(g)] {root} two\n',
+                'host1.example.com:11 E2024-01-02 03:04:05,300: a.py:2(f)]'
+                ' {root} three\n'
+                'host1.example.com:11 Traceback (most recent call last):\n'
+                'host1.example.com:11   boom\n',
+                'host2:22 I2024-01-02 03:04:05,400: b.py:2(g)] {root} four\n',
+            ]
+        )
+
+    def test_compressed(self):
+        paths = [
+            self.write(
+                f'app.log.h{index}.u.20240102-030405.{index}{suffix}',
+                f'I2024-01-02 03:04:0{index},000: a.py:1(f)] {{root}} x\n',
+                opener=opener
+            ) for index, (suffix, opener) in enumerate(
+                (('.gz', gzip.open), ('.bz2', bz2.open), ('.xz', lzma.open))
+            )
+        ]
+
+        merged = list(log_mgr.merge_log_files(reversed(paths)))
+
+        self.assertEqual(
+            [record.split()[0] for record in merged],
+            ['h0:0', 'h1:1', 'h2:2']
+        )
+
+    def test_other_files(self):
+        path = self.write(
+            'other.txt', 'Before any record\n',
+            'I2024-01-02 03:04:05,100: a.py:1(f)] {root} no newline'
+        )
+
+        merged = list(log_mgr.merge_log_files([path]))
+
+        self.assertEqual(
+            merged, [
+                'other.txt Before any record\n',
+                'other.txt I2024-01-02 03:04:05,100: a.py:1(f)] {root} no'
+                ' newline\n'
+            ]
+        )
+
+    def test_log_handler_files(self):
+        log_mgr.activate('app', str(self.tmpdir))
+        handler = log_mgr.logging.getLogger().handlers[0]
+        log_mgr.logging.warning('First\nsecond line')
+        handler.flush()
+
+        merged = list(log_mgr.merge_log_files([handler.baseFilename]))
+
+        self.assertEqual(len(merged), 1)
+        tag = f'{os.uname().nodename}:{os.getpid()} '
+        self.assertTrue(merged[0].startswith(f'{tag}W'))
+        self.assertTrue(merged[0].endswith(f'First\n{tag}second line\n'))
+
+    def test_empty(self):
+        path = self.write('empty.log')
+
+        self.assertEqual(list(log_mgr.merge_log_files([path])), [])
+
+    def test_command(self):
+        path = self.write(
+            'app.log.host.user.20240102-030405.7',
+            'I2024-01-02 03:04:05,100: a.py:1(f)] {root} merged\n'
+        )
+        my_app = app.ArgparseApp()
+        my_app.register_commands([log_mgr])
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            ret = my_app.run(['merge-logs', str(path)])
+
+        self.assertEqual(ret, 0)
+        self.assertTrue(stdout.getvalue().startswith('host:7 I2024'))
+
+        with contextlib.redirect_stderr(stderr):
+            ret = my_app.run(
+                ['merge-logs',
+                 str(path), str(path) + '.missing']
+            )
+
+        self.assertEqual(ret, 1)
+        self.assertIn('No such file', stderr.getvalue())
+
+
+class CallLogLevelTest(BaseLogging):
+
+    def setUp(self):
+        super().setUp()
+
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        log_mgr.set_root_log_level('WARNING')
+        self.handler = log_mgr.logging.getLogger().handlers[0]
+
+    def logged(self) -> str:
+        """Contents of the log file."""
+        self.handler.flush()
+        return pathlib.Path(self.handler.baseFilename).read_text('utf-8')
+
+    def test_threads(self):
+        barrier = threading.Barrier(2)
+
+        def target(level, message):
+            with log_mgr.call_log_level(level):
+                barrier.wait()
+                log_mgr.logging.info(message)
+                log_mgr.logging.debug('%s chatty', message)
+                barrier.wait()
+
+        threads = [
+            threading.Thread(target=target, args=('INFO', 'Verbose')),
+            threading.Thread(target=target, args=('ERROR', 'Quiet')),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log_mgr.logging.info('Outside')
+        log_mgr.logging.warning('Warned')
+
+        self.assertIn('Verbose', self.logged())
+        self.assertNotIn('chatty', self.logged())
+        self.assertNotIn('Quiet', self.logged())
+        self.assertNotIn('Outside', self.logged())
+        self.assertIn('Warned', self.logged())
+        self.assertEqual(
+            log_mgr.logging.getLogger().level, log_mgr.logging.WARNING
+        )
+        self.assertEqual(self.handler.filters, [])
+
+    def test_restored_with_change(self):
+        with log_mgr.call_log_level('DEBUG'):
+            self.assertEqual(
+                log_mgr.logging.getLogger().level, log_mgr.logging.NOTSET
+            )
+            changer = threading.Thread(
+                target=log_mgr.set_root_log_level, args=('ERROR',)
+            )
+            changer.start()
+            changer.join()
+            log_mgr.logging.debug('Inside')
+
+        self.assertEqual(
+            log_mgr.logging.getLogger().level, log_mgr.logging.ERROR
+        )
+        self.assertEqual(self.handler.filters, [])
+        self.assertIn('Inside', self.logged())
+
+    def test_set_root_log_level(self):
+        with log_mgr.call_log_level():
+            log_mgr.logging.info('Before')
+            log_mgr.set_root_log_level('INFO')
+            log_mgr.logging.info('After')
+            with log_mgr.call_log_level():
+                log_mgr.logging.info('Nested')
+
+        log_mgr.logging.info('Outside')
+        log_mgr.set_root_log_level('DEBUG')
+        log_mgr.logging.debug('Lowered')
+
+        self.assertNotIn('Before', self.logged())
+        self.assertIn('After', self.logged())
+        self.assertIn('Nested', self.logged())
+        self.assertNotIn('Outside', self.logged())
+        self.assertIn('Lowered', self.logged())
+
+    def test_flight_recorder(self):
+        recorder = log_mgr.activate_flight_recorder(4096)
+
+        with log_mgr.call_log_level('ERROR'):
+            log_mgr.logging.info('Recorded')
+        log_mgr.cycle_root_log_level()
+
+        self.assertEqual(recorder.level, log_mgr.logging.DEBUG)
+        self.assertNotIn(
+            log_mgr._call_level_filter,  # pylint: disable=protected-access
+            recorder.filters
+        )
+        recorder.flush()
+        self.assertIn(
+            'Recorded',
+            '\n'.join(log_mgr.decode_flight_recorder(recorder.path))
+        )
+        self.assertNotIn('Recorded', self.logged())
+        self.assertIn('Root log level is now INFO', self.logged())
+
+    def test_module_log_levels(self):
+        noisy = log_mgr.logging.getLogger(f'{self.id()}.noisy')
+        self.addCleanup(noisy.setLevel, log_mgr.logging.NOTSET)
+        log_mgr.set_module_log_levels(f'{self.id()}.noisy=DEBUG')
+
+        with log_mgr.call_log_level('ERROR'):
+            noisy.debug('Noisy debug')
+            log_mgr.logging.warning('Root warning')
+
+        self.assertIn('Noisy debug', self.logged())
+        self.assertNotIn('Root warning', self.logged())
+
+    def test_basic_config(self):
+        root_logger = log_mgr.logging.getLogger()
+        self.enterContext(mock.patch.object(root_logger, 'handlers', []))
+        stderr = self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+
+        with log_mgr.call_log_level('INFO'):
+            log_mgr.logging.info('Configured')
+            log_mgr.logging.getLogger(self.id()).debug('Leaked')
+            log_mgr.logging.debug('Root leaked')
+        handler, = root_logger.handlers
+
+        self.assertIn('Configured', stderr.getvalue())
+        self.assertNotIn('Leaked', stderr.getvalue())
+        self.assertNotIn('Root leaked', stderr.getvalue())
+        self.assertEqual(handler.filters, [])
+        self.assertEqual(root_logger.filters, [])
+
+    def test_added_handler(self):
+        records = logging.handlers.BufferingHandler(10)
+        records.setLevel(log_mgr.logging.INFO)
+
+        with log_mgr.call_log_level('WARNING'):
+            log_mgr.logging.getLogger().addHandler(records)
+            log_mgr.logging.getLogger(self.id()).info('Hidden')
+            log_mgr.logging.getLogger(self.id()).error('Shown')
+        log_mgr.logging.getLogger().removeHandler(records)
+
+        self.assertEqual(
+            [record.getMessage() for record in records.buffer], ['Shown']
+        )
+        self.assertEqual(records.level, log_mgr.logging.INFO)
+        self.assertEqual(records.filters, [])
+
+    def test_adopt_after_exit(self):
+        call_level_filter = log_mgr._call_level_filter  # pylint: disable=protected-access
+
+        with log_mgr.call_log_level():
+            pass
+        call_level_filter.adopt_new_handlers(
+            log_mgr.logging.makeLogRecord({})
+        )
+
+        self.assertEqual(self.handler.filters, [])
+
+    def test_process_wide_flags(self):
+        my_app = app.ArgparseApp()
+        my_app.register_global_flags([log_mgr])
+        stderr = io.StringIO()
+
+        with log_mgr.call_log_level(), contextlib.redirect_stderr(stderr):
+            my_app.parser.parse_args(['-L', 'DEBUG'])
+            log_mgr.logging.debug('Allowed')
+            for flags in (['--log-dir',
+                           'elsewhere'], ['--stderr-level',
+                                          'INFO'], ['--vmodule',
+                                                    'foo=DEBUG']):
+                with self.assertRaises(SystemExit):
+                    my_app.parser.parse_args(flags)
+
+        self.assertIn('Allowed', self.logged())
+        self.assertEqual(
+            stderr.getvalue().count('not allowed in an embedded run'), 3
+        )
+
+
+class SignalHandlersTest(BaseLogging):
+
+    def test_cycle_root_log_level(self):
+        root_logger = log_mgr.logging.getLogger()
+        log_mgr.set_root_log_level('INFO')
+        # Not assertLogs(), as it changes the root log level.
+        records = logging.handlers.BufferingHandler(10)
+        self.enterContext(
+            mock.patch.object(root_logger, 'handlers', [records])
+        )
+        levels = list()
+
+        for _ in range(3):
+            log_mgr.cycle_root_log_level()
+            levels.append(root_logger.level)
+
+        self.assertEqual(
+            levels, [
+                log_mgr.logging.DEBUG, log_mgr.logging.CRITICAL,
+                log_mgr.logging.ERROR
+            ]
+        )
+        self.assertEqual(
+            [record.getMessage() for record in records.buffer], [
+                'Root log level is now DEBUG',
+                'Root log level is now CRITICAL',
+                'Root log level is now ERROR',
+            ]
+        )
+
+    def test_cycle_with_flight_recorder(self):
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        log_mgr.set_root_log_level('WARNING')
+        handler = log_mgr.logging.getLogger().handlers[0]
+        log_mgr.activate_flight_recorder(4096)
+
+        log_mgr.cycle_root_log_level()
+
+        self.assertEqual(handler.level, log_mgr.logging.NOTSET)
+        self.assertEqual(
+            log_mgr.LogLevel(['-L'], 'log_level').log_level, 'INFO'
+        )
+        self.assertEqual(
+            log_mgr.logging.getLogger().level, log_mgr.logging.DEBUG
+        )
+
+    def test_log_stacks_and_usage(self):
+        log_mgr.set_root_log_level('ERROR')
+        ready = threading.Event()
+        done = threading.Event()
+
+        def worker():
+            ready.set()
+            done.wait()
+
+        thread = threading.Thread(target=worker, name='stack-worker')
+        thread.start()
+        ready.wait()
+        try:
+            with self.assertLogs(level='ERROR') as logs:
+                log_mgr.log_stacks_and_usage()
+        finally:
+            done.set()
+            thread.join()
+
+        output = logs.output[0]
+        self.assertTrue(output.startswith('ERROR:root:Stacks and usage:'))
+        self.assertIn(f'Thread MainThread ({threading.get_ident()}):', output)
+        self.assertIn('in test_log_stacks_and_usage', output)
+        self.assertIn('Thread stack-worker', output)
+        self.assertIn('in worker', output)
+        self.assertRegex(output, r'Usage: .*maxrss=\d+')
+
+    def test_log_stacks_and_usage_frame(self):
+        with self.assertLogs(level='DEBUG') as logs:
+            self.handler_caller(log_mgr.log_stacks_and_usage)
+
+        self.assertIn('in handler_caller', logs.output[0])
+        self.assertNotIn('in log_stacks_and_usage', logs.output[0])
+
+    def handler_caller(self, handler):
+        """Call like a signal handler would be."""
+        handler(signal.SIGUSR1, sys._getframe())  # pylint: disable=protected-access
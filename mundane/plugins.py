@@ -0,0 +1,81 @@
+"""Discover commands provided by separately installed distributions.
+
+A distribution provides commands by listing them in the "mundane.plugins"
+entry point group, each naming the module with the mundane_* hooks that
+registers it:
+
+  [project.entry-points."mundane.plugins"]
+  frobnicate = "my_plugin.commands"
+
+To add them to an ArgparseApp, use:
+   ArgparseApp().register_plugins()
+
+Scanning the metadata of every installed distribution is slow in large
+environments, so what is found is kept in ArgparseApp.cache.  The key
+includes the modification times of the directories on sys.path, which
+change whenever a distribution is installed or removed.
+
+A plugin's module is only imported, and its hooks called, when one of its
+commands is on the command line.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import typing
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from mundane import kv_cache
+
+GROUP = 'mundane.plugins'
+
+
+def path_fingerprint() -> str:
+    """Summarize sys.path, and when each directory on it last changed."""
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    digest = hashlib.sha256()
+    for entry in sys.path:
+        try:
+            mtime = os.stat(entry or os.curdir).st_mtime_ns
+        except OSError:
+            mtime = -1
+        digest.update(f'{entry}\0{mtime}\0'.encode())
+    return digest.hexdigest()
+
+
+def scan(group: str = GROUP) -> list[tuple[str, str]]:
+    """Find the command names and modules in an entry point group."""
+    import importlib.metadata  # pylint: disable=import-outside-toplevel
+
+    return sorted(
+        set(
+            (entry_point.name, entry_point.module)
+            for entry_point in importlib.metadata.entry_points(group=group)
+        )
+    )
+
+
+def discover(cache: kv_cache.KVCache,
+             group: str = GROUP) -> list[tuple[str, str]]:
+    """Like scan(), but only when the cached result may be stale.
+
+    Args:
+      cache: Where the result is kept between runs.
+      group: The entry point group.
+
+    Returns:
+      Command names and the modules that register them, sorted by name.
+    """
+    key = f'plugins:{group}:{path_fingerprint()}'
+    try:
+        found = cache.get(key)
+        if found is None:
+            found = scan(group)
+            cache.set(key, found)
+    except OSError as error:
+        logging.debug('Plugin cache unavailable: %s', error)
+        found = scan(group)
+    return found
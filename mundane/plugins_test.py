@@ -0,0 +1,101 @@
+"""Tests for plugins.py"""
+
+import importlib.metadata
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from mundane import kv_cache
+from mundane import plugins
+
+
+class ScanTest(unittest.TestCase):
+
+    def test_scan(self):
+        entry_points = [
+            importlib.metadata.EntryPoint(
+                'part', 'my_plugin.commands', plugins.GROUP
+            ),
+            importlib.metadata.EntryPoint(
+                'greet', 'my_plugin.commands:unused', plugins.GROUP
+            ),
+            importlib.metadata.EntryPoint(
+                'part', 'my_plugin.commands', plugins.GROUP
+            ),
+        ]
+
+        with mock.patch.object(importlib.metadata, 'entry_points',
+                               return_value=entry_points) as mock_eps:
+            found = plugins.scan('some.group')
+
+        mock_eps.assert_called_once_with(group='some.group')
+        self.assertEqual(
+            found, [
+                ('greet', 'my_plugin.commands'),
+                ('part', 'my_plugin.commands'),
+            ]
+        )
+
+
+class DiscoverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.site_packages = os.path.join(self.tmpdir, 'site-packages')
+        os.mkdir(self.site_packages)
+        self.enterContext(
+            mock.patch.object(
+                plugins.sys, 'path',
+                ['', self.site_packages, '/does/not/exist', *sys.path]
+            )
+        )
+        self.scan = self.enterContext(
+            mock.patch.object(
+                plugins, 'scan', return_value=[('greet', 'my_plugin')]
+            )
+        )
+
+    def install(self):
+        """Change site-packages like installing a distribution would."""
+        mtime = os.stat(self.site_packages).st_mtime_ns
+        os.utime(self.site_packages, ns=(mtime, mtime + 1))
+
+    def test_fingerprint(self):
+        before = plugins.path_fingerprint()
+
+        self.assertEqual(plugins.path_fingerprint(), before)
+        self.install()
+        self.assertNotEqual(plugins.path_fingerprint(), before)
+
+    def test_discover_cached(self):
+        cache = self.enterContext(
+            kv_cache.KVCache(os.path.join(self.tmpdir, 'cache'), 2**20)
+        )
+
+        self.assertEqual(plugins.discover(cache), [('greet', 'my_plugin')])
+        self.assertEqual(plugins.discover(cache), [('greet', 'my_plugin')])
+        self.scan.assert_called_once_with(plugins.GROUP)
+
+        self.install()
+        self.scan.return_value = []
+
+        self.assertEqual(plugins.discover(cache, 'other.group'), [])
+        self.scan.assert_called_with('other.group')
+
+    def test_cache_unavailable(self):
+        cache = mock.Mock()
+        cache.get.side_effect = PermissionError
+
+        with self.assertLogs(level='DEBUG') as logs:
+            found = plugins.discover(cache)
+
+        self.assertEqual(found, [('greet', 'my_plugin')])
+        self.assertIn('Plugin cache unavailable', logs.output[0])
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
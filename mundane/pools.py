@@ -0,0 +1,164 @@
+"""Share one thread pool and one process pool between hooks and commands.
+
+To add the global --workers flag to an ArgparseApp, register using:
+   ArgparseApp().register_global_flags(pools)
+
+Commands, and after parse hooks registered later, may then use the lazily
+created 'thread_pool' and 'process_pool' attributes on their args:
+
+def crunch(args):
+    for result in args.process_pool.map(work, items):
+        ...
+
+Each pool is only created when first used, and is shut down once the
+command finishes.  Unless --workers is given, pools are sized from the CPUs
+available to the process, taking any cgroup v2 CPU quota and memory limit
+into account.  When log_mgr is active, the process pool workers log through
+log_mgr.WorkerLogging into the same file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import logging
+import math
+import os
+import pathlib
+import typing
+
+from mundane import log_mgr
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from mundane import app
+
+CGROUP_ROOT = pathlib.Path('/sys/fs/cgroup')
+SELF_CGROUP = pathlib.Path('/proc/self/cgroup')
+# Memory set aside for each process pool worker when sizing from a limit.
+WORKER_MEMORY = 512 * 2**20
+# Extra threads beyond CPUs, as threads are usually waiting on I/O.
+EXTRA_THREADS = 4
+MAX_THREADS = 32
+
+
+def _cgroup_dirs() -> list[pathlib.Path]:
+    """Directories of the cgroup v2 of this process and its ancestors."""
+    try:
+        lines = SELF_CGROUP.read_text('utf-8').splitlines()
+    except OSError:
+        return []
+    dirs = list()
+    for line in lines:
+        if line.startswith('0::'):
+            path = CGROUP_ROOT
+            dirs.append(path)
+            for part in pathlib.PurePath(line[3:]).parts[1:]:
+                path = path / part
+                dirs.append(path)
+    return dirs
+
+
+def _read_limits(name: str) -> list[list[str]]:
+    """The fields of a cgroup v2 file, at each level that has a limit."""
+    limits = list()
+    for directory in _cgroup_dirs():
+        try:
+            fields = (directory / name).read_text('utf-8').split()
+        except OSError:
+            continue
+        if fields and fields[0] != 'max':
+            limits.append(fields)
+    return limits
+
+
+def cpu_quota() -> float | None:
+    """CPUs worth of time allowed by cgroup v2, if limited."""
+    quotas = [
+        int(quota) / int(period) for quota, period in _read_limits('cpu.max')
+    ]
+    return min(quotas, default=None)
+
+
+def memory_limit() -> int | None:
+    """Bytes of memory allowed by cgroup v2, if limited."""
+    return min(
+        (int(fields[0]) for fields in _read_limits('memory.max')),
+        default=None
+    )
+
+
+def process_workers() -> int:
+    """Default size of the process pool."""
+    if hasattr(os, 'sched_getaffinity'):
+        workers = len(os.sched_getaffinity(0))
+    else:
+        workers = os.cpu_count() or 1
+    quota = cpu_quota()
+    if quota is not None:
+        workers = min(workers, math.ceil(quota))
+    memory = memory_limit()
+    if memory is not None:
+        workers = min(workers, memory // WORKER_MEMORY)
+    return max(workers, 1)
+
+
+def thread_workers() -> int:
+    """Default size of the thread pool."""
+    return min(process_workers() + EXTRA_THREADS, MAX_THREADS)
+
+
+def parse_workers(value: str) -> int:
+    """Convert a pool size, which must be positive."""
+    try:
+        workers = int(value)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        raise argparse.ArgumentTypeError(f'invalid pool size: {value!r}')
+    return workers
+
+
+def mundane_global_flags(argp_app: app.ArgparseApp):
+    """Register global flags."""
+
+    argp_app.global_flags.add_argument(
+        '--workers',
+        type=parse_workers,
+        metavar='N',
+        help='Size of the shared thread and process pools (Default: sized'
+        ' from available CPUs and memory)'
+    )
+
+    def register_pools(args: argparse.Namespace):
+        """Give hooks and commands lazily created pools."""
+        workers = args.workers
+        del args.workers
+
+        def thread_pool() -> concurrent.futures.ThreadPoolExecutor:
+            max_workers = workers or thread_workers()
+            logging.debug('Starting thread pool with %d workers', max_workers)
+            return concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='mundane-pool'
+            )
+
+        def process_pool() -> concurrent.futures.ProcessPoolExecutor:
+            max_workers = workers or process_workers()
+            logging.debug(
+                'Starting process pool with %d workers', max_workers
+            )
+            if log_mgr.sibling_path('') is None:
+                return concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers
+                )
+            # Entered first, so it is exited after the pool is shut down.
+            worker_logging = args.enter_context(log_mgr.WorkerLogging())
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=log_mgr.worker_initializer,
+                initargs=worker_logging.initargs
+            )
+
+        args.register_resource('thread_pool', thread_pool)
+        args.register_resource('process_pool', process_pool)
+
+    argp_app.register_after_parse_hook(register_pools)
@@ -0,0 +1,192 @@
+"""Tests for pools.py"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mundane import log_mgr
+from mundane import pools
+from mundane.test_data import global_flags
+
+
+class CgroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.root = self.tmpdir / 'cgroup'
+        self.self_cgroup = self.tmpdir / 'self_cgroup'
+        self.enterContext(mock.patch.object(pools, 'CGROUP_ROOT', self.root))
+        self.enterContext(
+            mock.patch.object(pools, 'SELF_CGROUP', self.self_cgroup)
+        )
+        self.enterContext(
+            mock.patch.object(
+                pools.os, 'sched_getaffinity', return_value=set(range(8))
+            )
+        )
+
+    def cgroup(self, path: str, **files: str):
+        """Create a cgroup directory with some files."""
+        directory = self.root / path
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, content in files.items():
+            (directory / name.replace('_', '.')).write_text(content, 'utf-8')
+
+    def test_no_cgroups(self):
+        self.assertIsNone(pools.cpu_quota())
+        self.assertIsNone(pools.memory_limit())
+        self.assertEqual(pools.process_workers(), 8)
+        self.assertEqual(pools.thread_workers(), 12)
+
+    def test_v1_only(self):
+        self.self_cgroup.write_text('4:memory:/a\n1:cpu:/\n', 'utf-8')
+
+        self.assertIsNone(pools.cpu_quota())
+
+    def test_unlimited(self):
+        self.self_cgroup.write_text('0::/a/b\n', 'utf-8')
+        self.cgroup('a/b', cpu_max='max 100000\n', memory_max='max\n')
+
+        self.assertIsNone(pools.cpu_quota())
+        self.assertIsNone(pools.memory_limit())
+
+    def test_limits(self):
+        self.self_cgroup.write_text('0::/a/b\n', 'utf-8')
+        self.cgroup('a', cpu_max='400000 100000\n', memory_max='2147483648\n')
+        self.cgroup('a/b', cpu_max='250000 100000\n', memory_max='max\n')
+
+        self.assertEqual(pools.cpu_quota(), 2.5)
+        self.assertEqual(pools.memory_limit(), 2 * 2**30)
+        self.assertEqual(pools.process_workers(), 3)
+        self.assertEqual(pools.thread_workers(), 7)
+
+    def test_memory_bound(self):
+        self.self_cgroup.write_text('0::/a\n', 'utf-8')
+        self.cgroup('a', memory_max=str(pools.WORKER_MEMORY * 2))
+
+        self.assertEqual(pools.process_workers(), 2)
+
+    def test_at_least_one(self):
+        self.self_cgroup.write_text('0::/\n', 'utf-8')
+        self.cgroup('', memory_max='1024\n')
+
+        self.assertEqual(pools.process_workers(), 1)
+
+    def test_many_cpus(self):
+        with mock.patch.object(pools.os, 'sched_getaffinity',
+                               return_value=set(range(64))):
+            self.assertEqual(pools.thread_workers(), pools.MAX_THREADS)
+
+    def test_no_affinity(self):
+        with mock.patch.object(pools, 'os', mock.Mock(spec=['cpu_count'])):
+            pools.os.cpu_count.return_value = 6
+            self.assertEqual(pools.process_workers(), 6)
+            pools.os.cpu_count.return_value = None
+            self.assertEqual(pools.process_workers(), 1)
+
+    def test_parse_workers(self):
+        self.assertEqual(pools.parse_workers('3'), 3)
+        for value in ('0', '-1', 'many'):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(argparse.ArgumentTypeError,
+                                            'invalid pool size'):
+                    pools.parse_workers(value)
+
+
+class FlagsTest(global_flags.GlobalFlagsTest):
+
+    MODULE = pools
+
+    def setUp(self):
+        super().setUp()
+
+        self.my_app.register_command(self.threads)
+        self.my_app.register_command(self.processes)
+
+    def threads(self, args):
+        """Use the thread pool."""
+        pool = args.thread_pool
+        self.seen.append((pool, pool.submit(sum, [1, 2]).result()))
+        self.assertIs(args.thread_pool, pool)
+        return 0
+
+    def processes(self, args):
+        """Use the process pool."""
+        pool = args.process_pool
+        self.seen.append((pool, pool.submit(os.getpid).result()))
+        return 0
+
+    def test_thread_pool(self):
+        self.assertEqual(self.my_app.run(['--workers', '3', 'threads']), 0)
+
+        pool, result = self.seen[0]
+        self.assertEqual(result, 3)
+        # pylint: disable=protected-access
+        self.assertEqual(pool._max_workers, 3)
+        self.assertTrue(pool._shutdown)
+
+    def test_process_pool(self):
+        with mock.patch.object(pools, 'process_workers', return_value=2):
+            self.assertEqual(self.my_app.run(['processes']), 0)
+
+        pool, pid = self.seen[0]
+        self.assertNotEqual(pid, os.getpid())
+        # pylint: disable=protected-access
+        self.assertEqual(pool._max_workers, 2)
+        self.assertTrue(pool._shutdown_thread)
+
+    def test_process_pool_logging(self):
+        log_mgr.activate(self.id(), str(self.tmpdir))
+        handler = logging.getLogger().handlers[0]
+        self.addCleanup(handler.close)
+
+        def log_in_worker(args):
+            args.process_pool.submit(logging.warning,
+                                     'From a worker').result()
+            return 0
+
+        self.my_app.register_command(log_in_worker)
+
+        with mock.patch.object(pools, 'process_workers', return_value=1):
+            self.assertEqual(self.my_app.run(['log-in-worker']), 0)
+
+        handler.flush()
+        logged = pathlib.Path(handler.baseFilename).read_text('utf-8')
+        self.assertRegex(logged, r'\[pid \d+\] From a worker\n')
+        self.assertNotIn(f'[pid {os.getpid()}]', logged)
+
+    def test_lazy(self):
+        self.assertEqual(self.my_app.run(['noop']), 0)
+
+        self.assertNotIn('workers', self.seen[0])
+        self.assertNotIn('thread_pool', self.seen[0])
+
+    def test_bad_workers(self):
+        stderr = io.StringIO()
+
+        with self.assertRaises(SystemExit) as result:
+            with contextlib.redirect_stderr(stderr):
+                self.my_app.run(['--workers', '-1', 'noop'])
+
+        self.assertEqual(result.exception.code, 2)
+        self.assertIn("invalid pool size: '-1'", stderr.getvalue())
+
+    def test_help(self):
+        stdout = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            self.my_app.run([])
+
+        self.assertIn('--workers N', stdout.getvalue())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
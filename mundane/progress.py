@@ -0,0 +1,127 @@
+"""Report progress and throughput of long running commands.
+
+with ArgparseApp().new_progress('records', total=len(records)) as prog:
+    for record in records:
+        ...
+        prog.advance(nbytes=len(record))
+
+The inner loop only pays for advance(), which just bumps two counters.  A
+background thread does everything else.  It logs the status every interval
+and, when the stream is a terminal, keeps a status line up to date.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import sys
+import threading
+import time
+import typing
+
+import humanize
+
+LOG_INTERVAL = 10.0
+TTY_INTERVAL = 0.5
+
+
+class Progress:  # pylint: disable=too-many-instance-attributes
+    """Track items and bytes processed, reporting from a background thread.
+
+    The counters are not locked, so advance() should only be called from one
+    thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        total: int | None = None,
+        total_bytes: int | None = None,
+        interval: float = LOG_INTERVAL,
+        stream: typing.TextIO | None = None
+    ):
+        """Initialize the instance.
+
+        Args:
+          name: What is being processed, used as a prefix on reports.
+          total: Expected number of items, used for the ETA.
+          total_bytes: Expected number of bytes, used for the ETA when total
+            is not known.
+          interval: Seconds between log reports.
+          stream: Where the status line goes, if it is a terminal.  Defaults
+            to sys.stderr.
+        """
+        self.name = name
+        self.total = total
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.items = 0
+        self.nbytes = 0
+        self._stream = sys.stderr if stream is None else stream
+        self._tty = self._stream.isatty()
+        self._start = time.monotonic()
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._report, name='mundane-progress', daemon=True
+        )
+
+    def __enter__(self) -> Progress:
+        self._start = time.monotonic()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        if self._tty:
+            self._write_status('')
+        logging.info('%s (finished)', self.status())
+
+    def advance(self, items: int = 1, nbytes: int = 0):
+        """Record that items and bytes were processed."""
+        self.items += items
+        self.nbytes += nbytes
+
+    def status(self) -> str:
+        """A one line summary of progress so far."""
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        item_rate = self.items / elapsed
+        byte_rate = self.nbytes / elapsed
+
+        done = f'{self.items:,}'
+        if self.total is not None:
+            done += f'/{self.total:,}'
+        parts = [f'{self.name}: {done}', f'{item_rate:,.1f}/s']
+        if self.nbytes or self.total_bytes:
+            parts.append(f'{humanize.naturalsize(byte_rate)}/s')
+
+        eta = None
+        if self.total is not None and item_rate:
+            eta = (self.total - self.items) / item_rate
+        elif self.total_bytes is not None and byte_rate:
+            eta = (self.total_bytes - self.nbytes) / byte_rate
+        if eta is not None:
+            parts.append(
+                f'ETA {datetime.timedelta(seconds=round(max(eta, 0)))}'
+            )
+
+        return ', '.join(parts)
+
+    def _report(self):
+        """Body of the reporting thread."""
+        tick = self.interval
+        if self._tty:
+            tick = min(TTY_INTERVAL, tick)
+        next_log = self._start + self.interval
+        while not self._done.wait(tick):
+            status = self.status()
+            if self._tty:
+                self._write_status(status)
+            if time.monotonic() >= next_log:
+                logging.info('%s', status)
+                next_log += self.interval
+
+    def _write_status(self, status: str):
+        """Replace the status line on the terminal."""
+        self._stream.write(f'\r{status}\x1b[K')
+        self._stream.flush()
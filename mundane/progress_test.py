@@ -0,0 +1,100 @@
+"""Tests for progress.py"""
+
+import io
+import sys
+import time
+import unittest
+from unittest import mock
+
+from mundane import progress
+
+
+class FakeTerminal(io.StringIO):
+    """A stream that claims to be a terminal."""
+
+    def isatty(self):
+        return True
+
+
+class ProgressTest(unittest.TestCase):
+
+    def test_status_items_only(self):
+        prog = progress.Progress('things', stream=io.StringIO())
+        prog.advance()
+        prog.advance(2)
+
+        self.assertRegex(prog.status(), r'^things: 3, [\d,.]+/s$')
+
+    def test_status_with_total(self):
+        prog = progress.Progress('things', total=1000, stream=io.StringIO())
+        prog.advance(10)
+
+        self.assertRegex(
+            prog.status(), r'^things: 10/1,000, [\d,.]+/s, ETA \d+:\d\d:\d\d$'
+        )
+
+    def test_status_with_bytes(self):
+        prog = progress.Progress(
+            'files', total_bytes=10**9, stream=io.StringIO()
+        )
+        prog.advance(nbytes=1000)
+
+        self.assertRegex(
+            prog.status(),
+            r'^files: 1, [\d,.]+/s, [\d.]+ [kMGT]?B/s, ETA \d+:\d\d:\d\d$'
+        )
+
+    def test_status_nothing_done(self):
+        prog = progress.Progress(
+            'stuck', total=10, total_bytes=10, stream=io.StringIO()
+        )
+
+        self.assertEqual(prog.status(), 'stuck: 0/10, 0.0/s, 0 Bytes/s')
+
+    def test_status_past_total(self):
+        prog = progress.Progress('over', total=1, stream=io.StringIO())
+        prog.advance(5)
+
+        self.assertTrue(prog.status().endswith('ETA 0:00:00'))
+
+    def test_logs(self):
+        stream = io.StringIO()
+        prog = progress.Progress('logged', interval=0.01, stream=stream)
+
+        with self.assertLogs(level='INFO') as logs:
+            with prog:
+                while len(logs.output) < 2:
+                    prog.advance()
+                    time.sleep(0.001)
+
+        self.assertTrue(logs.output[0].startswith('INFO:root:logged: '))
+        self.assertTrue(logs.output[-1].endswith(' (finished)'))
+        self.assertEqual(stream.getvalue(), '')
+
+    def test_terminal(self):
+        stream = FakeTerminal()
+        prog = progress.Progress('shown', interval=0.01, stream=stream)
+
+        with self.assertLogs(level='INFO'):
+            with prog:
+                while '\rshown' not in stream.getvalue():
+                    time.sleep(0.001)
+
+        self.assertTrue(stream.getvalue().endswith('\r\x1b[K'))
+
+    def test_terminal_between_logs(self):
+        stream = FakeTerminal()
+        prog = progress.Progress('quiet', interval=60, stream=stream)
+
+        with mock.patch.object(progress, 'TTY_INTERVAL', 0.001):
+            with self.assertLogs(level='INFO') as logs:
+                with prog:
+                    while stream.getvalue().count('\rquiet') < 3:
+                        time.sleep(0.001)
+
+        self.assertEqual(len(logs.output), 1)
+
+    def test_default_stream(self):
+        prog = progress.Progress('default')
+
+        self.assertIs(prog._stream, sys.stderr)  # pylint: disable=protected-access
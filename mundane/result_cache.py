@@ -0,0 +1,246 @@
+"""Replay the output of commands that already ran with the same inputs.
+
+Commands that are pure functions of their flags and input files may opt in
+when they are registered:
+   ArgparseApp().register_command(
+       report, cache=result_cache.CachePolicy(inputs=('sources',)))
+
+The key is a hash of the command, its parsed flags, and a fingerprint of
+every file named by the flags listed in inputs.  Commands with a flag value
+that has no canonical form, see canonical(), are not cached.  On a hit, the
+saved stdout is written again and the saved exit code returned, without
+calling the command.  On a miss, stdout is captured while it is written,
+then saved.
+
+Entries are files in a directory, normally under the user cache dir.  Once
+the directory grows past its size limit, the least recently used entries
+are removed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import io
+import logging
+import os
+import pathlib
+import sys
+import typing
+
+from mundane import embed
+
+MAX_BYTES = 64 * 2**20
+_CHUNK = 2**20
+
+
+class CachePolicy(typing.NamedTuple):
+    """How the results of a command are cached.
+
+    Attributes:
+      inputs: Destinations of flags that name input files.  Each value may
+        be a single path or a sequence of them.
+      content: Fingerprint inputs by hashing their contents.  Otherwise
+        their modification times and sizes are used, which is cheaper, but
+        may miss changes.
+    """
+    inputs: tuple[str, ...] = ()
+    content: bool = True
+
+
+class _Tee(io.TextIOBase):
+    """Write to a stream while keeping a copy."""
+
+    def __init__(self, stream: typing.TextIO):
+        super().__init__()
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text: str) -> int:
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def isatty(self) -> bool:
+        return self.stream.isatty()
+
+
+def canonical(value: typing.Any) -> str:
+    """Encode a flag value, so that only equal values encode the same.
+
+    Unlike repr(), which for many objects only shows their type and address,
+    or, as with app.BulkArgs, only a summary.
+
+    Args:
+      value: None, a bool, number, string, bytes, path, app.BulkArgs, or a
+        list or tuple of those.
+
+    Raises:
+      TypeError: For values of other types.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return repr(value)
+    if isinstance(value, os.PathLike):
+        return f'path({os.fspath(value)!r})'
+    if isinstance(value, (list, tuple)):
+        items = ', '.join(canonical(item) for item in value)
+        return f'[{items}]' if isinstance(value, list) else f'({items},)'
+    # An app.BulkArgs, which is not imported here, as app imports this.
+    arg_strings = getattr(value, 'arg_strings', None)
+    if isinstance(arg_strings, list):
+        return f'bulk({canonical(arg_strings)})'
+    raise TypeError(f'no canonical form for {type(value).__name__} values')
+
+
+def flags_digest(func: typing.Callable, flags: dict[str, typing.Any]) -> str:
+    """Hash a command and its flags, except func, into a stable key.
+
+    Args:
+      func: The command.
+      flags: The parsed flags, as from vars(args).
+
+    Raises:
+      TypeError: When a flag value has no canonical form.
+    """
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    parts = [f'{func.__module__}.{func.__qualname__}']
+    for dest, value in sorted(flags.items()):
+        if dest != 'func':
+            try:
+                parts.append(f'{dest}={canonical(value)}')
+            except TypeError as error:
+                raise TypeError(f'flag {dest}: {error}') from error
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+def _fingerprint(path: str, content: bool) -> str:
+    """Describe the current state of a file."""
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    try:
+        if content:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as handle:
+                while chunk := handle.read(_CHUNK):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        stat = os.stat(path)
+        return f'{stat.st_mtime_ns}:{stat.st_size}'
+    except OSError as exc:
+        return f'{type(exc).__name__}:{exc.errno}'
+
+
+class ResultCache:
+    """Saved results of commands, with size based LRU eviction."""
+
+    def __init__(self, directory: str | pathlib.Path, max_bytes: int):
+        """Initialize the instance.
+
+        Args:
+          directory: Where entries are kept.  Created when first needed.
+          max_bytes: Total size of entries to keep.
+        """
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(
+        self, func: typing.Callable, args: argparse.Namespace,
+        policy: CachePolicy
+    ) -> str:
+        """Compute the key for calling func with args.
+
+        Raises:
+          TypeError: When a flag value has no canonical form.
+        """
+        import hashlib  # pylint: disable=import-outside-toplevel
+
+        flags = vars(args)
+        parts = [flags_digest(func, flags)]
+        for dest in policy.inputs:
+            paths = flags.get(dest)
+            if paths is None:
+                continue
+            if isinstance(paths, (str, os.PathLike)):
+                paths = [paths]
+            parts.extend(
+                f'{dest}:{path}={_fingerprint(path, policy.content)}'
+                for path in paths
+            )
+
+        return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> tuple[str, int] | None:
+        """Look up an entry, marking it as recently used.
+
+        Returns:
+          The saved stdout and exit code, if present.
+        """
+        import json  # pylint: disable=import-outside-toplevel
+
+        path = self.directory / key
+        try:
+            with path.open(encoding='utf-8') as handle:
+                entry = json.load(handle)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry['stdout'], entry['ret']
+
+    def put(self, key: str, stdout: str, ret: int):
+        """Save an entry, then evict old ones if needed."""
+        import json  # pylint: disable=import-outside-toplevel
+        import tempfile  # pylint: disable=import-outside-toplevel
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8',
+                                         dir=self.directory, prefix='.',
+                                         delete=False) as handle:
+            json.dump({'stdout': stdout, 'ret': ret}, handle)
+        os.replace(handle.name, self.directory / key)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes."""
+        entries = list()
+        for path in self.directory.iterdir():
+            if not path.name.startswith('.'):
+                stat = path.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort(reverse=True)
+
+        total = 0
+        for _, size, path in entries:
+            total += size
+            if total > self.max_bytes:
+                path.unlink(missing_ok=True)
+
+    def wrap(
+        self, func: typing.Callable[[argparse.Namespace], int],
+        policy: CachePolicy
+    ) -> typing.Callable[[argparse.Namespace], int]:
+        """Return a version of func that uses this cache."""
+
+        @functools.wraps(func)
+        def wrapper(args: argparse.Namespace) -> int:
+            try:
+                key = self.key(func, args, policy)
+            except TypeError as error:
+                logging.info('Not caching %s, %s', func.__qualname__, error)
+                return func(args)
+            hit = self.get(key)
+            if hit is not None:
+                stdout, ret = hit
+                logging.info('Replaying cached result %s', key)
+                sys.stdout.write(stdout)
+                return ret
+
+            tee = _Tee(embed.current_stdout())
+            with embed.redirect(stdout=typing.cast(typing.TextIO, tee)):
+                ret = func(args)
+            self.put(key, tee.copy.getvalue(), ret or 0)
+            return ret
+
+        return wrapper
@@ -0,0 +1,289 @@
+"""Tests for result_cache.py"""
+
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mundane import app
+from mundane import result_cache
+
+
+class BaseResultCache(unittest.TestCase):
+    """Provide a scratch directory."""
+
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write(self, name: str, content: str) -> str:
+        """Create a file in the scratch directory."""
+        path = self.tmpdir / name
+        path.write_text(content, 'utf-8')
+        return str(path)
+
+
+class KeyTest(BaseResultCache):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = result_cache.ResultCache(self.tmpdir / 'cache', 1024)
+        self.policy = result_cache.CachePolicy(inputs=('src', 'more'))
+
+    def key(self, policy=None, **kwargs) -> str:
+        """Shortcut for computing a key."""
+        args = argparse.Namespace(func=print, **kwargs)
+        return self.cache.key(print, args, policy or self.policy)
+
+    def test_flags(self):
+        self.assertEqual(self.key(flag=1), self.key(flag=1))
+        self.assertNotEqual(self.key(flag=1), self.key(flag=2))
+
+    def test_canonical(self):
+        self.assertNotEqual(self.key(flag=1), self.key(flag='1'))
+        self.assertNotEqual(self.key(flag=[1]), self.key(flag=(1,)))
+        self.assertNotEqual(
+            self.key(flag=['a', 'b']), self.key(flag=['a, b'])
+        )
+        self.assertEqual(
+            self.key(flag=pathlib.Path('a')),
+            self.key(flag=pathlib.PurePath('a'))
+        )
+        self.assertEqual(
+            self.key(flag=app.BulkArgs(['a', 'b'])),
+            self.key(flag=app.BulkArgs(['a', 'b'], str.upper))
+        )
+        self.assertNotEqual(
+            self.key(flag=app.BulkArgs(['a', 'b'])),
+            self.key(flag=app.BulkArgs(['x', 'y']))
+        )
+
+    def test_not_canonical(self):
+        with self.assertRaisesRegex(TypeError, 'flag flag: .* object'):
+            self.key(flag=[object()])
+
+    def test_ignores_func(self):
+        args = argparse.Namespace(func=len)
+
+        self.assertEqual(self.cache.key(print, args, self.policy), self.key())
+
+    def test_content(self):
+        src = self.write('src', 'one')
+        first = self.key(src=src)
+
+        self.write('src', 'two')
+
+        self.assertNotEqual(self.key(src=src), first)
+
+    def test_mtime(self):
+        policy = result_cache.CachePolicy(inputs=('src',), content=False)
+        src = self.write('src', 'one')
+        first = self.key(policy, src=src)
+
+        self.write('src', 'one')
+        os.utime(src, ns=(0, 0))
+
+        self.assertNotEqual(self.key(policy, src=src), first)
+
+    def test_sequence(self):
+        paths = [self.write('a', 'a'), self.write('b', 'b')]
+        first = self.key(more=paths)
+
+        self.write('b', 'changed')
+
+        self.assertNotEqual(self.key(more=paths), first)
+
+    def test_missing(self):
+        src = str(self.tmpdir / 'missing')
+        first = self.key(src=src)
+
+        self.write('missing', 'found')
+
+        self.assertNotEqual(self.key(src=src), first)
+        self.assertEqual(self.key(src=None), self.key(src=None))
+
+
+class StoreTest(BaseResultCache):
+
+    def test_miss(self):
+        cache = result_cache.ResultCache(self.tmpdir, 1024)
+
+        self.assertIsNone(cache.get('nope'))
+
+    def test_corrupt(self):
+        cache = result_cache.ResultCache(self.tmpdir, 1024)
+        self.write('bad', '{')
+
+        self.assertIsNone(cache.get('bad'))
+
+    def test_round_trip(self):
+        cache = result_cache.ResultCache(self.tmpdir / 'sub', 1024)
+
+        cache.put('key', 'out\n', 3)
+
+        self.assertEqual(cache.get('key'), ('out\n', 3))
+        self.assertEqual(os.listdir(self.tmpdir / 'sub'), ['key'])
+
+    def test_lru(self):
+        cache = result_cache.ResultCache(self.tmpdir, 150)
+        self.write('.partial', 'x' * 200)
+        cache.put('old', 'x' * 30, 0)
+        cache.put('used', 'x' * 30, 0)
+        os.utime(self.tmpdir / 'old', ns=(1, 1))
+        os.utime(self.tmpdir / 'used', ns=(2, 2))
+        self.assertIsNotNone(cache.get('used'))
+
+        cache.put('new', 'x' * 30, 0)
+
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir)), ['.partial', 'new', 'used']
+        )
+
+
+class TeeTest(unittest.TestCase):
+
+    def test_passthrough(self):
+        stream = mock.Mock(spec=io.StringIO)
+        stream.write.return_value = 5
+        stream.isatty.return_value = True
+        tee = result_cache._Tee(stream)  # pylint: disable=protected-access
+
+        self.assertEqual(tee.write('hello'), 5)
+        tee.flush()
+
+        self.assertTrue(tee.isatty())
+        self.assertEqual(tee.copy.getvalue(), 'hello')
+        stream.flush.assert_called_once_with()
+
+
+class AppTest(BaseResultCache):
+
+    def setUp(self):
+        super().setUp()
+
+        self.calls = 0
+        self.barrier = threading.Barrier(1)
+        self.my_app = app.ArgparseApp()
+        self.my_app.dirs = mock.Mock(user_cache_dir=str(self.tmpdir))
+        parser = self.my_app.register_command(
+            self.generate,
+            cache=result_cache.CachePolicy(inputs=('src',)),
+        )
+        parser.add_argument('src')
+        parser.add_argument('--code', type=int, default=0)
+
+    def generate(self, args):
+        """A command that prints its input."""
+        self.calls += 1
+        self.barrier.wait()
+        print(pathlib.Path(args.src).read_text('utf-8'), end='')
+        self.barrier.wait()
+        return args.code
+
+    def count(self, args):
+        """A command that prints the first and number of its words."""
+        print(args.words[0], len(args.words))
+        return 0
+
+    def run_app(self, argv: list[str]) -> tuple[int, str]:
+        """Run with captured stdout."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            ret = self.my_app.run(argv)
+        return ret, stdout.getvalue()
+
+    def test_replay(self):
+        src = self.write('src', 'report')
+
+        self.assertEqual(self.run_app(['generate', src]), (0, 'report'))
+        with self.assertLogs(level='INFO') as logs:
+            self.assertEqual(self.run_app(['generate', src]), (0, 'report'))
+
+        self.assertEqual(self.calls, 1)
+        self.assertIn('Replaying cached result', logs.output[0])
+        self.assertEqual(
+            self.my_app.command_cache.directory, self.tmpdir / 'results'
+        )
+
+    def test_exit_code(self):
+        src = self.write('src', 'failed')
+
+        self.run_app(['generate', '--code', '3', src])
+
+        self.assertEqual(
+            self.run_app(['generate', '--code', '3', src]), (3, 'failed')
+        )
+        self.assertEqual(self.calls, 1)
+
+    def test_changed_input(self):
+        src = self.write('src', 'one')
+        self.run_app(['generate', src])
+
+        self.write('src', 'two')
+
+        self.assertEqual(self.run_app(['generate', src]), (0, 'two'))
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent(self):
+        sources = [self.write(name, name) for name in ('one', 'two')]
+        self.barrier = threading.Barrier(len(sources))
+        outputs = [io.StringIO() for _ in sources]
+        threads = [
+            threading.Thread(
+                target=self.my_app.run_embedded,
+                args=(['generate', src],),
+                kwargs=dict(stdout=output)
+            ) for src, output in zip(sources, outputs)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            [output.getvalue() for output in outputs], ['one', 'two']
+        )
+        self.barrier = threading.Barrier(1)
+        for src, name in zip(sources, ('one', 'two')):
+            self.assertEqual(self.run_app(['generate', src]), (0, name))
+        self.assertEqual(self.calls, 2)
+
+    def test_bulk_args(self):
+        parser = self.my_app.register_command(
+            self.count, cache=result_cache.CachePolicy()
+        )
+        parser.add_argument('words', action=app.BulkAction)
+
+        self.assertEqual(self.run_app(['count', 'a', 'b']), (0, 'a 2\n'))
+        self.assertEqual(self.run_app(['count', 'x', 'y']), (0, 'x 2\n'))
+
+    def test_not_canonical(self):
+        parser = self.my_app.register_command(
+            self.count, cache=result_cache.CachePolicy()
+        )
+        parser.add_argument('words', type=complex, nargs='+')
+
+        with self.assertLogs(level='INFO') as logs:
+            self.run_app(['count', '1j'])
+            self.assertEqual(self.run_app(['count', '1j']), (0, '1j 1\n'))
+
+        self.assertIn('Not caching', logs.output[0])
+        self.assertFalse((self.tmpdir / 'results').exists())
+
+    def test_exception(self):
+        src = str(self.tmpdir / 'missing')
+
+        with self.assertRaises(FileNotFoundError):
+            self.run_app(['generate', src])
+
+        self.assertFalse((self.tmpdir / 'results').exists())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
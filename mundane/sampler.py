@@ -0,0 +1,170 @@
+"""Record how a command uses resources while it runs.
+
+To add the global --sample-interval flag to an ArgparseApp, register using:
+   ArgparseApp().register_global_flags(sampler)
+
+When the flag is given, a background thread samples the process at that
+interval, and writes a CSV file next to the log file.  Once the command
+finishes, the peaks, and when they happened, are logged.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import pathlib
+import threading
+import time
+import typing
+
+import humanize
+
+from mundane import log_mgr
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import argparse
+
+    import psutil
+
+    from mundane import app
+
+FIELDS = (
+    'elapsed', 'cpu_percent', 'rss', 'num_fds', 'read_bytes', 'write_bytes',
+    'num_threads'
+)
+PEAK_FIELDS = ('cpu_percent', 'rss', 'num_fds', 'num_threads')
+
+
+class Sampler:  # pylint: disable=too-many-instance-attributes
+    """Context manager that samples resource usage from a daemon thread."""
+
+    def __init__(self, path: str | pathlib.Path, interval: float):
+        """Initialize the instance.
+
+        Args:
+          path: The CSV file to write.
+          interval: Seconds between samples.
+        """
+        self.path = pathlib.Path(path)
+        self.interval = interval
+        self.samples = 0
+        self.peaks: dict[str, tuple[float, float]] = dict()
+        self.last: dict[str, float] = dict()
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='mundane-sampler', daemon=True
+        )
+        self._start = 0.0
+
+    def __enter__(self) -> Sampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        logging.info('%s', self.summary())
+
+    def sample(self, process: psutil.Process) -> dict[str, float]:
+        """Take one sample of the process."""
+        with process.oneshot():
+            row = {
+                'elapsed': round(time.monotonic() - self._start, 3),
+                'cpu_percent': process.cpu_percent(),
+                'rss': process.memory_info().rss,
+                'num_fds': process.num_fds(),
+                'num_threads': process.num_threads(),
+            }
+            try:
+                io_counters = process.io_counters()
+                row['read_bytes'] = io_counters.read_bytes
+                row['write_bytes'] = io_counters.write_bytes
+            except (AttributeError, OSError):
+                # Not supported on all platforms, or may not be permitted.
+                pass
+        return row
+
+    def summary(self) -> str:
+        """Describe the peaks seen so far."""
+        if not self.samples:
+            return f'No resource samples taken for {self.path}'
+        formats: dict[str, typing.Callable[[float], str]] = {
+            'cpu_percent': lambda value: f'{value:.1f}%',
+            'rss': lambda value: humanize.naturalsize(value, binary=True),
+            'num_fds': lambda value: f'{value:.0f}',
+            'num_threads': lambda value: f'{value:.0f}',
+        }
+        parts = [
+            f'{name} {formats[name](value)} at {elapsed:.1f}s'
+            for name, (value, elapsed) in self.peaks.items()
+        ]
+        for name in ('read_bytes', 'write_bytes'):
+            if name in self.last:
+                parts.append(
+                    f'{name} {humanize.naturalsize(self.last[name], binary=True)}'
+                )
+        return (
+            f'Resource peaks over {self.samples} samples: {", ".join(parts)}'
+            f' ({self.path})'
+        )
+
+    def _record(self, row: dict[str, float]):
+        """Update the peaks and counts with a sample."""
+        self.samples += 1
+        self.last = row
+        for name in PEAK_FIELDS:
+            peak = self.peaks.get(name)
+            if peak is None or row[name] > peak[0]:
+                self.peaks[name] = (row[name], row['elapsed'])
+
+    def _run(self):
+        """Body of the sampling thread."""
+        import psutil  # pylint: disable=import-outside-toplevel
+
+        process = psutil.Process()
+        # The first call only sets the starting point.
+        process.cpu_percent()
+        self._start = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open('w', encoding='utf-8', newline='',
+                            buffering=1) as handle:
+            writer = csv.DictWriter(handle, FIELDS)
+            writer.writeheader()
+            # Always take a final sample, so short commands have one.
+            while True:
+                done = self._done.wait(self.interval)
+                row = self.sample(process)
+                writer.writerow(row)
+                self._record(row)
+                if done:
+                    break
+
+
+def _default_path(argp_app: app.ArgparseApp) -> pathlib.Path:
+    """Next to the log file, if there is one, else in the log dir."""
+    return log_mgr.sibling_path('.samples.csv') or pathlib.Path(
+        argp_app.dirs.user_log_dir,
+        f'{argp_app.appname}.{os.getpid()}.samples.csv'
+    )
+
+
+def mundane_global_flags(argp_app: app.ArgparseApp):
+    """Register global flags."""
+
+    argp_app.global_flags.add_argument(
+        '--sample-interval',
+        type=float,
+        metavar='SECONDS',
+        help='Record resource usage at this interval into a CSV file'
+        ' next to the log file'
+    )
+
+    def start_sampler(args: argparse.Namespace):
+        """Start a Sampler for the command, if requested."""
+        interval = args.sample_interval
+        del args.sample_interval
+        if interval:
+            args.enter_context(Sampler(_default_path(argp_app), interval))
+
+    argp_app.register_after_parse_hook(start_sampler)
@@ -0,0 +1,134 @@
+"""Tests for sampler.py"""
+
+import contextlib
+import csv
+import io
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from mundane import log_mgr
+from mundane import sampler
+from mundane.test_data import global_flags
+
+
+class SamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = self.tmpdir / 'logs' / 'run.samples.csv'
+
+    def test_samples(self):
+        with self.assertLogs() as logs:
+            with sampler.Sampler(self.path, 0.01) as my_sampler:
+                data = bytearray(b'x' * 8 * 2**20)
+                while my_sampler.samples < 3:
+                    time.sleep(0.01)
+
+        with self.path.open(encoding='utf-8') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), my_sampler.samples)
+        self.assertEqual(list(rows[0]), list(sampler.FIELDS))
+        self.assertGreater(int(rows[-1]['rss']), len(data))
+        self.assertGreater(int(rows[-1]['num_threads']), 1)
+        self.assertEqual(set(my_sampler.peaks), set(sampler.PEAK_FIELDS))
+        self.assertRegex(
+            logs.output[0], r'Resource peaks over \d+ samples: cpu_percent '
+            r'[\d.]+% at [\d.]+s, rss [\d.]+ MiB at'
+        )
+        self.assertIn(str(self.path), logs.output[0])
+
+    def test_short_command(self):
+        with self.assertLogs() as logs:
+            with sampler.Sampler(self.path, 3600) as my_sampler:
+                pass
+
+        self.assertEqual(my_sampler.samples, 1)
+        self.assertIn('over 1 samples', logs.output[0])
+
+    def test_peaks(self):
+        my_sampler = sampler.Sampler(self.path, 1)
+        # pylint: disable=protected-access
+        for elapsed, rss in ((1.0, 10), (2.0, 30), (3.0, 20)):
+            my_sampler._record(
+                {
+                    'elapsed': elapsed,
+                    'cpu_percent': 50.0,
+                    'rss': rss,
+                    'num_fds': 3,
+                    'num_threads': 1
+                }
+            )
+
+        self.assertEqual(my_sampler.peaks['rss'], (30, 2.0))
+        self.assertEqual(my_sampler.peaks['cpu_percent'], (50.0, 1.0))
+        self.assertNotIn('read_bytes', my_sampler.summary())
+
+    def test_no_samples(self):
+        my_sampler = sampler.Sampler(self.path, 1)
+
+        self.assertIn('No resource samples', my_sampler.summary())
+
+    def test_no_io_counters(self):
+        process = mock.MagicMock()
+        process.io_counters.side_effect = PermissionError
+
+        row = sampler.Sampler(self.path, 1).sample(process)
+
+        self.assertNotIn('read_bytes', row)
+        self.assertIn('rss', row)
+
+
+class FlagsTest(global_flags.GlobalFlagsTest):
+
+    MODULE = sampler
+
+    def test_off_by_default(self):
+        with mock.patch.object(sampler, 'Sampler') as mock_sampler:
+            self.assertEqual(self.my_app.run(['noop']), 0)
+
+        mock_sampler.assert_not_called()
+        self.assertNotIn('sample_interval', self.seen[0])
+
+    def test_log_dir(self):
+        with self.assertLogs() as logs:
+            self.assertEqual(
+                self.my_app.run(['--sample-interval', '0.01', 'noop']), 0
+            )
+
+        path = pathlib.Path(
+            self.tmpdir, f'{self.my_app.appname}.{os.getpid()}.samples.csv'
+        )
+        self.assertTrue(path.exists())
+        self.assertIn('Resource peaks', logs.output[-1])
+        self.assertNotIn('sample_interval', self.seen[0])
+
+    def test_next_to_log_file(self):
+        log_mgr.activate(self.my_app.appname, self.tmpdir)
+        handler = logging.getLogger().handlers[0]
+        self.addCleanup(handler.close)
+
+        with mock.patch.object(sampler, 'Sampler') as mock_sampler:
+            self.my_app.run(['--sample-interval', '5', 'noop'])
+
+        mock_sampler.assert_called_once_with(
+            pathlib.Path(f'{handler.baseFilename}.samples.csv'), 5.0
+        )
+
+    def test_help(self):
+        stdout = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            self.my_app.run([])
+
+        self.assertIn('--sample-interval SECONDS', stdout.getvalue())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Shared fixture for tests of the global flags of a module."""
+
+from __future__ import annotations
+
+import logging
+import pathlib
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from mundane import app
+
+
+class GlobalFlagsTest(unittest.TestCase):
+    """Run an app with the global flags of one module.
+
+    Subclasses set MODULE.  Each test gets an app with those flags, a noop
+    command that records its flags in self.seen, and a scratch directory
+    used for all of the app's directories.  Root logger handlers are
+    restored afterwards.
+    """
+
+    MODULE: types.ModuleType
+
+    def setUp(self):
+        super().setUp()
+
+        root_logger = logging.getLogger()
+        self.addCleanup(
+            setattr, root_logger, 'handlers', root_logger.handlers.copy()
+        )
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.seen = list()
+        self.my_app = app.ArgparseApp()
+        self.my_app.dirs = mock.Mock(
+            user_cache_dir=str(self.tmpdir),
+            user_log_dir=str(self.tmpdir),
+            user_state_dir=str(self.tmpdir)
+        )
+        self.my_app.register_global_flags([self.MODULE])
+        self.my_app.register_command(self.noop)
+
+    def record(self, args) -> object:
+        """What noop() adds to self.seen."""
+        return vars(args).copy()
+
+    def noop(self, args):
+        """A command that records its flags."""
+        self.seen.append(self.record(args))
+        return 0
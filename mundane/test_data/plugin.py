@@ -0,0 +1,37 @@
+"""A plugin, only imported when one of its commands is used."""
+
+from __future__ import annotations
+
+import typing
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import argparse
+
+    from mundane import app
+
+
+def mundane_global_flags(an_app: app.ArgparseApp):
+    """Register global flags for the application."""
+    an_app.global_flags.add_argument(
+        '--loud', action='store_true', help='Greet loudly.'
+    )
+
+
+def mundane_commands(an_app: app.ArgparseApp):
+    """Register all module commands."""
+    parser = an_app.register_command(greet)
+    parser.add_argument('who', help='Who to greet.')
+    an_app.register_command(part)
+
+
+def greet(args: argparse.Namespace) -> int:
+    """Say hello."""
+    greeting = f'Hello, {args.who}'
+    print(greeting.upper() if args.loud else greeting)
+    return 0
+
+
+def part(args: argparse.Namespace) -> int:  # pragma: no cover
+    """Say goodbye."""
+    del args
+    return 0
@@ -0,0 +1,211 @@
+"""Record timing spans and export them as a Chrome trace.
+
+Spans are recorded with a context manager or a decorator:
+  with trace.span('load', path=path):
+      ...
+
+  @trace.traced()
+  def crunch(...):
+      ...
+
+ArgparseApp records spans for registration, parsing, each after parse hook
+and the command.  To write them to a file in the log directory at the end of
+a run, register the --trace global flag using:
+   ArgparseApp().register_global_flags(trace)
+
+The file can be loaded into chrome://tracing or https://ui.perfetto.dev.
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+import logging
+import operator
+import os
+import pathlib
+import threading
+import time
+import typing
+
+from mundane import log_mgr
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import argparse
+
+    from mundane import app
+
+CAPACITY = 16384
+
+# name, start, end, thread id, args
+_Event: typing.TypeAlias = tuple[str, int, int, int, dict[str, typing.Any]]
+
+
+class _Buffer:  # pylint: disable=too-few-public-methods
+    """Preallocated storage for finished spans.
+
+    Slots are claimed with itertools.count(), which is atomic under the GIL,
+    so recording does not need a lock.  Spans finished after the buffer is
+    full are counted, but otherwise dropped.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.events: list[_Event | None] = [None] * capacity
+        self.dropped = 0
+        self.slots = itertools.count()
+
+
+_buffer = _Buffer(CAPACITY)
+_clock = time.perf_counter_ns
+_get_ident = threading.get_ident
+
+
+class Span:
+    """Context manager that records the time spent inside it."""
+
+    __slots__ = ('name', 'args', '_start')
+
+    def __init__(self, name: str, **kwargs: typing.Any):
+        """Initialize the instance.
+
+        Args:
+          name: Shown on the timeline.
+          kwargs: Extra details shown when the span is selected.
+        """
+        self.name = name
+        self.args = kwargs
+        self._start = 0
+
+    def __enter__(self) -> Span:
+        self._start = _clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = _clock()
+        buffer = _buffer
+        slot = next(buffer.slots)
+        if slot < buffer.capacity:
+            buffer.events[slot] = (
+                self.name, self._start, end, _get_ident(), self.args
+            )
+        else:
+            buffer.dropped += 1
+
+
+span = Span  # pylint: disable=invalid-name
+
+
+def traced(name: str | None = None) -> typing.Callable:
+    """Decorator that records each call of a function as a span.
+
+    Args:
+      name: Shown on the timeline.  Defaults to the function's qualified
+        name.
+
+    Returns:
+      The actual decorator.
+    """
+
+    def decorator(func: typing.Callable) -> typing.Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def reset(capacity: int = CAPACITY):
+    """Discard all recorded spans and preallocate a new buffer."""
+    global _buffer  # pylint: disable=global-statement
+    _buffer = _Buffer(capacity)
+
+
+def chrome_trace() -> dict[str, typing.Any]:
+    """Recorded spans in the Chrome trace event format."""
+    pid = os.getpid()
+    events = sorted(
+        (event for event in _buffer.events if event is not None),
+        key=operator.itemgetter(1)
+    )
+    trace_events: list[dict[str, typing.Any]] = [
+        {
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': pid,
+            'tid': thread.ident,
+            'args': {
+                'name': thread.name
+            },
+        } for thread in threading.enumerate()
+    ]
+    trace_events.extend(
+        {
+            'name': name,
+            'ph': 'X',
+            'ts': start / 1000,
+            'dur': (end - start) / 1000,
+            'pid': pid,
+            'tid': tid,
+            'args': args,
+        } for name, start, end, tid, args in events
+    )
+
+    return {
+        'traceEvents': trace_events,
+        'displayTimeUnit': 'ms',
+        'otherData': {
+            'dropped': _buffer.dropped
+        },
+    }
+
+
+def export(path: str | pathlib.Path):
+    """Write recorded spans as a Chrome trace file."""
+    import json  # pylint: disable=import-outside-toplevel
+
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(chrome_trace()), 'utf-8')
+
+
+class _Exporter:
+    """Export when the context exits."""
+
+    def __init__(self, argp_app: app.ArgparseApp):
+        self._app = argp_app
+
+    def __enter__(self) -> _Exporter:
+        return self
+
+    def __exit__(self, *exc_info):
+        path = log_mgr.sibling_path('.trace.json') or pathlib.Path(
+            self._app.dirs.user_log_dir,
+            f'{self._app.appname}.{os.getpid()}.trace.json'
+        )
+        export(path)
+        logging.info('Trace written to %s', path)
+
+
+def mundane_global_flags(argp_app: app.ArgparseApp):
+    """Register global flags."""
+
+    action = argp_app.global_flags.add_argument(
+        '--trace',
+        action='store_true',
+        help='Write a Chrome trace file into the log directory'
+    )
+
+    def start_trace_export(args: argparse.Namespace):
+        """Export the trace once the command finishes."""
+        if args.trace:
+            log_mgr.reject_in_call(action)
+            args.enter_context(_Exporter(argp_app))
+        del args.trace
+
+    argp_app.register_after_parse_hook(start_trace_export)
@@ -0,0 +1,195 @@
+"""Tests for trace.py"""
+
+import io
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+
+from mundane import log_mgr
+from mundane import trace
+from mundane.test_data import global_flags
+
+
+class BaseTrace(unittest.TestCase):
+    """Start each test with an empty buffer."""
+
+    def setUp(self):
+        trace.reset()
+        self.addCleanup(trace.reset)
+
+    def spans(self) -> list[dict]:
+        """The complete events currently recorded."""
+        return [
+            event for event in trace.chrome_trace()['traceEvents']
+            if event['ph'] == 'X'
+        ]
+
+
+class SpanTest(BaseTrace):
+
+    def test_context_manager(self):
+        with trace.span('outer', path='x'):
+            with trace.span('inner'):
+                pass
+
+        outer, inner = self.spans()
+
+        self.assertEqual(outer['name'], 'outer')
+        self.assertEqual(outer['args'], {'path': 'x'})
+        self.assertEqual(outer['pid'], os.getpid())
+        self.assertEqual(outer['tid'], threading.get_ident())
+        self.assertEqual(inner['name'], 'inner')
+        self.assertLessEqual(outer['ts'], inner['ts'])
+        self.assertGreaterEqual(
+            outer['ts'] + outer['dur'], inner['ts'] + inner['dur']
+        )
+
+    def test_exception(self):
+        with self.assertRaises(ValueError):
+            with trace.span('fails'):
+                raise ValueError
+
+        self.assertEqual([span['name'] for span in self.spans()], ['fails'])
+
+    def test_traced(self):
+
+        @trace.traced()
+        def default(value):
+            return value + 1
+
+        @trace.traced('named')
+        def custom():
+            pass
+
+        self.assertEqual(default(1), 2)
+        custom()
+
+        self.assertEqual(
+            [span['name'] for span in self.spans()],
+            ['SpanTest.test_traced.<locals>.default', 'named']
+        )
+        self.assertEqual(default.__name__, 'default')
+
+    def test_threads(self):
+        thread = threading.Thread(
+            target=trace.traced('worker')(lambda: None), name='my-worker'
+        )
+        thread.start()
+        thread.join()
+        with trace.span('main'):
+            named = trace.chrome_trace()['traceEvents']
+
+        self.assertEqual(
+            [span['name'] for span in self.spans()], ['worker', 'main']
+        )
+        self.assertNotEqual(self.spans()[0]['tid'], threading.get_ident())
+        self.assertIn(
+            {
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {
+                    'name': threading.current_thread().name
+                },
+            }, named
+        )
+
+    def test_full(self):
+        trace.reset(2)
+
+        for name in ('one', 'two', 'three'):
+            with trace.span(name):
+                pass
+
+        self.assertEqual(
+            [span['name'] for span in self.spans()], ['one', 'two']
+        )
+        self.assertEqual(trace.chrome_trace()['otherData'], {'dropped': 1})
+
+
+class ExportTest(BaseTrace):
+
+    def test_export(self):
+        with trace.span('saved'):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = pathlib.Path(tmpdir, 'sub', 'out.json')
+            trace.export(path)
+            data = json.loads(path.read_text('utf-8'))
+
+        self.assertEqual(data['displayTimeUnit'], 'ms')
+        self.assertIn(
+            'saved', [event['name'] for event in data['traceEvents']]
+        )
+
+
+class FlagsTest(global_flags.GlobalFlagsTest, BaseTrace):
+
+    MODULE = trace
+
+    def traces(self) -> list[pathlib.Path]:
+        """Trace files written so far."""
+        return sorted(pathlib.Path(self.tmpdir).glob('**/*.trace.json'))
+
+    def test_no_flag(self):
+        self.assertEqual(self.my_app.run(['noop']), 0)
+
+        self.assertNotIn('trace', self.seen[0])
+        self.assertEqual(self.traces(), [])
+
+    def test_flag(self):
+        with self.assertLogs(level=logging.INFO) as logs:
+            self.assertEqual(self.my_app.run(['--trace', 'noop']), 0)
+
+        self.assertNotIn('trace', self.seen[0])
+        path, = self.traces()
+        self.assertEqual(
+            path.name, f'{self.my_app.appname}.{os.getpid()}.trace.json'
+        )
+        self.assertIn(f'Trace written to {path}', logs.output[0])
+        names = [
+            event['name']
+            for event in json.loads(path.read_text('utf-8'))['traceEvents']
+        ]
+        self.assertIn('mundane_global_flags', names)
+        self.assertIn('parse_args', names)
+        self.assertIn('GlobalFlagsTest.noop', names)
+        self.assertIn(
+            'mundane_global_flags.<locals>.start_trace_export', names
+        )
+
+    def test_embedded(self):
+        stderr = io.StringIO()
+
+        self.assertEqual(
+            self.my_app.run_embedded(['--trace', 'noop'], stderr=stderr), 2
+        )
+
+        self.assertEqual(self.seen, [])
+        self.assertEqual(self.traces(), [])
+        self.assertIn(
+            'argument --trace: not allowed in an embedded run',
+            stderr.getvalue()
+        )
+
+    def test_log_handler(self):
+        log_mgr.activate(self.my_app.appname, self.tmpdir)
+        handler = logging.getLogger().handlers[0]
+        self.addCleanup(handler.close)
+
+        self.assertEqual(self.my_app.run(['--trace', 'noop']), 0)
+
+        self.assertEqual(
+            self.traces(),
+            [pathlib.Path(f'{handler.baseFilename}.trace.json')]
+        )
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
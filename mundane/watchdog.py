@@ -0,0 +1,131 @@
+"""Enforce deadlines on commands.
+
+To add the global --deadline flag to an ArgparseApp, register using:
+   ArgparseApp().register_global_flags(watchdog)
+
+Commands may also provide their own default:
+   ArgparseApp().register_command(func, deadline=60)
+
+Once a command has been running for SOFT_FRACTION of its deadline, the stacks
+of all threads are written next to the log file.  If it is still running at
+the deadline, the process exits with EXIT_DEADLINE.
+"""
+
+from __future__ import annotations
+
+import faulthandler
+import logging
+import os
+import pathlib
+import threading
+import typing
+
+from mundane import log_mgr
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import argparse
+
+    from mundane import app
+
+EXIT_DEADLINE = 124
+SOFT_FRACTION = 0.8
+
+
+class Watchdog:
+    """Context manager that watches for running past a deadline.
+
+    A daemon thread waits for the context to exit.  At the soft threshold, it
+    dumps the stacks of all threads using faulthandler, which works even if
+    the main thread is stuck holding the GIL in a C extension.  At the hard
+    threshold, it flushes the log handlers and exits the process immediately.
+    """
+
+    def __init__(self, deadline: float, soft_fraction: float = SOFT_FRACTION):
+        """Initialize the instance.
+
+        Args:
+          deadline: Seconds until the process is ended.
+          soft_fraction: Portion of the deadline before stacks are dumped.
+        """
+        self.deadline = deadline
+        self.soft_deadline = deadline * soft_fraction
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._watch, name='mundane-watchdog', daemon=True
+        )
+
+    def __enter__(self) -> Watchdog:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+
+    def dump_stacks(self) -> pathlib.Path | None:
+        """Write the stacks of all threads next to the log file.
+
+        If log_mgr is not active, the stacks are logged instead.
+
+        Returns:
+          The file the stacks were written to, if any.
+        """
+        path = log_mgr.sibling_path('.stacks')
+        if path is None:
+            log_mgr.log_stacks_and_usage()
+            return None
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a', encoding='utf-8') as handle:
+            faulthandler.dump_traceback(handle, all_threads=True)
+        logging.warning(
+            'Running for more than %s seconds, stacks written to %s',
+            self.soft_deadline, path
+        )
+        return path
+
+    def expire(self):
+        """Exit the process, as the deadline has passed."""
+        logging.error(
+            'Deadline of %s seconds exceeded, exiting with %d', self.deadline,
+            EXIT_DEADLINE
+        )
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        os._exit(EXIT_DEADLINE)
+
+    def _watch(self):
+        """Body of the watchdog thread."""
+        if self._done.wait(self.soft_deadline):
+            return
+        self.dump_stacks()
+        if self._done.wait(self.deadline - self.soft_deadline):
+            return
+        self.expire()
+
+
+def mundane_global_flags(argp_app: app.ArgparseApp):
+    """Register global flags."""
+
+    action = argp_app.global_flags.add_argument(
+        '--deadline',
+        type=float,
+        metavar='SECONDS',
+        help=(
+            f'End the command with exit code {EXIT_DEADLINE} if it runs'
+            ' longer than this (Default: per command)'
+        )
+    )
+
+    def start_watchdog(args: argparse.Namespace):
+        """Start a Watchdog for the selected command, if it has a deadline."""
+        deadline = args.deadline
+        del args.deadline
+        if deadline is not None:
+            log_mgr.reject_in_call(action)
+        elif hasattr(args, 'func'):
+            deadline = argp_app.command_deadline(args.func)
+        if deadline:
+            args.enter_context(Watchdog(deadline))
+
+    argp_app.register_after_parse_hook(start_watchdog)
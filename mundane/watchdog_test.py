@@ -0,0 +1,202 @@
+"""Tests for watchdog.py"""
+
+import contextlib
+import io
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import unittest
+from unittest import mock
+
+from mundane import log_mgr
+from mundane import watchdog
+from mundane.test_data import global_flags
+
+
+class ExpireRecorder(watchdog.Watchdog):
+    """A Watchdog that does not actually exit."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dumped = threading.Event()
+        self.expired = threading.Event()
+
+    def dump_stacks(self):
+        try:
+            return super().dump_stacks()
+        finally:
+            self.dumped.set()
+
+    def expire(self):
+        self.expired.set()
+
+
+class BaseWatchdog(unittest.TestCase):
+    """Restore logging after each test."""
+
+    def setUp(self):
+        root_logger = logging.getLogger()
+        orig_handlers = root_logger.handlers.copy()
+
+        def restore_handlers():
+            for handler in set(root_logger.handlers) - set(orig_handlers):
+                handler.close()
+            root_logger.handlers[:] = orig_handlers
+
+        self.addCleanup(restore_handlers)
+
+    def watchdog_running(self) -> bool:
+        """Whether a watchdog thread is alive."""
+        return any(
+            thread.name == 'mundane-watchdog'
+            for thread in threading.enumerate()
+        )
+
+
+class WatchdogTest(BaseWatchdog):
+
+    def test_finished_in_time(self):
+        with ExpireRecorder(60) as dog:
+            self.assertTrue(self.watchdog_running())
+
+        self.assertFalse(self.watchdog_running())
+        self.assertFalse(dog.expired.is_set())
+
+    def test_soft_then_hard(self):
+        log_mgr.activate(self.id(), tempfile.mkdtemp())
+        handler = logging.getLogger().handlers[0]
+        dog = ExpireRecorder(0.2, soft_fraction=0.5)
+
+        with dog:
+            self.assertTrue(dog.expired.wait(10))
+        handler.flush()
+
+        stacks = f'{handler.baseFilename}.stacks'
+        with open(handler.baseFilename, encoding='utf-8') as handle:
+            self.assertIn(f'stacks written to {stacks}', handle.read())
+        with open(stacks, encoding='utf-8') as handle:
+            self.assertIn('test_soft_then_hard', handle.read())
+
+    def test_finished_after_soft(self):
+        dog = ExpireRecorder(60, soft_fraction=0)
+
+        with self.assertLogs(level='DEBUG') as logs:
+            with dog:
+                self.assertTrue(dog.dumped.wait(10))
+
+        # Without a LogHandler, the stacks are logged
+        self.assertIn('Stacks and usage', logs.output[0])
+        self.assertFalse(dog.expired.is_set())
+
+    def test_expire_exits(self):
+        with mock.patch.object(watchdog.os, '_exit') as exit_func:
+            with self.assertLogs(level='ERROR') as logs:
+                watchdog.Watchdog(1.5).expire()
+
+        exit_func.assert_called_once_with(watchdog.EXIT_DEADLINE)
+        self.assertIn('Deadline of 1.5 seconds exceeded', logs.output[0])
+
+    def test_expire(self):
+        output_dir = tempfile.mkdtemp()
+        code = textwrap.dedent(
+            f"""
+            import time
+            from mundane import app
+            from mundane import log_mgr
+            from mundane import watchdog
+
+            def stuck(args):
+                '''Never finishes.'''
+                time.sleep(60)
+                return 0
+
+            log_mgr.activate('stuck', {output_dir!r})
+            my_app = app.ArgparseApp()
+            my_app.register_global_flags([watchdog])
+            my_app.register_command(stuck)
+            my_app.run(['--deadline', '0.5', 'stuck'])
+            """
+        )
+
+        result = subprocess.run([sys.executable, '-c', code], check=False)
+        names = sorted(os.listdir(output_dir))
+
+        self.assertEqual(result.returncode, watchdog.EXIT_DEADLINE)
+        self.assertEqual(len(names), 3)
+        self.assertEqual(names[0], 'stuck.log')
+        self.assertTrue(names[2].endswith('.stacks'))
+        with open(os.path.join(output_dir, names[1]),
+                  encoding='utf-8') as handle:
+            self.assertIn('Deadline of 0.5 seconds exceeded', handle.read())
+
+
+class FlagsTest(global_flags.GlobalFlagsTest, BaseWatchdog):
+
+    MODULE = watchdog
+
+    def setUp(self):
+        super().setUp()
+
+        self.my_app.register_command(self.limited, deadline=60)
+
+    def record(self, args) -> object:
+        return vars(args).copy(), self.watchdog_running()
+
+    def limited(self, args):
+        """A command with a deadline."""
+        return self.noop(args)
+
+    def test_no_deadline(self):
+        self.assertEqual(self.my_app.run(['noop']), 0)
+
+        self.assertNotIn('deadline', self.seen[0][0])
+        self.assertFalse(self.seen[0][1])
+
+    def test_flag(self):
+        self.assertEqual(self.my_app.run(['--deadline', '30', 'noop']), 0)
+
+        self.assertNotIn('deadline', self.seen[0][0])
+        self.assertTrue(self.seen[0][1])
+        self.assertFalse(self.watchdog_running())
+
+    def test_command_default(self):
+        self.assertEqual(self.my_app.run(['limited']), 0)
+
+        self.assertTrue(self.seen[0][1])
+
+    def test_flag_disables(self):
+        self.assertEqual(self.my_app.run(['--deadline', '0', 'limited']), 0)
+
+        self.assertFalse(self.seen[0][1])
+
+    def test_embedded(self):
+        stderr = io.StringIO()
+
+        self.assertEqual(self.my_app.run_embedded(['limited']), 0)
+        self.assertEqual(
+            self.my_app.run_embedded(
+                ['--deadline', '30', 'noop'], stderr=stderr
+            ), 2
+        )
+
+        self.assertEqual(len(self.seen), 1)
+        self.assertIn(
+            'argument --deadline: not allowed in an embedded run',
+            stderr.getvalue()
+        )
+
+    def test_no_command(self):
+        stdout = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout):
+            self.my_app.run([])
+
+        self.assertIn('--deadline SECONDS', stdout.getvalue())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()